@@ -0,0 +1,229 @@
+"""Synthetic survey files and measurement helpers for the benchmarks.
+
+The inputs are generated from the column manifests, shaped like the ASEC CSV
+archive, the ACS SPM research file and the CE Interview Survey FMLI files,
+so the benchmarks need no download. Their size is a fraction of the
+production files': set OPENFISCA_US_DATA_BENCHMARK_SIZES to a comma-separated
+list of the names in SIZES (default "small,medium").
+
+Datasets are built in a temporary data folder per size, and the raw
+datasets' downloads are redirected to the synthetic files.
+"""
+
+import os
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict
+from zipfile import ZipFile
+import numpy as np
+import pandas as pd
+import pytest
+from openfisca_us_data.datasets import ACS, CE, CPS, RawACS, RawCE, RawCPS
+from openfisca_us_data.datasets.acs import raw_acs
+from openfisca_us_data.datasets.ce import raw_ce
+from openfisca_us_data.datasets.cps import raw_cps
+
+# Fractions of the production files' size.
+SIZES = dict(small=0.01, medium=0.1, full=1.0)
+# Approximate rows of the production files.
+ASEC_HOUSEHOLDS = 90_000
+ACS_PERSONS = 3_200_000
+CE_ROWS_PER_QUARTER = 6_000
+
+CPS_YEAR = 2020
+ACS_YEAR = 2019
+CE_YEAR = 2019
+
+
+def benchmark_sizes() -> list:
+    names = os.environ.get("OPENFISCA_US_DATA_BENCHMARK_SIZES", "small,medium")
+    return [name.strip() for name in names.split(",")]
+
+
+def random_columns(
+    rng: np.random.Generator, dtypes: Dict[str, str], n: int
+) -> Dict[str, np.ndarray]:
+    """Random values for each column of a manifest, within its type."""
+    columns = {}
+    for column, dtype in dtypes.items():
+        dtype = np.dtype(dtype)
+        if dtype.kind == "f":
+            columns[column] = rng.uniform(0, 1000, n).round(2)
+        elif dtype.itemsize == 1:
+            columns[column] = rng.integers(0, 100, n)
+        else:
+            columns[column] = rng.integers(0, 30_000, n)
+    return columns
+
+
+def make_asec(path: Path, households: int, file_year_code: str) -> Path:
+    rng = np.random.default_rng(0)
+    manifest = raw_cps.column_manifest()
+    sizes = rng.integers(1, 6, households)
+    household_id = np.arange(1, households + 1)
+    person = pd.DataFrame(random_columns(rng, manifest["person"], sizes.sum()))
+    person["PH_SEQ"] = np.repeat(household_id, sizes)
+    person["P_SEQ"] = np.concatenate(
+        [np.arange(1, size + 1) for size in sizes]
+    )
+    person["PF_SEQ"] = np.where(person.P_SEQ > 3, 2, 1)
+    person["TAX_ID"] = person.PH_SEQ * 10 + person.PF_SEQ
+    person["SPM_ID"] = person.PH_SEQ * 10 + 1
+    person["OI_OFF"] = rng.integers(0, 21, len(person))
+    families = person[["PH_SEQ", "PF_SEQ"]].drop_duplicates()
+    family = pd.DataFrame(
+        random_columns(rng, manifest["family"], len(families))
+    )
+    family["FH_SEQ"] = families.PH_SEQ.values
+    family["FFPOS"] = families.PF_SEQ.values
+    household = pd.DataFrame(
+        random_columns(rng, manifest["household"], households)
+    )
+    household["H_SEQ"] = household_id
+    tables = dict(person=person, family=family, household=household)
+    with ZipFile(path, "w") as archive:
+        for table, prefix in raw_cps.MEMBERS.items():
+            archive.writestr(
+                f"{prefix}{file_year_code}.csv",
+                tables[table].to_csv(index=False),
+            )
+    return path
+
+
+def make_acs(path: Path, persons: int) -> Path:
+    rng = np.random.default_rng(0)
+    manifest = raw_acs.column_manifest()["person"]
+    household = np.sort(rng.integers(0, max(persons // 2, 1), persons))
+    columns = random_columns(rng, manifest, persons)
+    columns["SERIALNO"] = ACS_YEAR * 1_000_000 + household
+    columns["SPORDER"] = rng.integers(1, 10, persons)
+    columns["SPM_ID"] = household * 10 + rng.integers(0, 2, persons)
+    # Stata has no 64-bit integers.
+    person = pd.DataFrame(
+        {
+            column.lower(): values.astype(
+                np.float64 if values.dtype.kind == "f" else np.int32
+            )
+            for column, values in columns.items()
+        }
+    )
+    person.to_stata(path, write_index=False)
+    return path
+
+
+def make_ce(path: Path, rows: int, year: int) -> Path:
+    rng = np.random.default_rng(0)
+    manifest = raw_ce.column_manifest()["fmli"]
+    year_code, next_year_code = str(year)[-2:], str(year + 1)[-2:]
+    folder = f"intrvw{year_code}/intrvw{year_code}"
+    names = [f"fmli{year_code}1x"] + [
+        f"fmli{year_code}{quarter}" for quarter in (2, 3, 4)
+    ]
+    names.append(f"fmli{next_year_code}1")
+    with ZipFile(path, "w") as archive:
+        for quarter, name in enumerate(names, 1):
+            fmli = pd.DataFrame(random_columns(rng, manifest, rows))
+            fmli["NEWID"] = rng.integers(100_000, 999_999, rows) * 10 + (
+                rng.integers(1, 6, rows)
+            )
+            fmli["QINTRVMO"] = rng.integers(1, 4 if quarter == 5 else 13, rows)
+            fmli["QINTRVYR"] = year + (quarter == 5)
+            fmli["FINLWT21"] = rng.uniform(1e3, 5e4, rows)
+            archive.writestr(f"{folder}/{name}.csv", fmli.to_csv(index=False))
+    return path
+
+
+@pytest.fixture(scope="session", params=benchmark_sizes())
+def size(request) -> float:
+    if request.param not in SIZES:
+        raise ValueError(
+            f"Benchmark sizes must be in {tuple(SIZES)}, not "
+            f"'{request.param}'."
+        )
+    return SIZES[request.param]
+
+
+@pytest.fixture(scope="session")
+def inputs(size, tmp_path_factory) -> Path:
+    return tmp_path_factory.mktemp(f"inputs_{size}")
+
+
+@pytest.fixture(scope="session")
+def asec_zip(size, inputs) -> Path:
+    code = str(CPS_YEAR + 1)[-2:]
+    households = max(int(ASEC_HOUSEHOLDS * size), 10)
+    return make_asec(inputs / "asec.zip", households, code)
+
+
+@pytest.fixture(scope="session")
+def acs_file(size, inputs) -> Path:
+    return make_acs(inputs / "spm.dta", max(int(ACS_PERSONS * size), 10))
+
+
+@pytest.fixture(scope="session")
+def ce_zip(size, inputs) -> Path:
+    rows = max(int(CE_ROWS_PER_QUARTER * size), 10)
+    return make_ce(inputs / "ce.zip", rows, CE_YEAR)
+
+
+@pytest.fixture
+def data_dir(size, inputs, request, monkeypatch) -> Path:
+    """Build datasets in the size's data folder, from the synthetic
+    inputs."""
+    folder = inputs / "microdata"
+    for dataset in (RawCPS, CPS, RawACS, ACS, RawCE, CE):
+        monkeypatch.setattr(dataset, "data_dir", folder / dataset.name)
+    for module, source in (
+        (raw_cps, "asec_zip"),
+        (raw_acs, "acs_file"),
+        (raw_ce, "ce_zip"),
+    ):
+        monkeypatch.setattr(
+            module,
+            "fetch",
+            lambda *_, source=source: request.getfixturevalue(source),
+        )
+    return folder
+
+
+@pytest.fixture
+def built(data_dir) -> Callable:
+    """Generate a dataset in the data folder unless it's already built."""
+
+    def build(dataset: type, year: int) -> type:
+        if year not in dataset.years:
+            dataset.generate(year)
+        return dataset
+
+    return build
+
+
+def peak_memory(function: Callable, *args: Any) -> int:
+    """The peak memory traced while calling a function, in bytes."""
+    tracemalloc.start()
+    try:
+        function(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+@pytest.fixture
+def measure(benchmark) -> Callable:
+    """Time a stage, and record its peak memory in the results' extra_info.
+
+    Memory is traced in a separate call, so tracing doesn't slow the timed
+    rounds. Only this process is traced, so raw files parsed in worker
+    processes (with OPENFISCA_US_DATA_PARSE_WORKERS) aren't included.
+    """
+
+    def run(function: Callable, *args: Any, rounds: int = 3) -> Any:
+        benchmark.extra_info["peak_memory_bytes"] = peak_memory(
+            function, *args
+        )
+        return benchmark.pedantic(
+            function, args=args, rounds=rounds, iterations=1
+        )
+
+    return run
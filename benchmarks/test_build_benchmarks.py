@@ -0,0 +1,202 @@
+"""Time and peak memory of each stage of building and loading datasets.
+
+Run with ``make benchmark``, which saves the results as JSON under
+.benchmarks/ for ``pytest-benchmark compare``.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from conftest import ACS_YEAR, ASEC_HOUSEHOLDS, CE_YEAR, CPS_YEAR
+from openfisca_us_data.calibration import calibrate
+from openfisca_us_data.datasets import ACS, CE, CPS, RawACS, RawCE, RawCPS
+from openfisca_us_data.datasets.acs import raw_acs
+from openfisca_us_data.datasets.ce import ce
+from openfisca_us_data.datasets.cps import cps, raw_cps
+from openfisca_us_data.writer import DatasetWriter
+
+YEARS = {RawCPS: CPS_YEAR, RawACS: ACS_YEAR, RawCE: CE_YEAR}
+
+
+@pytest.mark.benchmark(group="raw parse")
+@pytest.mark.parametrize(
+    "dataset", YEARS, ids=[dataset.name for dataset in YEARS]
+)
+def test_raw_parse(measure, data_dir, dataset):
+    measure(lambda: dataset.generate(YEARS[dataset], force=True))
+
+
+@pytest.mark.benchmark(group="unit tables")
+@pytest.mark.parametrize(
+    "dataset,create_table",
+    [
+        (RawCPS, raw_cps.create_tax_unit_table),
+        (RawCPS, raw_cps.create_SPM_unit_table),
+        (RawACS, raw_acs.create_SPM_unit_table),
+        (RawACS, raw_acs.create_household_table),
+    ],
+    ids=["cps-tax_unit", "cps-spm_unit", "acs-spm_unit", "acs-household"],
+)
+def test_unit_tables(measure, built, dataset, create_table):
+    year = YEARS[dataset]
+    person = built(dataset, year).load(year, "person")
+    measure(create_table, person)
+
+
+def write_cps_variables(path, tables) -> None:
+    person, tax_unit, family, spm_unit, household = tables
+    with DatasetWriter(path) as writer:
+        cps.variable_map().write(
+            writer,
+            dict(
+                person=person,
+                family=family,
+                spm_unit=spm_unit,
+                household=household,
+            ),
+        )
+        cps.add_ID_variables(
+            writer, person, tax_unit, family, spm_unit, household
+        )
+        cps.add_personal_variables(writer, person)
+
+
+def fmli_table() -> pd.DataFrame:
+    """The five quarters of FMLI data, as CE.generate prepares them."""
+    with RawCE.load(CE_YEAR) as raw:
+        fmli = pd.concat(raw[quarter] for quarter in raw.keys())
+    fmli["months_in_scope"] = ce.months_in_scope_array(
+        fmli["interview_mo"].values, fmli["nominal_quarter"].values
+    )
+    return fmli.sort_values(["cu_id", "interview_id"])
+
+
+def add_ce_variables(writer, fmli: pd.DataFrame) -> None:
+    ce.variable_map().write(writer, dict(fmli=fmli))
+    ce.add_carbon_emissions(writer)
+
+
+def write_ce_variables(path, fmli: pd.DataFrame) -> None:
+    with DatasetWriter(path) as writer:
+        add_ce_variables(writer, fmli)
+
+
+@pytest.mark.benchmark(group="variable writes")
+def test_cps_variable_writes(measure, built, tmp_path):
+    raw = built(RawCPS, CPS_YEAR).load(CPS_YEAR)
+    tables = [
+        raw[entity]
+        for entity in ("person", "tax_unit", "family", "spm_unit", "household")
+    ]
+    raw.close()
+    measure(write_cps_variables, tmp_path / "cps.h5", tables)
+
+
+@pytest.mark.benchmark(group="variable writes")
+def test_ce_variable_writes(measure, built, tmp_path):
+    built(RawCE, CE_YEAR)
+    measure(write_ce_variables, tmp_path / "ce.h5", fmli_table())
+
+
+@pytest.mark.benchmark(group="annual estimation")
+def test_ce_annual_estimation(measure, built):
+    built(RawCE, CE_YEAR)
+    variables = {}
+    add_ce_variables(variables, fmli_table())
+    variables = {
+        name: np.asarray(values, dtype=float)
+        for name, values in variables.items()
+    }
+    # List the replicate weights, as their h5py group would, so that
+    # standard errors are estimated too.
+    variables[ce.REPLICATE_WEIGHTS] = [
+        name.split("/")[-1]
+        for name in variables
+        if name.startswith(ce.REPLICATE_WEIGHTS + "/")
+    ]
+    expenditures = [
+        name for name in variables if name.startswith("/household/expend")
+    ]
+    measure(
+        ce.estimate_annual_quantities,
+        variables,
+        ["/household/demographics/income_before_tax"]
+        + expenditures
+        + ["/household/emissions/co2_kg"],
+        ["demographics"] + ["expense"] * (len(expenditures) + 1),
+    )
+
+
+@pytest.mark.benchmark(group="emissions")
+@pytest.mark.parametrize("sets", [1, 8])
+def test_carbon_emissions(measure, built, sets):
+    built(RawCE, CE_YEAR)
+    variables = {}
+    ce.variable_map().write(variables, dict(fmli=fmli_table()))
+    coefficients = ce.emission_coefficients()
+    coefficient_sets = {
+        f"set_{i}": {
+            category: coefficient * (1 + i / 10)
+            for category, coefficient in coefficients.items()
+        }
+        for i in range(sets)
+    }
+    measure(ce.carbon_emissions, variables, coefficient_sets)
+
+
+@pytest.mark.benchmark(group="calibration")
+@pytest.mark.parametrize("targets", [10, 200])
+def test_calibration(measure, size, targets):
+    rng = np.random.default_rng(0)
+    households = max(int(ASEC_HOUSEHOLDS * size), 10 * targets)
+    matrix = (rng.random((households, targets)) < 0.1) * rng.uniform(
+        0, 10, (households, targets)
+    )
+    matrix[:, 0] = 1
+    weights = rng.uniform(100, 1_000, households)
+    totals = (matrix.T @ weights) * rng.uniform(0.9, 1.1, targets)
+    measure(calibrate, matrix, totals, weights)
+
+
+@pytest.mark.benchmark(group="generate")
+@pytest.mark.parametrize(
+    "dataset,year",
+    [(CPS, CPS_YEAR), (ACS, ACS_YEAR), (CE, CE_YEAR)],
+    ids=["cps", "acs", "ce"],
+)
+def test_generate(measure, built, dataset, year):
+    for raw in dataset.inputs:
+        built(raw, year)
+    measure(lambda: dataset.generate(year, force=True))
+
+
+@pytest.fixture
+def cps_dataset(built):
+    return built(CPS, CPS_YEAR)
+
+
+@pytest.mark.benchmark(group="load")
+def test_load_variable(measure, cps_dataset):
+    measure(cps_dataset.load, CPS_YEAR, "person_id")
+
+
+@pytest.mark.benchmark(group="load")
+def test_load_entity_variables(measure, cps_dataset):
+    variables = ["person_id", "age", "e00200", "e00900", "person_weight"]
+    measure(cps_dataset.load_many, CPS_YEAR, variables)
+
+
+@pytest.mark.benchmark(group="load")
+def test_load_raw_table(measure, built):
+    measure(built(RawCPS, CPS_YEAR).load, CPS_YEAR, "person")
+
+
+@pytest.mark.benchmark(group="load")
+def test_load_raw_columns(measure, built):
+    measure(
+        built(RawCPS, CPS_YEAR).load,
+        CPS_YEAR,
+        "person",
+        "r",
+        ["PH_SEQ", "A_AGE", "WSAL_VAL"],
+    )
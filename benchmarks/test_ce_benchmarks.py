@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+import pytest
+from openfisca_us_data.datasets.ce.ce import (
+    months_in_scope,
+    months_in_scope_array,
+)
+
+# Roughly the number of FMLI rows across five quarters of one CE year.
+N_ROWS = 30_000
+
+
+@pytest.fixture(scope="module")
+def fmli_df() -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    nominal_quarter = rng.integers(1, 6, N_ROWS)
+    interview_mo = np.where(
+        nominal_quarter == 5,
+        rng.integers(1, 4, N_ROWS),
+        rng.integers(1, 13, N_ROWS),
+    )
+    return pd.DataFrame(
+        dict(interview_mo=interview_mo, nominal_quarter=nominal_quarter)
+    )
+
+
+@pytest.mark.benchmark(group="months_in_scope")
+def test_months_in_scope_apply(benchmark, fmli_df):
+    benchmark(
+        fmli_df.apply,
+        lambda row: months_in_scope(
+            row["interview_mo"], row["nominal_quarter"]
+        ),
+        axis=1,
+    )
+
+
+@pytest.mark.benchmark(group="months_in_scope")
+def test_months_in_scope_vectorized(benchmark, fmli_df):
+    benchmark(
+        months_in_scope_array,
+        fmli_df["interview_mo"].values,
+        fmli_df["nominal_quarter"].values,
+    )
@@ -0,0 +1,23 @@
+import subprocess
+import sys
+import pytest
+
+
+def import_in_new_process(statement: str) -> None:
+    subprocess.run([sys.executable, "-c", statement], check=True)
+
+
+@pytest.mark.benchmark(group="import")
+@pytest.mark.parametrize(
+    "statement",
+    [
+        "import openfisca_us_data",
+        "import openfisca_us_data.cli",
+        "from openfisca_us_data import DATASETS",
+    ],
+)
+def test_import_time(benchmark, statement):
+    # Each round starts a fresh interpreter, so includes its startup time.
+    benchmark.pedantic(
+        import_in_new_process, args=(statement,), rounds=5, iterations=1
+    )
@@ -1,6 +1,16 @@
-from openfisca_us_data.datasets import *
 from pathlib import Path
+from openfisca_us_data import datasets
+from openfisca_us_data.datasets import REGISTRY, get_dataset
 
 REPO = Path(__file__).parent
 
-DATASETS = (RawCPS, CPS, RawACS, ACS, RawCE, CE)
+__all__ = ["REPO", "REGISTRY", "get_dataset", "DATASETS", *datasets.__all__]
+
+
+def __getattr__(attribute: str):
+    # Dataset classes and DATASETS are imported on first access.
+    if attribute == "DATASETS":
+        return datasets.all_datasets()
+    if attribute in datasets.__all__:
+        return getattr(datasets, attribute)
+    raise AttributeError(f"module {__name__!r} has no attribute {attribute!r}")
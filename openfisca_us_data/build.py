@@ -0,0 +1,170 @@
+"""Build several datasets and years at once.
+
+Targets name a dataset and the years to build, e.g. ``cps:2018-2021``,
+``ce:2019`` or ``acs:2016,2018``. Each target depends on the datasets listed in
+its class's ``inputs`` for the same year, or the years its ``input_years``
+gives, which are built first. Independent builds run in parallel worker
+processes, and outputs built from the same inputs as they would be now are
+skipped (see ``fingerprints``).
+"""
+
+from argparse import ArgumentParser
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import os
+from time import time
+from typing import Dict, Iterable, List, Set, Tuple
+from openfisca_us_data.datasets import REGISTRY, get_dataset
+from openfisca_us_data.writer import STORAGE
+
+Node = Tuple[str, int]
+
+
+def parse_target(target: str) -> List[Node]:
+    """Parse a target such as "cps:2018-2021" into (dataset, year) pairs."""
+    name, _, years = target.partition(":")
+    if name not in REGISTRY:
+        raise ValueError(f"Unknown dataset '{name}' in target '{target}'.")
+    if not years:
+        raise ValueError(f"Target '{target}' doesn't specify any years.")
+    nodes = []
+    for year_range in years.split(","):
+        start, _, end = year_range.partition("-")
+        for year in range(int(start), int(end or start) + 1):
+            nodes.append((name, year))
+    return nodes
+
+
+def dependency_graph(targets: Iterable[Node]) -> Dict[Node, Set[Node]]:
+    """Find every node needed to build the targets, and their inputs."""
+    graph = {}
+    pending = list(targets)
+    while pending:
+        name, year = node = pending.pop()
+        if node in graph:
+            continue
+        dataset = get_dataset(name)
+        graph[node] = {
+            (ds.name, int(input_year))
+            for input_year in dataset.input_years(year)
+            for ds in dataset.inputs
+        }
+        pending.extend(graph[node])
+    return graph
+
+
+def storage_arguments(name: str, storage: str) -> Dict[str, str]:
+    # Only model datasets are written through the storage settings.
+    if not get_dataset(name).model:
+        return {}
+    return dict(storage=storage)
+
+
+def generate(
+    node: Node, force: bool = False, storage: str = "default"
+) -> float:
+    name, year = node
+    start = time()
+    get_dataset(name).generate(
+        year, force=force, **storage_arguments(name, storage)
+    )
+    return time() - start
+
+
+def build(
+    targets: Iterable[Node],
+    workers: int = None,
+    force: bool = False,
+    storage: str = "default",
+) -> Dict[Node, str]:
+    """Build the targets and their inputs, in parallel where possible.
+
+    Args:
+        targets (Iterable[Node]): The (dataset, year) pairs to build.
+        workers (int, optional): The number of worker processes. Defaults to
+            the number of CPUs.
+        force (bool): Rebuild outputs even if they are up to date.
+        storage (str): The storage setting for model datasets, from
+            writer.STORAGE. Defaults to "default".
+
+    Returns:
+        Dict[Node, str]: The outcome for each node in the graph.
+    """
+    graph = dependency_graph(targets)
+    workers = workers or os.cpu_count()
+    outcomes = {}
+    running = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        while len(outcomes) < len(graph):
+            for node, inputs in graph.items():
+                if node in outcomes or node in running.values():
+                    continue
+                if any(
+                    outcomes.get(n, "").startswith("failed") for n in inputs
+                ):
+                    outcomes[node] = "failed (an input failed)"
+                    report(node, outcomes[node])
+                elif all(n in outcomes for n in inputs):
+                    name, year = node
+                    arguments = storage_arguments(name, storage)
+                    if not force and get_dataset(name).is_up_to_date(
+                        year, **arguments
+                    ):
+                        outcomes[node] = "up to date"
+                        report(node, outcomes[node])
+                    else:
+                        future = executor.submit(
+                            generate, node, force, storage
+                        )
+                        running[future] = node
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                node = running.pop(future)
+                try:
+                    outcomes[node] = f"built in {future.result():.1f}s"
+                except Exception as e:
+                    outcomes[node] = f"failed ({e})"
+                report(node, outcomes[node])
+    return outcomes
+
+
+def report(node: Node, outcome: str) -> None:
+    name, year = node
+    print(f"{name} {year}: {outcome}")
+
+
+def main(argv: List[str] = None) -> int:
+    parser = ArgumentParser(
+        prog="openfisca-us-data build",
+        description="Build datasets and the raw datasets they depend on.",
+    )
+    parser.add_argument(
+        "targets",
+        nargs="+",
+        help="Datasets and years to build, e.g. cps:2018-2021 ce:2019",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="The number of worker processes (defaults to the CPU count)",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Rebuild outputs even if they are up to date",
+    )
+    parser.add_argument(
+        "--storage",
+        choices=STORAGE,
+        default="default",
+        help="How model datasets store variables: types, chunking and "
+        "compression (see openfisca_us_data.writer)",
+    )
+    args = parser.parse_args(argv)
+    targets = [node for t in args.targets for node in parse_target(t)]
+    outcomes = build(
+        targets, workers=args.workers, force=args.force, storage=args.storage
+    )
+    return int(any(o.startswith("failed") for o in outcomes.values()))
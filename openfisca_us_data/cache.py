@@ -0,0 +1,276 @@
+"""A local, content-addressed cache for source data downloads.
+
+Downloads are stored once under ``microdata/cache`` (or the directory named by
+``OPENFISCA_US_DATA_CACHE_DIR``):
+
+- ``blobs/<sha256>`` holds each downloaded file, named by its content hash.
+- ``index/<key>.json`` records, for each URL, the blob it resolved to, the
+  blob's size and modification time, and the ``ETag``/``Last-Modified``
+  validators the server sent with it.
+- ``partial/<key>`` holds interrupted downloads, which are resumed with HTTP
+  range requests, and ``partial/<key>.lock`` is held while fetching the URL.
+
+Cached URLs are revalidated with a conditional request, so an unchanged file
+is never downloaded twice, and a changed one is saved from that request's
+response. Blobs are only hashed again if their size or modification time
+differs from the index. Setting ``OPENFISCA_US_DATA_OFFLINE=1`` serves
+files from the cache only, without touching the network.
+"""
+
+from __future__ import annotations
+from contextlib import contextmanager
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterator
+from openfisca_us_data.lazy import lazy_import
+from openfisca_us_data.profiling import count, stage
+
+requests = lazy_import("requests")
+tqdm = lazy_import("tqdm")
+
+DEFAULT_CACHE_DIR = Path(__file__).parent / "microdata" / "cache"
+BLOCK_SIZE = int(1e6)
+
+
+def cache_dir() -> Path:
+    return Path(
+        os.environ.get("OPENFISCA_US_DATA_CACHE_DIR", DEFAULT_CACHE_DIR)
+    )
+
+
+def is_offline() -> bool:
+    return os.environ.get("OPENFISCA_US_DATA_OFFLINE", "").lower() in (
+        "1",
+        "true",
+        "yes",
+    )
+
+
+# Builds in progress, innermost last, each collecting the files it fetched.
+_recorders = []
+
+
+@contextmanager
+def recorded_fetches() -> Iterator[Dict[str, str]]:
+    """Collect the SHA-256 of each URL fetched inside the context."""
+    fetched = {}
+    _recorders.append(fetched)
+    try:
+        yield fetched
+    finally:
+        _recorders.remove(fetched)
+
+
+def fetch(url: str, description: str = "data", offline: bool = None) -> Path:
+    """Get a local copy of a remote file, downloading it only if needed.
+
+    Args:
+        url (str): The URL to fetch.
+        description (str): A label for the progress bar.
+        offline (bool, optional): Serve only from the cache. Defaults to the
+            OPENFISCA_US_DATA_OFFLINE environment variable.
+
+    Returns:
+        Path: The path to the cached file. It must not be modified.
+    """
+    with stage("fetch"):
+        path = _fetch(url, description, offline)
+    if _recorders:
+        _recorders[-1][url] = path.name
+    return path
+
+
+def _fetch(url: str, description: str, offline: bool) -> Path:
+    if offline is None:
+        offline = is_offline()
+    if offline:
+        cached = _cached_blob(url, _read_entry(url))
+        if cached is None:
+            raise FileNotFoundError(
+                f"{url} is not in the download cache at {cache_dir()}, and "
+                "offline mode is on."
+            )
+        return cached
+    from openfisca_us_data.utils import file_lock
+
+    # Processes fetching the same URL take turns, so that one doesn't write
+    # to a partial download another is resuming. Once one finishes, the
+    # others find its blob in the cache.
+    lock = cache_dir() / "partial" / f"{_key(url)}.lock"
+    lock.parent.mkdir(parents=True, exist_ok=True)
+    with file_lock(lock):
+        entry = _read_entry(url)
+        cached = _cached_blob(url, entry)
+        if cached is None:
+            with stage("download"):
+                return _download(url, description)
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        try:
+            response = _get(url, headers)
+        except requests.ConnectionError:
+            return cached
+        if response.status_code == 304:
+            response.close()
+            return cached
+        # The file has changed: the response holds the new version.
+        with stage("download"):
+            return _download(url, description, response)
+
+
+def _key(url: str) -> str:
+    return hashlib.sha256(url.encode()).hexdigest()
+
+
+def _read_entry(url: str) -> dict:
+    path = cache_dir() / "index" / f"{_key(url)}.json"
+    if not path.exists():
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_json(path: Path, data: dict) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = path.with_name(path.name + ".tmp")
+    with open(temporary, "w") as f:
+        json.dump(data, f)
+    os.replace(temporary, path)
+
+
+def _cached_blob(url: str, entry: dict) -> Path:
+    """Return the blob an index entry points to, if it is intact.
+
+    A blob with the size and modification time recorded when it was
+    downloaded is trusted without reading it. Otherwise, it's hashed, and
+    either recorded again or removed if its content has changed.
+    """
+    if entry is None:
+        return None
+    blob = cache_dir() / "blobs" / entry["sha256"]
+    if not blob.exists():
+        return None
+    stat = blob.stat()
+    if stat.st_size != entry["size"]:
+        return None
+    if stat.st_mtime_ns == entry.get("mtime"):
+        return blob
+    if _sha256(blob) != entry["sha256"]:
+        os.remove(blob)
+        return None
+    _write_json(
+        cache_dir() / "index" / f"{_key(url)}.json",
+        dict(entry, mtime=stat.st_mtime_ns),
+    )
+    return blob
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _get(url: str, headers: dict) -> requests.Response:
+    response = requests.get(url, headers=headers, stream=True)
+    if response.status_code == 404:
+        raise FileNotFoundError(
+            "Received a 404 response when fetching the data."
+        )
+    if response.status_code != 416:
+        response.raise_for_status()
+    return response
+
+
+def _download(
+    url: str, description: str, response: requests.Response = None
+) -> Path:
+    """Download a URL into the cache, resuming a partial download if the
+    server still holds the same version of the file.
+
+    Args:
+        url (str): The URL to download.
+        description (str): A label for the progress bar.
+        response (requests.Response, optional): A streamed response for the
+            whole file, already received, to save instead of requesting it
+            again.
+    """
+    key = _key(url)
+    partial = cache_dir() / "partial" / key
+    partial_meta = partial.with_name(key + ".json")
+    partial.parent.mkdir(parents=True, exist_ok=True)
+    if response is None:
+        headers = {}
+        if partial.exists() and partial_meta.exists():
+            with open(partial_meta) as f:
+                validator = json.load(f).get("validator")
+            if validator:
+                headers["Range"] = f"bytes={partial.stat().st_size}-"
+                headers["If-Range"] = validator
+        response = _get(url, headers)
+    if response.status_code == 416:
+        # The partial file is no longer a prefix of the remote file.
+        response.close()
+        os.remove(partial)
+        response = _get(url, {})
+    etag = response.headers.get("ETag")
+    last_modified = response.headers.get("Last-Modified")
+    digest = hashlib.sha256()
+    if response.status_code == 206:
+        mode = "ab"
+        with open(partial, "rb") as f:
+            for block in iter(lambda: f.read(BLOCK_SIZE), b""):
+                digest.update(block)
+        downloaded = partial.stat().st_size
+    else:
+        mode = "wb"
+        downloaded = 0
+    _write_json(partial_meta, dict(validator=etag or last_modified))
+    total_size_in_bytes = downloaded + int(
+        response.headers.get("content-length", 0)
+    )
+    progress_bar = tqdm.tqdm(
+        total=total_size_in_bytes,
+        initial=downloaded,
+        unit="iB",
+        unit_scale=True,
+        desc=f"Downloading {description}",
+    )
+    with open(partial, mode) as f:
+        for data in response.iter_content(BLOCK_SIZE):
+            progress_bar.update(len(data))
+            digest.update(data)
+            f.write(data)
+    progress_bar.set_description(f"Downloaded {description}")
+    progress_bar.close()
+    size = partial.stat().st_size
+    count("downloaded_bytes", size - downloaded)
+    if "content-length" in response.headers and size != total_size_in_bytes:
+        raise IOError(
+            f"Downloaded {size} bytes of {url}, but expected "
+            f"{total_size_in_bytes}. Run again to resume the download."
+        )
+    sha256 = digest.hexdigest()
+    blob = cache_dir() / "blobs" / sha256
+    blob.parent.mkdir(parents=True, exist_ok=True)
+    os.replace(partial, blob)
+    os.remove(partial_meta)
+    _write_json(
+        cache_dir() / "index" / f"{key}.json",
+        dict(
+            url=url,
+            sha256=sha256,
+            size=size,
+            mtime=blob.stat().st_mtime_ns,
+            etag=etag,
+            last_modified=last_modified,
+        ),
+    )
+    return blob
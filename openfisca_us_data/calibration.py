@@ -0,0 +1,153 @@
+"""Calibrating survey weights to aggregate targets.
+
+``calibrate`` finds the weights closest to the initial weights ``d``, in the
+entropy sense, whose totals hit the targets ``t``:
+
+    minimise  sum(w * log(w / d) - w + d)  subject to  A.T @ w = t
+
+where ``A`` holds each record's contribution to each target (e.g. its number
+of persons, or its Social Security income). The solution is
+``w = d * exp(A @ multipliers)``, and Newton's method finds the multipliers
+by minimising the convex dual ``sum(w) - t @ multipliers``. Each iteration is
+a (records x targets) product and a (targets x targets) solve, so hundreds of
+targets over every household take seconds at most. Weights stay positive,
+and with indicator columns for the categories of several variables this is
+raking.
+
+Columns are scaled by their targets, so tolerances are relative errors.
+"""
+
+from __future__ import annotations
+from time import perf_counter
+from typing import Any, Dict, List, Tuple
+from openfisca_us_data.lazy import lazy_import
+
+np = lazy_import("numpy")
+
+# Bounds on the log of each weight's adjustment, against overflow.
+MAX_LOG_ADJUSTMENT = 50.0
+
+
+def calibrate(
+    matrix: np.ndarray,
+    targets: np.ndarray,
+    weights: np.ndarray,
+    names: List[str] = None,
+    tolerance: float = 1e-8,
+    max_iterations: int = 100,
+) -> Tuple[np.ndarray, Dict[str, Any]]:
+    """Adjust weights so that their totals match targets.
+
+    Args:
+        matrix (np.ndarray): The (records x targets) contributions.
+        targets (np.ndarray): The total each column should reach.
+        weights (np.ndarray): The initial weight of each record.
+        names (List[str], optional): The targets' names, for the report.
+        tolerance (float): The largest relative error accepted. Defaults to
+            1e-8.
+        max_iterations (int): The most Newton iterations to run. Defaults
+            to 100.
+
+    Returns:
+        Tuple[np.ndarray, Dict[str, Any]]: The calibrated weights, and a
+            report as from ``report``, with ``converged``, ``iterations``
+            and ``seconds`` added.
+    """
+    start = perf_counter()
+    targets = np.asarray(targets, dtype=np.float64)
+    initial = np.asarray(weights, dtype=np.float64)
+    if np.any(targets == 0):
+        raise ValueError("Targets must be non-zero.")
+    scaled = np.asarray(matrix, dtype=np.float64) / targets
+
+    def dual(multipliers: np.ndarray) -> Tuple[float, np.ndarray]:
+        adjusted = initial * np.exp(
+            np.clip(
+                scaled @ multipliers, -MAX_LOG_ADJUSTMENT, MAX_LOG_ADJUSTMENT
+            )
+        )
+        return adjusted.sum() - multipliers.sum(), adjusted
+
+    multipliers = np.zeros(len(targets))
+    objective, adjusted = dual(multipliers)
+    converged = False
+    iterations = 0
+    while iterations < max_iterations:
+        gradient = scaled.T @ adjusted - 1
+        if np.abs(gradient).max() <= tolerance:
+            converged = True
+            break
+        iterations += 1
+        hessian = scaled.T @ (adjusted[:, None] * scaled)
+        # A small ridge keeps targets no record contributes to solvable.
+        hessian[np.diag_indices_from(hessian)] += 1e-12 * max(
+            np.trace(hessian), 1
+        )
+        step = np.linalg.solve(hessian, gradient)
+        # Backtrack until the dual decreases enough (Armijo's condition).
+        size = 1.0
+        while size > 1e-10:
+            candidate = multipliers - size * step
+            candidate_objective, candidate_adjusted = dual(candidate)
+            if candidate_objective <= objective - 1e-4 * size * (
+                gradient @ step
+            ):
+                break
+            size /= 2
+        else:
+            break
+        multipliers = candidate
+        objective, adjusted = candidate_objective, candidate_adjusted
+
+    result = report(matrix, targets, adjusted, initial, names)
+    result.update(
+        converged=converged,
+        iterations=iterations,
+        seconds=perf_counter() - start,
+    )
+    return adjusted, result
+
+
+def report(
+    matrix: np.ndarray,
+    targets: np.ndarray,
+    weights: np.ndarray,
+    initial: np.ndarray = None,
+    names: List[str] = None,
+) -> Dict[str, Any]:
+    """Compare weighted totals with their targets.
+
+    Args:
+        matrix (np.ndarray): The (records x targets) contributions.
+        targets (np.ndarray): The targets.
+        weights (np.ndarray): The weights to assess.
+        initial (np.ndarray, optional): The weights before calibration, to
+            report their totals too.
+        names (List[str], optional): The targets' names. Defaults to their
+            positions.
+
+    Returns:
+        Dict[str, Any]: The ``max_relative_error``, and the ``target``,
+            ``total``, ``relative_error`` (and ``initial_total``) of each
+            target under ``targets``, by name.
+    """
+    names = names or [str(i) for i in range(len(targets))]
+    totals = np.asarray(matrix).T @ weights
+    errors = totals / targets - 1
+    result = dict(
+        max_relative_error=float(np.abs(errors).max()) if len(errors) else 0,
+        targets={
+            name: dict(
+                target=float(target),
+                total=float(total),
+                relative_error=float(error),
+            )
+            for name, target, total, error in zip(
+                names, targets, totals, errors
+            )
+        },
+    )
+    if initial is not None:
+        for name, total in zip(names, np.asarray(matrix).T @ initial):
+            result["targets"][name]["initial_total"] = float(total)
+    return result
@@ -0,0 +1,186 @@
+"""An index of the dataset files in each data folder.
+
+Finding the years of a dataset used to list its data folder, which is slow
+on network file systems holding many files. Instead, each data folder keeps
+a catalog (``.catalog/catalog.json``) of its dataset files, with their
+dataset, year, size, modification time and build fingerprint:
+
+    {
+      "version": 1,
+      "directory_mtime_ns": 1666000000000000000,
+      "files": {
+        "cps_2020.h5": {"dataset": "cps", "year": 2020, "size": 52428800,
+                        "mtime_ns": 1666000000000000000,
+                        "fingerprint": "3f2a..."}
+      }
+    }
+
+Reading it costs two ``stat`` calls while the catalog is current, as parsed
+catalogs are kept in memory. Adding, replacing or removing a file changes
+the folder's modification time, so a catalog recording another time is
+stale and is rebuilt from a listing of the folder. Builds, saves and
+removals rebuild it once they're done, holding a lock so that concurrent
+builds don't lose each other's entries. Catalogs are replaced atomically, so
+readers never see a partial one.
+
+Folders the process can't write to are listed on every change, without a
+catalog.
+"""
+
+from __future__ import annotations
+import json
+import os
+from pathlib import Path
+import re
+from typing import Any, Dict, Tuple
+
+CATALOG_DIR = ".catalog"
+CATALOG = "catalog.json"
+VERSION = 1
+# Dataset files are named <dataset>_<year><suffix>, e.g. cps_2020.h5.
+DATASET_FILE = re.compile(r"([^.].*)_([0-9]+)(\.[a-z0-9]+)$")
+
+# Parsed catalogs, and the (folder, catalog) modification times they match.
+_cache = {}
+
+
+def files(data_dir: Path) -> Dict[str, Dict[str, Any]]:
+    """The dataset files in a data folder.
+
+    Args:
+        data_dir (Path): The data folder.
+
+    Returns:
+        Dict[str, Dict[str, Any]]: The dataset, year, size, mtime_ns and
+            fingerprint of each file, by file name. Empty if the folder
+            doesn't exist.
+    """
+    data_dir = Path(data_dir)
+    signature = _signature(data_dir)
+    if signature is None:
+        return {}
+    if data_dir in _cache and _cache[data_dir][0] == signature:
+        return _cache[data_dir][1]
+    catalog = _read(data_dir)
+    if catalog is None or catalog["directory_mtime_ns"] != signature[0]:
+        return refresh(data_dir)
+    _cache[data_dir] = signature, catalog["files"]
+    return catalog["files"]
+
+
+def refresh(data_dir: Path) -> Dict[str, Dict[str, Any]]:
+    """Rebuild a data folder's catalog from a listing of the folder.
+
+    Entries for files whose size and modification time haven't changed are
+    kept, so only new or replaced files' build records are read.
+
+    Args:
+        data_dir (Path): The data folder.
+
+    Returns:
+        Dict[str, Dict[str, Any]]: The folder's files, as from ``files``.
+    """
+    from openfisca_us_data.utils import file_lock
+
+    data_dir = Path(data_dir)
+    if not data_dir.exists():
+        return {}
+    try:
+        (data_dir / CATALOG_DIR).mkdir(exist_ok=True)
+        with file_lock(data_dir / CATALOG_DIR / "lock"):
+            previous = _read(data_dir)
+            directory_mtime_ns, entries = _scan(
+                data_dir, previous["files"] if previous else {}
+            )
+            _write(
+                data_dir,
+                dict(
+                    version=VERSION,
+                    directory_mtime_ns=directory_mtime_ns,
+                    files=entries,
+                ),
+            )
+    except OSError:
+        # The folder is read-only: list it without keeping a catalog.
+        _, entries = _scan(data_dir, {})
+    _cache[data_dir] = _signature(data_dir), entries
+    return entries
+
+
+def _path(data_dir: Path) -> Path:
+    return data_dir / CATALOG_DIR / CATALOG
+
+
+def _signature(data_dir: Path) -> Tuple[int, int]:
+    try:
+        directory = os.stat(data_dir).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    try:
+        catalog = os.stat(_path(data_dir)).st_mtime_ns
+    except FileNotFoundError:
+        catalog = None
+    return directory, catalog
+
+
+def _read(data_dir: Path) -> Dict[str, Any]:
+    try:
+        with open(_path(data_dir)) as f:
+            catalog = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return catalog if catalog.get("version") == VERSION else None
+
+
+def _write(data_dir: Path, catalog: Dict[str, Any]) -> None:
+    path = _path(data_dir)
+    temporary = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(temporary, "w") as f:
+        json.dump(catalog, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary, path)
+
+
+def _scan(
+    data_dir: Path, previous: Dict[str, Dict[str, Any]]
+) -> Tuple[int, Dict[str, Dict[str, Any]]]:
+    # The folder's time is taken first: a change made during the listing
+    # leaves the catalog stale rather than missing an entry.
+    directory_mtime_ns = os.stat(data_dir).st_mtime_ns
+    entries = {}
+    for path in sorted(data_dir.iterdir()):
+        match = DATASET_FILE.match(path.name)
+        if match is None:
+            continue
+        size, mtime_ns = _size(path), path.stat().st_mtime_ns
+        entry = previous.get(path.name)
+        if entry is None or (entry["size"], entry["mtime_ns"]) != (
+            size,
+            mtime_ns,
+        ):
+            stem = path.name[: match.start(3)]
+            entry = dict(
+                dataset=match.group(1),
+                year=int(match.group(2)),
+                size=size,
+                mtime_ns=mtime_ns,
+                fingerprint=_fingerprint(data_dir / f"{stem}.build.json"),
+            )
+        entries[path.name] = entry
+    return directory_mtime_ns, entries
+
+
+def _size(path: Path) -> int:
+    """The size of a file, or of the files in a directory."""
+    if path.is_dir():
+        return sum(child.stat().st_size for child in path.rglob("*"))
+    return path.stat().st_size
+
+
+def _fingerprint(record: Path) -> str:
+    try:
+        with open(record) as f:
+            return json.load(f).get("fingerprint")
+    except (OSError, ValueError):
+        return None
@@ -1,20 +1,59 @@
-from argparse import ArgumentParser
-from openfisca_us_data import DATASETS
+from argparse import ArgumentParser, Namespace
+import sys
+from openfisca_us_data import build, profiling
+from openfisca_us_data.datasets import REGISTRY, get_dataset
 
 
 def main():
-    datasets = {ds.name: ds for ds in DATASETS}
+    if sys.argv[1:2] == ["build"]:
+        return build.main(sys.argv[2:])
     parser = ArgumentParser(
         description="A utility for storing OpenFisca-US-compatible microdata."
     )
-    parser.add_argument("dataset", help="The dataset to select")
+    parser.add_argument(
+        "dataset", choices=REGISTRY, help="The dataset to select"
+    )
     parser.add_argument("action", help="The action to take")
     parser.add_argument(
         "args", nargs="*", help="The arguments to pass to the function"
     )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="With generate, rebuild the output even if it is up to date, "
+        "e.g. to pick up revised source files",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Log the time and resources used by each stage of the action, "
+        "as JSON lines on standard error",
+    )
+    parser.add_argument(
+        "--profile-log",
+        metavar="FILE",
+        help="Write the --profile log to a file instead",
+    )
     args = parser.parse_args()
+    if not (args.profile or args.profile_log):
+        return run(args)
+    with profiling.profile() as report:
+        try:
+            return run(args)
+        finally:
+            if args.profile_log:
+                with open(args.profile_log, "w") as f:
+                    report.write(f)
+            else:
+                report.write()
+
+
+def run(args: Namespace):
     try:
-        return getattr(datasets[args.dataset], args.action)(*args.args)
+        kwargs = dict(force=True) if args.force else {}
+        return getattr(get_dataset(args.dataset), args.action)(
+            *args.args, **kwargs
+        )
     except Exception as e:
         print(f"Encountered an error: {e.with_traceback()}")
 
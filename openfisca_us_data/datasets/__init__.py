@@ -1,3 +1,42 @@
-from openfisca_us_data.datasets.cps import *
-from openfisca_us_data.datasets.acs import *
-from openfisca_us_data.datasets.ce import *
+"""The dataset classes, imported on first use.
+
+``REGISTRY`` maps each dataset's name to the module and class defining it, so
+listing or selecting datasets doesn't import every dataset module.
+"""
+
+from importlib import import_module
+from typing import Tuple
+
+REGISTRY = {
+    "raw_cps": ("openfisca_us_data.datasets.cps.raw_cps", "RawCPS"),
+    "cps": ("openfisca_us_data.datasets.cps.cps", "CPS"),
+    "raw_acs": ("openfisca_us_data.datasets.acs.raw_acs", "RawACS"),
+    "acs": ("openfisca_us_data.datasets.acs.acs", "ACS"),
+    "raw_ce": ("openfisca_us_data.datasets.ce.raw_ce", "RawCE"),
+    "ce": ("openfisca_us_data.datasets.ce.ce", "CE"),
+    "ce_panel": ("openfisca_us_data.datasets.ce.ce", "CEPanel"),
+}
+
+_CLASSES = {cls: name for name, (_, cls) in REGISTRY.items()}
+
+__all__ = list(_CLASSES)
+
+
+def get_dataset(name: str) -> type:
+    """Import and return the dataset class with the given name, e.g. "cps".
+
+    Raises:
+        KeyError: If no dataset has that name.
+    """
+    module, cls = REGISTRY[name]
+    return getattr(import_module(module), cls)
+
+
+def all_datasets() -> Tuple[type, ...]:
+    return tuple(get_dataset(name) for name in REGISTRY)
+
+
+def __getattr__(attribute: str):
+    if attribute in _CLASSES:
+        return get_dataset(_CLASSES[attribute])
+    raise AttributeError(f"module {__name__!r} has no attribute {attribute!r}")
@@ -1,20 +1,33 @@
-from openfisca_us_data.utils import US, dataset
-from openfisca_us_data.datasets.acs.raw_acs import RawACS
-from pandas import DataFrame
-import h5py
+from __future__ import annotations
+from typing import List
+from openfisca_us_data.utils import US, dataset, h5py, np, pd, stage
+from openfisca_us_data.datasets.acs.raw_acs import RawACS, column_manifest
+from openfisca_us_data.entities import EntityIndex
+from openfisca_us_data.mapping import VariableMap
+from openfisca_us_data import replicates
+
+# The factor turning replicate estimates' squared deviations into variances
+# (successive difference replication), and the Z score of the Census
+# Bureau's 90% margins of error.
+REPLICATE_VARIANCE_FACTOR = 4 / 80
+MARGIN_OF_ERROR_Z = 1.645
 
 
 @dataset
 class ACS:
     name = "acs"
     model = US
+    inputs = (RawACS,)
 
     # Note: no self because it uses a decorator.
-    def generate(year: int) -> None:
+    def generate(year: int, storage: str = "default") -> None:
         """Generates the ACS dataset.
 
         Args:
             year (int): The year of the raw ACS to use.
+            storage (str): How variables are stored: a setting from
+                writer.STORAGE, e.g. "compact" or "gzip". Defaults to
+                "default".
         """
 
         # Prepare raw ACS tables
@@ -23,33 +36,47 @@ class ACS:
             RawACS.generate(year)
 
         raw_data = RawACS.load(year)
-        acs = h5py.File(ACS.file(year), mode="w")
+        acs = ACS.writer(year, storage)
 
-        person, spm_unit, household = [
-            raw_data[entity] for entity in ("person", "spm_unit", "household")
-        ]
+        with stage("load raw tables"):
+            person, spm_unit, household = [
+                raw_data[entity]
+                for entity in ("person", "spm_unit", "household")
+            ]
 
-        add_ID_variables(acs, person, spm_unit, household)
-        add_SPM_variables(acs, spm_unit)
+        with stage("add_ID_variables"):
+            add_ID_variables(acs, person, spm_unit, household)
+        with stage("map variables"):
+            variable_map().write(acs, dict(person=person, spm_unit=spm_unit))
 
         raw_data.close()
-        acs.close()
+        with stage("close"):
+            acs.close()
+
+
+def variable_map() -> VariableMap:
+    """The variables copied from columns of the raw ACS tables.
+
+    Returns:
+        VariableMap: The spec in acs_variables.yaml.
+    """
+    return VariableMap.from_yaml(__name__, "acs_variables.yaml")
 
 
 def add_ID_variables(
     acs: h5py.File,
-    person: DataFrame,
-    spm_unit: DataFrame,
-    household: DataFrame,
+    person: pd.DataFrame,
+    spm_unit: pd.DataFrame,
+    household: pd.DataFrame,
 ):
-    """Add basic ID and weight variables.
+    """Add basic ID variables.
 
     Args:
         acs (h5py.File): The ACS dataset file.
-        person (DataFrame): The person table of the ACS.
-        spm_unit (DataFrame): The SPM unit table created from the person table
+        person (pd.DataFrame): The person table of the ACS.
+        spm_unit (pd.DataFrame): The SPM unit table created from the person table
             of the ACS.
-        household (DataFrame): The household table of the ACS.
+        household (pd.DataFrame): The household table of the ACS.
     """
     # Add primary and foreign keys
     acs["person_id"] = person.SERIALNO * 1e2 + person.SPORDER
@@ -64,10 +91,60 @@ def add_ID_variables(
     acs["person_family_id"] = person.SPM_ID
     acs["household_id"] = household.SERIALNO
 
-    # Add weights
-    acs["person_weight"] = person.WT
+    # Index persons by the groups containing them. Tax units and families
+    # are SPM units, as above.
+    spm_unit_index = EntityIndex.from_ids(person.SPM_ID, spm_unit.SPM_ID)
+    for entity in ("spm_unit", "tax_unit", "family"):
+        spm_unit_index.save(acs, entity)
+    EntityIndex.from_ids(person.SERIALNO, household.SERIALNO).save(
+        acs, "household"
+    )
 
 
-def add_SPM_variables(acs: h5py.File, spm_unit: DataFrame):
-    acs["SPM_unit_net_income"] = spm_unit.SPM_RESOURCES
-    acs["poverty_threshold"] = spm_unit.SPM_POVTHRESHOLD
+def estimate_totals(
+    year: int, variables: List[str], entity: str = "person"
+) -> pd.DataFrame:
+    """Estimate the totals of ACS variables, with replicate standard errors.
+
+    Every variable is totalled under the person weight and the 80 replicate
+    weights kept by RawACS in one pass.
+
+    Args:
+        year (int): The year of the ACS.
+        variables (List[str]): The variables to total, all of one entity.
+        entity (str): The variables' entity, e.g. "spm_unit". Group values
+            are counted once per person in the group. Defaults to "person".
+
+    Returns:
+        pd.DataFrame: The estimate, standard error and 90% margin of error
+            of each variable, indexed by variable.
+    """
+    columns = list(column_manifest()["person_replicate_weights"])
+    # Backends raise KeyError (HDF5) or ValueError (Parquet) for columns the
+    # table lacks.
+    try:
+        replicate_weights = RawACS.load(year, "person", columns=columns)
+    except (KeyError, ValueError):
+        raise ValueError(
+            f"RawACS {year} has no replicate weights: its source file lacks "
+            f"{columns[0]} to {columns[-1]}."
+        ) from None
+    replicate_weights = replicate_weights.to_numpy(np.float32)
+    values = ACS.load_many(year, variables)
+    values = np.column_stack([values[variable] for variable in variables])
+    if entity != "person":
+        values = EntityIndex.load(ACS, year, entity).broadcast(values)
+    totals, errors = replicates.estimate_totals(
+        values,
+        ACS.load(year, "person_weight"),
+        replicate_weights,
+        REPLICATE_VARIANCE_FACTOR,
+    )
+    return pd.DataFrame(
+        dict(
+            estimate=totals,
+            standard_error=errors,
+            margin_of_error=MARGIN_OF_ERROR_Z * errors,
+        ),
+        index=pd.Index(variables, name="variable"),
+    )
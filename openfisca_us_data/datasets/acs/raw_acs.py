@@ -1,22 +1,56 @@
+from __future__ import annotations
 from openfisca_us_data.utils import *
-import requests
-from io import BytesIO
-import pandas as pd
+from openfisca_us_data.entities import group_table
+from typing import Iterator
+
+# Number of Stata rows read and written at a time.
+CHUNKSIZE = 100_000
+
+
+def column_manifest() -> Dict[str, Dict[str, str]]:
+    return load_manifest(__name__, "raw_acs_columns.yaml")
 
 
 @dataset
 class RawACS:
     name = "raw_acs"
 
-    def generate(year: int) -> None:
+    def generate(year: int, columns: str = "manifest") -> None:
+        """Save the ACS SPM research file person table, and the SPM unit and
+        household tables built from it.
+
+        Args:
+            year (int): The year of the ACS.
+            columns (str): "manifest" to read only the columns listed in
+                raw_acs_columns.yaml, as compact types, or "full" to read
+                every column.
+        """
+        check_column_mode(columns)
         url = f"https://www2.census.gov/programs-surveys/supplemental-poverty-measure/datasets/spm/spm_{year}_pu.dta"
+        stata_path = fetch(url, "ACS SPM research file")
         try:
-            with pd.HDFStore(RawACS.file(year)) as storage:
-                person = pd.read_stata(url).fillna(0)
-                person.columns = person.columns.str.upper()
-                storage["person"] = person
-                storage["spm_unit"] = create_SPM_unit_table(person)
-                storage["household"] = create_household_table(person)
+            with RawACS.writer(year) as storage:
+                spm_units = []
+                households = []
+                for person in stages(
+                    "parse person", read_person_chunks(stata_path, columns)
+                ):
+                    with stage("write person"):
+                        storage.append("person", person)
+                    with stage("SPM unit table"):
+                        spm_units.append(create_SPM_unit_table(person))
+                    with stage("household table"):
+                        households.append(create_household_table(person))
+                # A unit's first person is the first of its first persons in
+                # each chunk.
+                with stage("SPM unit table"):
+                    spm_unit = create_SPM_unit_table(pd.concat(spm_units))
+                with stage("household table"):
+                    household = create_household_table(pd.concat(households))
+                with stage("write spm_unit"):
+                    storage["spm_unit"] = spm_unit
+                with stage("write household"):
+                    storage["household"] = household
         except Exception as e:
             RawACS.remove(year)
             raise ValueError(
@@ -24,6 +58,67 @@ class RawACS:
             )
 
 
+def read_person_chunks(
+    stata_path: Path, columns: str = "manifest", chunksize: int = CHUNKSIZE
+) -> Iterator[pd.DataFrame]:
+    """Read the person table of the SPM research file in chunks.
+
+    Args:
+        stata_path (Path): The Stata file.
+        columns (str): "manifest" to read only the columns listed in
+            raw_acs_columns.yaml (including any replicate weights), as
+            compact types, or "full" to read every column.
+        chunksize (int): The number of rows per chunk.
+
+    Yields:
+        pd.DataFrame: Chunks of the person table, with upper-case column
+            names and missing values as zero.
+    """
+    dtypes = None
+    usecols = None
+    if columns == "manifest":
+        manifest = column_manifest()
+        with pd.read_stata(stata_path, iterator=True) as reader:
+            available = list(reader.variable_labels())
+        upper = {column.upper() for column in available}
+        # Replicate weights are kept where the file has them.
+        dtypes = {
+            **manifest["person"],
+            **{
+                column: dtype
+                for column, dtype in manifest[
+                    "person_replicate_weights"
+                ].items()
+                if column in upper
+            },
+        }
+        usecols = [column for column in available if column.upper() in dtypes]
+    first_dtypes = None
+    with pd.read_stata(
+        stata_path, columns=usecols, chunksize=chunksize
+    ) as reader:
+        for person in reader:
+            person = person.fillna(0)
+            person.columns = person.columns.str.upper()
+            if dtypes is not None:
+                yield cast_to_manifest(person, dtypes)
+                continue
+            # The reader converts integer columns to float64 in chunks with
+            # missing values, so keep each numeric column's first type.
+            if first_dtypes is None:
+                first_dtypes = person.dtypes
+            yield cast_to_manifest(
+                person,
+                {
+                    column: first_dtypes[column]
+                    for column, dtype in person.dtypes.items()
+                    if dtype != first_dtypes[column]
+                    and dtype.kind in "biuf"
+                    and first_dtypes[column].kind in "biuf"
+                },
+            )
+
+
 def create_SPM_unit_table(person: pd.DataFrame) -> pd.DataFrame:
     SPM_UNIT_COLUMNS = [
         "CAPHOUSESUB",
@@ -54,12 +149,13 @@ def create_SPM_unit_table(person: pd.DataFrame) -> pd.DataFrame:
         "WUI_LT15",
         "ID",
     ]
-    return (
-        person[["SPM_" + column for column in SPM_UNIT_COLUMNS]]
-        .groupby(person.SPM_ID)
-        .first()
+    return group_table(
+        person,
+        "SPM_ID",
+        ["SPM_" + column for column in SPM_UNIT_COLUMNS],
+        "first",
     )
 
 
 def create_household_table(person: pd.DataFrame) -> pd.DataFrame:
-    return person[["SERIALNO", "ST", "PUMA"]].groupby(person.SERIALNO).first()
+    return group_table(person, "SERIALNO", ["SERIALNO", "ST", "PUMA"], "first")
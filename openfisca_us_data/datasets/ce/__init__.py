@@ -1,2 +1,2 @@
 from openfisca_us_data.datasets.ce.raw_ce import RawCE
-from openfisca_us_data.datasets.ce.ce import CE
+from openfisca_us_data.datasets.ce.ce import CE, CEPanel
@@ -1,12 +1,22 @@
+from __future__ import annotations
+from functools import lru_cache
 import pkgutil
+from typing import Dict, List, Union
 
-from pandas import DataFrame, concat
-import numpy as np
-import h5py
-import yaml
-
-from openfisca_us_data.utils import US, dataset
+from openfisca_us_data.utils import US, dataset, h5py, np, pd, stage, yaml
 from openfisca_us_data.datasets.ce.raw_ce import RawCE
+from openfisca_us_data.mapping import VariableMap
+from openfisca_us_data.replicates import (
+    grouped_totals,
+    standard_errors,
+    weight_block,
+)
+
+# The group of the 44 replicate weights, and the factor turning their
+# estimates' squared deviations into variances (balanced repeated
+# replication).
+REPLICATE_WEIGHTS = "/household/survey/replicate_weights"
+REPLICATE_VARIANCE_FACTOR = 1 / 44
 
 
 @dataset
@@ -25,6 +35,7 @@ class CE:
 
     name = "ce"
     model = US
+    inputs = (RawCE,)
     # Ratio of mean cash contributions to charity vs total cash contribs, 2016.
     # www.bls.gov/opub/btn/volume-8/the-relationship-between-cash-contributions-pretax-income-and-age.htm
     # Table 3. Average expenditures and cash contributions, by quintiles of
@@ -36,7 +47,14 @@ class CE:
         / MEAN_CASH_CONTRIB_OUTSIDE_HOUSEHOLD_2016
     )
 
-    def generate(year: int) -> None:
+    def input_files(year: int, emission_factors: str = None, **arguments):
+        """The file of further emission coefficients, whose contents are
+        fingerprinted."""
+        return () if emission_factors is None else (emission_factors,)
+
+    def generate(
+        year: int, storage: str = "default", emission_factors: str = None
+    ) -> None:
         """Saves organized Consumer Expenditure data in HDF5 format via h5py
 
         Computes "months in scope" from existing variables and uses it to
@@ -45,47 +63,187 @@ class CE:
 
         Args:
             year (int): The year of the Consumer Expenditure to use.
+            storage (str): How variables are stored: a setting from
+                writer.STORAGE, e.g. "compact" or "gzip". Defaults to
+                "default".
+            emission_factors (str, optional): A YAML file of further sets
+                of emission coefficients, as for ``load_coefficient_sets``.
+                Each set is added beside co2_kg, with its annual estimate.
         """
         year = int(year)
+        coefficient_sets = emission_coefficient_sets(emission_factors)
         if year not in RawCE.years:
             RawCE.generate(year)
 
         raw_data = RawCE.load(year)
-        ce = h5py.File(CE.file(year), mode="w")
-        ce.create_group("/household")  # Household quarterly data.
-        ce.create_group("/annual")  # Annual estimates.
+        ce = CE.writer(year, storage)
 
         # Concatenate 5 "quarters" of fmli data, add months in scope. --------
+        fmli_df = load_fmli(raw_data).sort_values(["cu_id", "interview_id"])
+        raw_data.close()
+
+        write_households(ce, fmli_df, coefficient_sets)
+        with stage("close"):
+            ce.close()
+
+
+@dataset
+class CEPanel:
+    """Several years of Consumer Expenditure data in one file.
+
+    The households of each year's five nominal quarters are stacked, ordered
+    by ``/household/survey/nominal_year``, and the annual estimates of every
+    year are computed together, with estimates pooled across the years in
+    "/annual/pooled".
+    """
+
+    name = "ce_panel"
+    model = US
+    inputs = (RawCE,)
+
+    def input_years(year: int, years: int = 10, **arguments) -> range:
+        """The years of RawCE a panel is built from, each of which is
+        fingerprinted."""
+        return range(int(year) - int(years) + 1, int(year) + 1)
+
+    def input_files(year: int, emission_factors: str = None, **arguments):
+        """The file of further emission coefficients, as for CE."""
+        return () if emission_factors is None else (emission_factors,)
+
+    def generate(
+        year: int,
+        years: int = 10,
+        storage: str = "default",
+        emission_factors: str = None,
+    ) -> None:
+        """Saves several years of organized Consumer Expenditure data.
+
+        Args:
+            year (int): The last year of the panel.
+            years (int): The number of years in the panel, ending with
+                ``year``. Defaults to 10.
+            storage (str): How variables are stored: a setting from
+                writer.STORAGE, e.g. "compact" or "gzip". Defaults to
+                "default".
+            emission_factors (str, optional): A YAML file of further sets
+                of emission coefficients, as for ``CE.generate``.
+        """
+        year, years = int(year), int(years)
+        if years < 1:
+            raise ValueError("A panel needs at least one year.")
+        coefficient_sets = emission_coefficient_sets(emission_factors)
+        fmli_dfs = []
+        for survey_year in CEPanel.input_years(year, years):
+            if survey_year not in RawCE.years:
+                RawCE.generate(survey_year)
+            raw_data = RawCE.load(survey_year)
+            fmli_dfs.append(load_fmli(raw_data))
+            raw_data.close()
+        fmli_df = pd.concat(fmli_dfs).sort_values(
+            ["nominal_year", "cu_id", "interview_id"]
+        )
+
+        panel = CEPanel.writer(year, storage)
+        write_households(panel, fmli_df, coefficient_sets, pooled=True)
+        with stage("close"):
+            panel.close()
+
+
+def emission_coefficient_sets(
+    emission_factors: str = None,
+) -> Dict[str, Dict[str, float]]:
+    """The paper's CO2 coefficients, as co2_kg, and any further sets.
+
+    Args:
+        emission_factors (str, optional): A YAML file of further sets, as
+            for ``load_coefficient_sets``.
+
+    Returns:
+        Dict[str, Dict[str, float]]: The coefficients of each set, by name.
+    """
+    coefficient_sets = dict(co2_kg=emission_coefficients())
+    if emission_factors is not None:
+        for name, coefficients in load_coefficient_sets(
+            emission_factors
+        ).items():
+            if name in coefficient_sets:
+                raise ValueError(f"Emission set {name} already exists.")
+            coefficient_sets[name] = coefficients
+    return coefficient_sets
+
+
+def load_fmli(raw_data: pd.HDFStore) -> pd.DataFrame:
+    """Concatenate the quarters of a RawCE year, adding months in scope and
+    filling missing replicate weights with zero.
+
+    Args:
+        raw_data (pd.HDFStore): The RawCE dataset.
+
+    Returns:
+        pd.DataFrame: The FMLI data of all five quarters.
+    """
+    with stage("load raw tables"):
         df_list = []
         for quarter_data in raw_data.keys():
             df_list.append(raw_data[quarter_data])
 
-        fmli_df = concat(df_list)
-        fmli_df["months_in_scope"] = fmli_df.apply(
-            lambda row: months_in_scope(
-                row["interview_mo"], row["nominal_quarter"]
-            ),
-            axis=1,
+    with stage("months in scope"):
+        fmli_df = pd.concat(df_list)
+        # Households outside a replicate's half-sample have blank replicate
+        # weights, which the BLS's variance programs set to zero.
+        replicates = fmli_df.columns[fmli_df.columns.str.match(r"WTREP\d+$")]
+        fmli_df[replicates] = fmli_df[replicates].fillna(0)
+        fmli_df["months_in_scope"] = months_in_scope_array(
+            fmli_df["interview_mo"].values,
+            fmli_df["nominal_quarter"].values,
         )
-        fmli_df = fmli_df.sort_values(["cu_id", "interview_id"])
+    return fmli_df
+
 
-        # Add household variables to H5 File. --------------------------------
-        add_survey_vars(ce, fmli_df)
-        add_demographics(ce, fmli_df)
-        add_expenditures(ce, fmli_df)
-        add_carbon_emissions(ce)
+def write_households(
+    ce: h5py.File,
+    fmli_df: pd.DataFrame,
+    coefficient_sets: Dict[str, Dict[str, float]],
+    pooled: bool = False,
+) -> None:
+    """Add household variables, emissions and annual estimates.
 
-        # Add annual estimates to H5 File. -----------------------------------
-        estimate_annual_quantity(
-            ce, "/household/demographics/income_before_tax", "demographics"
+    Args:
+        ce (h5py.File): The dataset file.
+        fmli_df (pd.DataFrame): The FMLI data, in the order to store it.
+        coefficient_sets (Dict[str, Dict[str, float]]): The emission
+            coefficient sets, as for ``add_carbon_emissions``.
+        pooled (bool): Whether to estimate quantities across years too.
+            Defaults to False.
+    """
+    ce.create_group("/household")  # Household quarterly data.
+    ce.create_group("/annual")  # Annual estimates.
+
+    # Add household variables to H5 File. ------------------------------------
+    with stage("map variables"):
+        variable_map().write(ce, dict(fmli=fmli_df))
+    with stage("add_carbon_emissions"):
+        add_carbon_emissions(ce, coefficient_sets)
+
+    # Add annual estimates to H5 File. ---------------------------------------
+    expenditures = [
+        "/household/expenditures/" + category
+        for category in ce["/household/expenditures"]
+    ]
+    emissions = ["/household/emissions/" + name for name in coefficient_sets]
+    with stage("estimate_annual_quantities"):
+        estimate_annual_quantities(
+            ce,
+            ["/household/demographics/income_before_tax"]
+            + expenditures
+            + emissions,
+            ["demographics"]
+            + ["expense"] * (len(expenditures) + len(emissions)),
+            pooled=pooled,
         )
-        estimate_annual_quantity(ce, "/household/expenditures/alcohol")
-        estimate_annual_quantity(ce, "/household/emissions/co2_kg")
-        raw_data.close()
-        ce.close()
 
 
-def months_in_scope(interview_mo: int, nominal_quarter: int):
+def months_in_scope(interview_mo: int, nominal_quarter: int) -> int:
     """Get the number of calendar months representing a nominal quarter.
 
     Args:
@@ -98,21 +256,53 @@ def months_in_scope(interview_mo: int, nominal_quarter: int):
         months_in_scope (int): the number of calendar months (out of a
             possible 3) that will represent the nominal quarter.
     """
-    if nominal_quarter in [1, 2, 3, 4]:
-        if interview_mo in [1, 2, 3]:
-            months_in_scope = interview_mo - 1
-        elif interview_mo in [4, 5, 6, 7, 8, 9, 10, 11, 12]:
-            months_in_scope = 3
-        else:
-            raise ValueError(f"interview_mo {interview_mo} outside range.")
-    elif nominal_quarter == 5:
-        if interview_mo in [1, 2, 3]:
-            months_in_scope = 4 - interview_mo
-        else:
-            raise ValueError(f"interview_mo {interview_mo} outside range.")
-    else:
-        raise ValueError(f"nominal quarter {nominal_quarter} outside range.")
-    return months_in_scope
+    return int(months_in_scope_array([interview_mo], [nominal_quarter])[0])
+
+
+def months_in_scope_array(
+    interview_mo: np.ndarray, nominal_quarter: np.ndarray
+) -> np.ndarray:
+    """Get the number of calendar months representing each nominal quarter.
+
+    Args:
+        interview_mo (np.ndarray): the calendar months (e.g., 2 for February)
+            that the Consumer Expenditure surveys were taken
+        nominal_quarter (np.ndarray): The CE quarters of 1-5, with 5
+            representing the first quarter of the next year.
+
+    Returns:
+        np.ndarray: the number of calendar months (out of a possible 3) that
+            will represent each nominal quarter, as int8.
+    """
+    interview_mo = np.asarray(interview_mo)
+    nominal_quarter = np.asarray(nominal_quarter)
+    invalid = ~np.isin(nominal_quarter, [1, 2, 3, 4, 5])
+    if invalid.any():
+        raise ValueError(
+            _outside_range("nominal quarter", nominal_quarter, invalid)
+        )
+    final_quarter = nominal_quarter == 5
+    early_interview = np.isin(interview_mo, [1, 2, 3])
+    invalid = ~np.isin(interview_mo, np.arange(1, 13)) | (
+        final_quarter & ~early_interview
+    )
+    if invalid.any():
+        raise ValueError(_outside_range("interview_mo", interview_mo, invalid))
+    return np.where(
+        final_quarter,
+        4 - interview_mo,
+        np.where(early_interview, interview_mo - 1, 3),
+    ).astype(np.int8)
+
+
+def _outside_range(name: str, values: np.ndarray, invalid: np.ndarray) -> str:
+    rows = np.flatnonzero(invalid)
+    values = ", ".join(map(str, values[rows[:10]]))
+    rows = ", ".join(map(str, rows[:10]))
+    if invalid.sum() > 10:
+        values += ", ..."
+        rows += ", ..."
+    return f"{name} {values} outside range (rows {rows})."
 
 
 def estimate_annual_quantity(ce: h5py.File, var_path: str, var_type="expense"):
@@ -128,134 +318,237 @@ def estimate_annual_quantity(ce: h5py.File, var_path: str, var_type="expense"):
         var_path (str): the path within ce contining the survey variable
         var_type (str): either "expense" or "demographic".
     """
-    if len(set(ce["/household/survey/nominal_year"][:])) > 1:
-        raise NotImplementedError("Multi-year estimation not supported.")
-    if var_type not in ["expense", "demographics"]:
+    estimate_annual_quantities(ce, [var_path], var_type)
+
+
+def estimate_annual_quantities(
+    ce: h5py.File,
+    var_paths: List[str],
+    var_types: Union[str, List[str]] = "expense",
+    pooled: bool = False,
+) -> Dict[str, Union[float, np.ndarray]]:
+    """Estimate several annual quantities using CE survey weights.
+
+    The survey columns are read once, and the estimates of every nominal
+        year, nominal quarter and variable are computed in one grouped
+        reduction. Each year's estimate is the mean of its five nominal
+        quarters' estimates. Results are saved in "/annual": as numbers
+        for one year, or for several (as in ``CEPanel``) as arrays by the
+        years in "/annual/year". If the file has replicate weights, every
+        estimate is also computed under each of them, in the same
+        reduction, and standard errors are saved in
+        "/annual/standard_errors" (and "/annual/pooled/standard_errors").
+
+    Args:
+        ce (h5py.File): The HDF5 data structure containing the organized
+           Consumer Expenditure survey data.
+        var_paths (List[str]): the paths within ce containing the survey
+            variables
+        var_types (Union[str, List[str]]): either "expense" or
+            "demographics", for all variables or for each one.
+        pooled (bool): Whether to also estimate each variable across all
+            years, as the mean of the yearly estimates, saved in
+            "/annual/pooled". Defaults to False.
+
+    Returns:
+        Dict[str, Union[float, np.ndarray]]: The annual estimate of each
+            variable (by year, for several years), by name.
+    """
+    if isinstance(var_types, str):
+        var_types = [var_types] * len(var_paths)
+    if not set(var_types) <= {"expense", "demographics"}:
         raise ValueError("var_type must be 'expense' or 'demographics'.")
     MONTHS_PER_QUARTER = 3
-    nominal_quarter_ests = []
-    for nominal_quarter in [1, 2, 3, 4, 5]:
-        in_quarter = (
-            ce["/household/survey/nominal_quarter"][:] == nominal_quarter
-        )
-        proportion_in_scope = (
-            ce["/household/survey/months_in_scope"][in_quarter]
-            / MONTHS_PER_QUARTER
+    QUARTERS = 5
+    years, year_index = np.unique(
+        ce["/household/survey/nominal_year"][:], return_inverse=True
+    )
+    nominal_quarter = ce["/household/survey/nominal_quarter"][:]
+    proportion_in_scope = (
+        ce["/household/survey/months_in_scope"][:] / MONTHS_PER_QUARTER
+    )
+    weight = ce["/household/survey/weight"][:]
+    replicate_weights = None
+    if REPLICATE_WEIGHTS in ce:
+        replicate_weights = np.column_stack(
+            [
+                ce[f"{REPLICATE_WEIGHTS}/{name}"][:]
+                for name in ce[REPLICATE_WEIGHTS]
+            ]
         )
-        weight = ce["/household/survey/weight"][in_quarter]
-        var = ce[var_path][in_quarter]
-        if var_type == "demographics":
-            w = weight * proportion_in_scope
-            numerator = np.sum(w * var)
-            denominator = np.sum(w)
-        elif var_type == "expense":
-            numerator = np.sum(weight * var)
-            denominator = np.sum(weight * proportion_in_scope)
-        est = numerator / denominator
-        nominal_quarter_ests.append(est)
-
-        if var_type == "demographics":
-            result = np.mean(nominal_quarter_ests)
-        elif var_type == "expense":
-            result = np.mean(nominal_quarter_ests) * 4
-
-    estimated_name = var_path.split("/")[-1]
-    ce["/annual/" + estimated_name] = result
-
-
-def add_survey_vars(ce: h5py.File, fmli_df: DataFrame):
-    """Add Consumer Expenditure variables related to the survey itself.
+        if np.isnan(replicate_weights).any():
+            raise ValueError(
+                "Replicate weights are missing for some households: fill "
+                "them with zero, as load_fmli does."
+            )
+    weights = weight_block(weight, replicate_weights)
+    # One column per variable. Demographics are weighted by the months in
+    # scope, while expenses are scaled up by them through the denominator.
+    is_demographic = np.array(var_types) == "demographics"
+    values = np.empty((len(weight), len(var_paths)))
+    for i, var_path in enumerate(var_paths):
+        values[:, i] = ce[var_path][:]
+    values[:, is_demographic] *= proportion_in_scope[:, None]
+    # Sum each (year, quarter) group's households under every weight at
+    # once: a (households x variables) by (households x weights) product.
+    group = (year_index * QUARTERS + nominal_quarter - 1).astype(int)
+    groups = len(years) * QUARTERS
+    numerators = grouped_totals(values, weights, group, groups)
+    denominators = grouped_totals(
+        proportion_in_scope[:, None], weights, group, groups
+    )[:, 0]
+    nominal_quarter_ests = (numerators / denominators[:, None, :]).reshape(
+        len(years), QUARTERS, len(var_paths), weights.shape[1]
+    )
+    # Estimates by year, variable and weight, the full-sample weight first.
+    results = nominal_quarter_ests.mean(axis=1)
+    results[:, ~is_demographic] *= 4
+    pooled_results = results.mean(axis=0)
+
+    estimates = {}
+    if len(years) > 1:
+        ce["/annual/year"] = years
+    for i, var_path in enumerate(var_paths):
+        estimated_name = var_path.split("/")[-1]
+        result = results[:, i, 0]
+        result = result[0] if len(years) == 1 else result
+        ce["/annual/" + estimated_name] = result
+        estimates[estimated_name] = result
+        if pooled:
+            ce["/annual/pooled/" + estimated_name] = pooled_results[i, 0]
+        if replicate_weights is None:
+            continue
+        error = standard_errors(results[:, i], REPLICATE_VARIANCE_FACTOR)
+        error = error[0] if len(years) == 1 else error
+        ce["/annual/standard_errors/" + estimated_name] = error
+        if pooled:
+            ce["/annual/pooled/standard_errors/" + estimated_name] = (
+                standard_errors(pooled_results[i], REPLICATE_VARIANCE_FACTOR)
+            )
+    return estimates
+
+
+def variable_map() -> VariableMap:
+    """The household variables copied or derived from FMLI columns.
+
+    Returns:
+        VariableMap: The spec in ce_variables.yaml, covering the survey,
+            demographic and expenditure variables.
+    """
+    return VariableMap.from_yaml(
+        __name__,
+        "ce_variables.yaml",
+        proportion_cash_contrib_to_charity=(
+            CE.proportion_cash_contrib_to_charity
+        ),
+    )
+
+
+@lru_cache()
+def _read_coefficients(resource: str) -> Dict[str, float]:
+    data = pkgutil.get_data(__name__, resource)
+    return yaml.load(data, Loader=yaml.FullLoader)
+
+
+def emission_coefficients(
+    resource: str = "emission_coefficients.yaml",
+) -> Dict[str, float]:
+    """Emission coefficients stored with this module, parsed once.
 
     Args:
-        ce (h5py.File): The HDF5 data structure containing the organized
-           Consumer Expenditure survey data.
-        fmli_df (pd.DataFrame): The raw CE data (all 5 quarters).
+        resource (str): The coefficients' file name. Defaults to
+            "emission_coefficients.yaml", Fremstad & Paul (2019)'s kg of
+            CO2 per dollar of each expenditure category.
+
+    Returns:
+        Dict[str, float]: The coefficient of each expenditure category.
     """
-    group_prefix = "/household/survey/"
-    ce[group_prefix + "weight"] = fmli_df["weight"]
-    ce[group_prefix + "months_in_scope"] = fmli_df["months_in_scope"]
-    ce[group_prefix + "nominal_year"] = fmli_df["nominal_year"]
-    ce[group_prefix + "nominal_quarter"] = fmli_df["nominal_quarter"]
-    ce[group_prefix + "interview_year"] = fmli_df["interview_yr"]
-    ce[group_prefix + "interview_month"] = fmli_df["interview_mo"]
-    ce[group_prefix + "survey_weight"] = fmli_df["FINLWT21"]
+    return dict(_read_coefficients(resource))
 
 
-def add_demographics(ce: h5py.File, fmli_df: DataFrame):
-    """Add select Consumer Expenditure demographic variables.
+def load_coefficient_sets(path: str) -> Dict[str, Dict[str, float]]:
+    """Load sets of emission coefficients from a YAML file, e.g.
+
+        ch4_kg:
+          electricity: 0.004
+          natural_gas: 0.02
+        co2_kg_2012:
+          electricity: 2.31
+          gasoline: 3.30
+
+    Categories a set leaves out have a coefficient of zero.
 
     Args:
-        ce (h5py.File): The HDF5 data structure containing the organized
-           Consumer Expenditure survey data.
-        fmli_df (pd.DataFrame): The raw CE data (all 5 quarters).
+        path (str): The YAML file.
+
+    Returns:
+        Dict[str, Dict[str, float]]: The coefficients of each set, by the
+            name of the emissions variable it produces.
     """
-    group_prefix = "/household/demographics/"
-    ce[group_prefix + "ref_age"] = fmli_df.AGE_REF
-    ce[group_prefix + "ref_race"] = fmli_df.REF_RACE
-    ce[group_prefix + "ref_sex"] = fmli_df.SEX_REF
-    ce[group_prefix + "region"] = fmli_df.REGION
-    ce[group_prefix + "state"] = fmli_df.STATE
-    ce[group_prefix + "urban_or_rural"] = fmli_df.BLS_URBN
-    ce[group_prefix + "census_division"] = fmli_df.DIVISION
-    ce[group_prefix + "income_before_tax"] = fmli_df.FINCBTXM
-    ce[group_prefix + "highest_education"] = fmli_df.HIGH_EDU
-    ce[group_prefix + "members_ct"] = fmli_df.FAM_SIZE
-    ce[group_prefix + "members_younger_than_18_ct"] = fmli_df.PERSLT18
-    ce[group_prefix + "members_older_than_64_ct"] = fmli_df.PERSOT64
-
-
-def add_expenditures(ce: h5py.File, fmli_df: DataFrame):
-    """Add select Consumer Expenditure expenditure variables.
+    with open(path) as f:
+        sets = yaml.safe_load(f)
+    if not isinstance(sets, dict) or not all(
+        isinstance(coefficients, dict) for coefficients in sets.values()
+    ):
+        raise ValueError(
+            f"{path} must map names of emission sets to coefficients by "
+            "expenditure category."
+        )
+    return sets
+
+
+def carbon_emissions(
+    ce: h5py.File,
+    coefficient_sets: Dict[str, Dict[str, float]],
+    dtype: str = "float32",
+) -> Dict[str, np.ndarray]:
+    """Compute household emissions under several sets of coefficients.
+
+    The expenditure categories any set uses are read once into a households
+    by categories matrix, and every set is applied in one product with a
+    categories by sets matrix of coefficients. This works on built CE files
+    as well as during generation, so coefficient variants can be compared
+    without rebuilding the dataset.
 
     Args:
         ce (h5py.File): The HDF5 data structure containing the organized
            Consumer Expenditure survey data.
-        fmli_df (pd.DataFrame): The raw CE data (all 5 quarters).
+        coefficient_sets (Dict[str, Dict[str, float]]): The coefficient of
+            each expenditure category, by set name.
+        dtype (str): The type the product is computed in. Defaults to
+            "float32", which halves the matrix's memory.
+
+    Returns:
+        Dict[str, np.ndarray]: Each household's emissions (as float64) under
+            each set, by set name.
     """
     group_prefix = "/household/expenditures/"
-    ce[group_prefix + "airfare"] = fmli_df.TAIRFARP
-    ce[group_prefix + "alcohol"] = fmli_df.ALCBEVPQ
-    ce[group_prefix + "education"] = fmli_df.EDUCAPQ
-    ce[group_prefix + "auto_insurance"] = fmli_df.VEHINSPQ
-    ce[group_prefix + "autos"] = (
-        fmli_df.CARTKUPQ  # used car.
-        + fmli_df.CARTKNPQ  # new car.
-        + fmli_df.VRNTLOPQ  # rent / lease.
-    )
-    ce[group_prefix + "books"] = fmli_df.READPQ
-    ce[group_prefix + "charity"] = (
-        fmli_df.CASHCOPQ * CE.proportion_cash_contrib_to_charity
+    categories = list(
+        dict.fromkeys(
+            category
+            for coefficients in coefficient_sets.values()
+            for category in coefficients
+        )
     )
-    ce[group_prefix + "clothes"] = fmli_df.APPARPQ
-    ce[group_prefix + "electricity"] = fmli_df.ELCTRCPQ
-    ce[group_prefix + "food_at_home"] = fmli_df.FDHOMEPQ
-    ce[group_prefix + "food_at_restaurants"] = fmli_df.FDAWAYPQ
-    ce[group_prefix + "furnishings"] = fmli_df.FURNTRPQ
-    ce[group_prefix + "gasoline"] = fmli_df.GASMOPQ  # Inc motor oil.
-    ce[group_prefix + "health"] = fmli_df.HEALTHPQ
-    # Using "fuel oil" but another category includes "other fuels."
-    ce[group_prefix + "home_heating_fuel"] = fmli_df.FULOILPQ
-    ce[group_prefix + "household_supplies"] = fmli_df.OTHHEXPQ
-    # Including personal insurance in this cateogry.
-    ce[group_prefix + "life_insurance"] = fmli_df.LIFINSPQ
-    ce[group_prefix + "mass_transit"] = fmli_df.PUBTRAPQ
-    ce[group_prefix + "natural_gas"] = fmli_df.NTLGASPQ
-    # "Other car services" is maintenance.
-    ce[group_prefix + "other_car_services"] = fmli_df.MAINRPPQ
-    # The word "other" is ignored
-    ce[group_prefix + "other_dwelling_rentals"] = fmli_df.RENDWEPQ
-    # judgement call here. Total outlays including sport equip.
-    ce[group_prefix + "recreation_and_sports"] = fmli_df.EENTRMTP
-    # OTHEQPPQ is part of total entertainment.
-    ce[group_prefix + "other_recreation"] = fmli_df.OTHEQPPQ
-    ce[group_prefix + "telephone"] = fmli_df.TELEPHPQ
-    # tenant occupied dwellings is owned dwellings.
-    ce[group_prefix + "tentant_occupied_dwellings"] = fmli_df.OWNDWEPQ
-    ce[group_prefix + "tobacco"] = fmli_df.TOBACCPQ
-    ce[group_prefix + "water"] = fmli_df.WATRPSPQ
-
-
-def add_carbon_emissions(ce: h5py.File):
+    column = {category: i for i, category in enumerate(categories)}
+    households = len(ce["/household/survey/weight"])
+    expenditures = np.empty((households, len(categories)), dtype=dtype)
+    for category, i in column.items():
+        expenditures[:, i] = ce[group_prefix + category][:]
+    coefficients = np.zeros((len(categories), len(coefficient_sets)), dtype)
+    for j, set_coefficients in enumerate(coefficient_sets.values()):
+        for category, coefficient in set_coefficients.items():
+            coefficients[column[category], j] = coefficient
+    emissions = expenditures @ coefficients
+    return {
+        name: emissions[:, j].astype(np.float64)
+        for j, name in enumerate(coefficient_sets)
+    }
+
+
+def add_carbon_emissions(
+    ce: h5py.File, coefficient_sets: Dict[str, Dict[str, float]] = None
+):
     """Add Carbon Emissions from Fremstad & Paul (2019)'s "extraction method."
 
     The paper is: Fremstad, Anders, and Mark Paul.
@@ -268,13 +561,12 @@ def add_carbon_emissions(ce: h5py.File):
     Args:
         ce (h5py.File): The HDF5 data structure containing the organized
            Consumer Expenditure survey data.
+        coefficient_sets (Dict[str, Dict[str, float]], optional): The sets
+            of coefficients to apply, by the name of the variable under
+            "/household/emissions/" each produces. Defaults to the paper's
+            coefficients, as co2_kg.
     """
-    data = pkgutil.get_data(__name__, "emission_coefficients.yaml")
-    emission_coefficients = yaml.load(data, Loader=yaml.FullLoader)
-    group_prefix = "/household/expenditures/"
-    ce["/household/emissions/co2_kg"] = sum(
-        [
-            emission_coefficients[category] * ce[group_prefix + category][:]
-            for category in emission_coefficients.keys()
-        ]
-    )
+    if coefficient_sets is None:
+        coefficient_sets = dict(co2_kg=emission_coefficients())
+    for name, emissions in carbon_emissions(ce, coefficient_sets).items():
+        ce["/household/emissions/" + name] = emissions
@@ -1,51 +1,38 @@
-import requests
-from io import BytesIO
+from __future__ import annotations
 from zipfile import ZipFile
 
-import pandas as pd
-
 from openfisca_us_data.utils import *
 
 
+def column_manifest() -> Dict[str, Dict[str, str]]:
+    return load_manifest(__name__, "raw_ce_columns.yaml")
+
+
 @dataset
 class RawCE:
     """Raw data extractor class for the Consumer Expenditure Survey"""
 
     name = "raw_ce"
 
-    def generate(year: int, revised_q1=True) -> None:
-        """Save the Raw Consumer Expendure data in HDF5 format via PyTables"""
+    def generate(year: int, revised_q1=True, columns="manifest") -> None:
+        """Save the Raw Consumer Expendure data in HDF5 format via PyTables
+
+        Args:
+            year (int): The year of the Consumer Expenditure survey.
+            revised_q1 (bool): Whether to use the revised first quarter file.
+            columns (str): "manifest" to read only the columns listed in
+                raw_ce_columns.yaml, as compact types, or "full" to read
+                every column.
+        """
+        check_column_mode(columns)
+        year = int(year)
         file_year_code = str(year)[-2:]
         file_year_after_code = str(year + 1)[-2:]
         url = f"https://www.bls.gov/cex/pumd/data/comma/intrvw{file_year_code}.zip"
 
-        response = requests.get(url, stream=True)
-        total_size_in_bytes = int(
-            response.headers.get("content-length", 200e6)
-        )
-        progress_bar = tqdm(
-            total=total_size_in_bytes,
-            unit="iB",
-            unit_scale=True,
-            desc="Downloading CE Survey",
-        )
-        if response.status_code == 404:
-            raise FileNotFoundError(
-                "Received a 404 response when fetching the data."
-            )
+        zip_path = fetch(url, "CE Survey")
         try:
-            with BytesIO() as file, pd.HDFStore(
-                RawCE.file(year), mode="w"
-            ) as storage:
-                content_length_actual = 0
-                for data in response.iter_content(int(1e6)):
-                    progress_bar.update(len(data))
-                    content_length_actual += len(data)
-                    file.write(data)
-                progress_bar.set_description("Downloaded CE Survey Data")
-                progress_bar.total = content_length_actual
-                progress_bar.close()
-                zipfile = ZipFile(file)
+            with RawCE.writer(year) as storage:
                 q1_suffix = "x" if revised_q1 else ""
 
                 dirstring = f"intrvw{file_year_code}/intrvw{file_year_code}"
@@ -56,29 +43,23 @@ class RawCE:
                     f"fmli{file_year_code}4",
                     f"fmli{file_year_after_code}1",
                 ]
-
-                for quarter in range(1, 6):
-                    filename = quarter_filenames[quarter - 1]
-                    with zipfile.open(f"{dirstring}/{filename}.csv") as f:
-                        q_df = pd.read_csv(f)
-                        q_df["nominal_year"] = year
-                        q_df["nominal_quarter"] = quarter
-                        q_df["cu_id"] = (
-                            q_df.NEWID.astype(str).str[:-1].astype(int)
-                        )
-                        q_df["interview_id"] = (
-                            q_df.NEWID.astype(str).str[-1].astype(int)
-                        )
-                        q_df["weight"] = q_df["FINLWT21"]
-                        q_df.rename(
-                            {
-                                "QINTRVMO": "interview_mo",
-                                "QINTRVYR": "interview_yr",
-                            },
-                            axis=1,
-                            inplace=True,
-                        )
-                        storage[filename] = q_df
+                tasks = {
+                    filename: (
+                        zip_path,
+                        f"{dirstring}/{filename}.csv",
+                        year,
+                        quarter,
+                        columns,
+                    )
+                    for quarter, filename in enumerate(quarter_filenames, 1)
+                }
+                with parse_in_parallel(read_quarter, tasks) as parsed:
+                    for filename in quarter_filenames:
+                        with stage("parse quarter"):
+                            quarter = parsed[filename]()
+                            count("rows", len(quarter))
+                        with stage("write quarter"):
+                            storage[filename] = quarter
 
         except Exception as e:
             RawCE.remove(year)
@@ -86,3 +67,42 @@ class RawCE:
                 "Attempted to extract and save the CSV files, "
                 + f"but encountered an error: {e}"
             )
+
+
+def read_quarter(
+    zip_path: Path, member: str, year: int, quarter: int, columns: str
+) -> pd.DataFrame:
+    """Read one quarter's FMLI file from the CE archive.
+
+    Args:
+        zip_path (Path): The path to the CE archive.
+        member (str): The CSV file's name within the archive.
+        year (int): The year of the survey.
+        quarter (int): The nominal quarter, from 1 to 5.
+        columns (str): "manifest" or "full", as in RawCE.generate.
+
+    Returns:
+        pd.DataFrame: The quarter's table, with identifier columns added.
+    """
+    with ZipFile(zip_path) as zipfile, zipfile.open(member) as f:
+        if columns == "manifest":
+            dtypes = column_manifest()["fmli"]
+            q_df = cast_to_manifest(
+                pd.read_csv(f, usecols=list(dtypes)), dtypes
+            )
+        else:
+            q_df = pd.read_csv(f)
+    q_df["nominal_year"] = year
+    q_df["nominal_quarter"] = quarter
+    q_df["cu_id"] = q_df.NEWID.astype(str).str[:-1].astype(int)
+    q_df["interview_id"] = q_df.NEWID.astype(str).str[-1].astype(int)
+    q_df["weight"] = q_df["FINLWT21"]
+    q_df.rename(
+        {
+            "QINTRVMO": "interview_mo",
+            "QINTRVYR": "interview_yr",
+        },
+        axis=1,
+        inplace=True,
+    )
+    return q_df
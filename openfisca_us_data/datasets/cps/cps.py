@@ -1,21 +1,56 @@
-from openfisca_us_data.utils import US, dataset
+from __future__ import annotations
+import warnings
+from typing import Any, Callable, Dict, List, Tuple
+from openfisca_us_data.utils import (
+    US,
+    count,
+    dataset,
+    h5py,
+    load_manifest,
+    np,
+    pd,
+    stage,
+)
 from openfisca_us_data.datasets.cps.raw_cps import RawCPS
-from pandas import DataFrame, Series
-import h5py
-import numpy as np
+from openfisca_us_data.entities import ARRAYS, EntityIndex
+from openfisca_us_data.mapping import VariableMap
+from openfisca_us_data.calibration import calibrate, report
+
+# The weight variable of each entity.
+WEIGHTS = dict(
+    person="person_weight",
+    tax_unit="tax_unit_weight",
+    family="family_weight",
+    spm_unit="spm_unit_weight",
+    household="household_weight",
+)
 
 
 @dataset
 class CPS:
     name = "cps"
     model = US
+    inputs = (RawCPS,)
 
-    def generate(year: int) -> None:
+    def generate(
+        year: int, storage: str = "default", calibration: str = "targets"
+    ) -> None:
         """Generates the CPS dataset.
 
         Args:
             year (int): The year of the raw CPS to use.
+            storage (str): How variables are stored: a setting from
+                writer.STORAGE, e.g. "compact" or "gzip". Defaults to
+                "default".
+            calibration (str): "targets" to calibrate the weights to the
+                totals in calibration_targets.yaml, if it has the year, or
+                "none" to keep the survey's weights. Defaults to "targets".
         """
+        if calibration not in ("targets", "none"):
+            raise ValueError(
+                f"calibration must be 'targets' or 'none', not "
+                f"'{calibration}'."
+            )
 
         # Prepare raw CPS tables
         year = int(year)
@@ -23,47 +58,84 @@ class CPS:
             RawCPS.generate(year)
 
         raw_data = RawCPS.load(year)
-        cps = h5py.File(CPS.file(year), mode="w")
-
-        person, tax_unit, family, spm_unit, household = [
-            raw_data[entity]
-            for entity in (
-                "person",
-                "tax_unit",
-                "family",
-                "spm_unit",
-                "household",
-            )
-        ]
+        cps = CPS.writer(year, storage)
+
+        with stage("load raw tables"):
+            person, tax_unit, family, spm_unit, household = [
+                raw_data[entity]
+                for entity in (
+                    "person",
+                    "tax_unit",
+                    "family",
+                    "spm_unit",
+                    "household",
+                )
+            ]
 
-        add_ID_variables(cps, person, tax_unit, family, spm_unit, household)
-        add_personal_variables(cps, person)
-        add_personal_income_variables(cps, person)
-        add_SPM_variables(cps, spm_unit)
+        with stage("map variables"):
+            variable_map().write(
+                cps,
+                dict(
+                    person=person,
+                    family=family,
+                    spm_unit=spm_unit,
+                    household=household,
+                ),
+            )
+        with stage("add_ID_variables"):
+            add_ID_variables(
+                cps, person, tax_unit, family, spm_unit, household
+            )
+        with stage("add_personal_variables"):
+            add_personal_variables(cps, person)
+        targets = calibration_targets().get(year)
+        if calibration == "targets" and targets is not None:
+            with stage("calibrate"):
+                result = calibrate_weights(cps, targets)
+                count("targets", len(targets))
+                count("iterations", result["iterations"])
+                count("max_relative_error", result["max_relative_error"])
+            if not result["converged"]:
+                warnings.warn(
+                    f"CPS {year} weights didn't converge to the calibration "
+                    f"targets: {result['targets']}"
+                )
 
         raw_data.close()
-        cps.close()
+        with stage("close"):
+            cps.close()
+
+
+def variable_map() -> VariableMap:
+    """The variables copied or derived from columns of the raw CPS tables.
+
+    Returns:
+        VariableMap: The spec in cps_variables.yaml.
+    """
+    return VariableMap.from_yaml(__name__, "cps_variables.yaml")
 
 
 def add_ID_variables(
     cps: h5py.File,
-    person: DataFrame,
-    tax_unit: DataFrame,
-    family: DataFrame,
-    spm_unit: DataFrame,
-    household: DataFrame,
+    person: pd.DataFrame,
+    tax_unit: pd.DataFrame,
+    family: pd.DataFrame,
+    spm_unit: pd.DataFrame,
+    household: pd.DataFrame,
 ):
-    """Add basic ID and weight variables.
+    """Add basic ID variables, and the tax unit weight.
+
+    The other weights are in the variable map, which must be written first.
 
     Args:
         cps (h5py.File): The CPS dataset file.
-        person (DataFrame): The person table of the ASEC.
-        tax_unit (DataFrame): The tax unit table created from the person table
+        person (pd.DataFrame): The person table of the ASEC.
+        tax_unit (pd.DataFrame): The tax unit table created from the person table
             of the ASEC.
-        family (DataFrame): The family table of the ASEC.
-        spm_unit (DataFrame): The SPM unit table created from the person table
+        family (pd.DataFrame): The family table of the ASEC.
+        spm_unit (pd.DataFrame): The SPM unit table created from the person table
             of the ASEC.
-        household (DataFrame): The household table of the ASEC.
+        household (pd.DataFrame): The household table of the ASEC.
     """
     # Add primary and foreign keys
     cps["person_id"] = person.PH_SEQ * 100 + person.P_SEQ
@@ -76,31 +148,31 @@ def add_ID_variables(
     cps["person_household_id"] = person.PH_SEQ
     cps["person_family_id"] = person.PH_SEQ * 10 + person.PF_SEQ
 
-    # Add weights
-    cps["person_weight"] = person.A_FNLWGT / 1e2
-    cps["family_weight"] = family.FSUP_WGT / 1e2
+    # Index persons by the groups containing them.
+    entities = dict(
+        tax_unit=EntityIndex.from_ids(person.TAX_ID, tax_unit.TAX_ID),
+        family=EntityIndex.from_ids(
+            cps["person_family_id"][...], cps["family_id"][...]
+        ),
+        spm_unit=EntityIndex.from_ids(person.SPM_ID, spm_unit.SPM_ID),
+        household=EntityIndex.from_ids(person.PH_SEQ, household.H_SEQ),
+    )
+    for entity, index in entities.items():
+        index.save(cps, entity)
 
     # Tax unit weight is the weight of the containing family.
-    family_weight = Series(
-        cps["family_weight"][...], index=cps["family_id"][...]
+    persons_family_weight = entities["family"].broadcast(
+        cps["family_weight"][...]
     )
-    person_family_id = cps["person_family_id"][...]
-    persons_family_weight = Series(family_weight[person_family_id])
-    cps["tax_unit_weight"] = persons_family_weight.groupby(
-        cps["person_tax_unit_id"][...]
-    ).first()
-
-    cps["spm_unit_weight"] = spm_unit.SPM_WEIGHT / 1e2
-
-    cps["household_weight"] = household.HSUP_WGT / 1e2
+    cps["tax_unit_weight"] = entities["tax_unit"].first(persons_family_weight)
 
 
-def add_personal_variables(cps: h5py.File, person: DataFrame):
+def add_personal_variables(cps: h5py.File, person: pd.DataFrame):
     """Add personal demographic variables.
 
     Args:
         cps (h5py.File): The CPS dataset file.
-        person (DataFrame): The CPS person table.
+        person (pd.DataFrame): The CPS person table.
     """
     cps["age"] = np.where(
         person.A_AGE.between(80, 85),
@@ -109,41 +181,152 @@ def add_personal_variables(cps: h5py.File, person: DataFrame):
     )
 
 
-def add_personal_income_variables(cps: h5py.File, person: DataFrame):
-    """Add income variables.
+def calibration_targets() -> Dict[int, Dict[str, Dict[str, Any]]]:
+    """The administrative totals in calibration_targets.yaml, by year.
+
+    Returns:
+        Dict[int, Dict[str, Dict[str, Any]]]: The spec of each target, by
+            name, for each year.
+    """
+    return load_manifest(__name__, "calibration_targets.yaml")
+
+
+def household_positions(
+    variables: Callable[[str], np.ndarray], entity: str
+) -> np.ndarray:
+    """The position of the household of each row of an entity's table.
+
+    Args:
+        variables (Callable[[str], np.ndarray]): Reads a variable of the
+            CPS dataset, by path.
+        entity (str): The entity, e.g. "person" or "spm_unit".
+
+    Returns:
+        np.ndarray: The household positions.
+    """
+    households = _entity_index(variables, "household")
+    if entity == "person":
+        return households.positions
+    if entity == "household":
+        return np.arange(len(households))
+    return _entity_index(variables, entity).first(households.positions)
+
+
+def _entity_index(
+    variables: Callable[[str], np.ndarray], entity: str
+) -> EntityIndex:
+    return EntityIndex(
+        *(variables(f"/entity_index/{entity}/{name}") for name in ARRAYS)
+    )
+
+
+def calibration_matrix(
+    variables: Callable[[str], np.ndarray],
+    targets: Dict[str, Dict[str, Any]],
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Each household's contribution to each target, under the current
+    weights.
+
+    A target is a total under the weights of its entity, so a household
+    contributes the weighted count (or total of a variable) of its members
+    or units of that entity.
+
+    Args:
+        variables (Callable[[str], np.ndarray]): Reads a variable of the
+            CPS dataset, by path.
+        targets (Dict[str, Dict[str, Any]]): The targets of a year.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The (households x targets) matrix,
+            and the targets' values.
+    """
+    households = len(variables("household_weight"))
+    matrix = np.zeros((households, len(targets)))
+    for i, (name, spec) in enumerate(targets.items()):
+        if ("count" in spec) == ("sum" in spec):
+            raise ValueError(f"Target {name} needs one of 'count' or 'sum'.")
+        entity = spec.get("count", spec.get("entity", "person"))
+        positions = household_positions(variables, entity)
+        values = variables(WEIGHTS[entity])
+        if "sum" in spec:
+            values = values * variables(spec["sum"])
+        # Households' totals are a scatter-add of their members' values.
+        matrix[:, i] = np.bincount(
+            positions, weights=values, minlength=households
+        )
+    return matrix, np.array([spec["value"] for spec in targets.values()])
+
+
+def calibrate_weights(
+    cps: h5py.File, targets: Dict[str, Dict[str, Any]]
+) -> Dict[str, Any]:
+    """Calibrate the weights to targets, scaling the weights of each
+    household's persons and units by one adjustment per household.
+
+    The adjustments are the ratios of calibrated to initial household
+    weights, and each household contributes its weighted totals divided by
+    its weight, so the targets are met by the weights of their entities.
+    Households without weight are left out, with their members' weights.
 
     Args:
         cps (h5py.File): The CPS dataset file.
-        person (DataFrame): The CPS person table.
+        targets (Dict[str, Dict[str, Any]]): The targets of a year.
+
+    Returns:
+        Dict[str, Any]: The report of ``calibration.calibrate``, with the
+            totals under the calibrated weights of each target's entity.
     """
-    cps["e00200"] = person.WSAL_VAL
-    cps["e00900"] = person.SEMP_VAL
-    cps["e02100"] = person.FRSE_VAL
-    cps["e02400"] = person.SS_VAL
-    cps["e02300"] = person.UC_VAL
-
-    # Pensions/annuities
-    other_inc_type = person.OI_OFF
-    cps["e01500"] = other_inc_type.isin((2, 13)) * person.OI_VAL
-
-    # Alimony
-    cps["e00800"] = (person.OI_OFF == 20) * person.OI_VAL
-
-
-def add_SPM_variables(cps: h5py.File, spm_unit: DataFrame):
-    SPM_RENAMES = dict(
-        poverty_threshold="SPM_POVTHRESHOLD",
-        SPM_unit_total_income="SPM_TOTVAL",
-        SPM_unit_SNAP="SPM_SNAPSUB",
-        SPM_unit_capped_housing_subsidy="SPM_CAPHOUSESUB",
-        SPM_unit_school_lunch_subsity="SPM_SCHLUNCH",
-        SPM_unit_energy_subsidy="SPM_ENGVAL",
-        SPM_unit_WIC="SPM_WICVAL",
-        SPM_unit_federal_tax="SPM_FEDTAX",
-        SPM_unit_state_tax="SPM_STTAX",
-        SPM_unit_work_childcare_expenses="SPM_CAPWKCCXPNS",
-        SPM_unit_medical_expenses="SPM_MEDXPNS",
+
+    def variables(name: str) -> np.ndarray:
+        return np.asarray(cps[name][...])
+
+    matrix, values = calibration_matrix(variables, targets)
+    initial = variables("household_weight")
+    weighted = initial > 0
+    fixed = matrix[~weighted].sum(axis=0)
+    weights, result = calibrate(
+        matrix[weighted] / initial[weighted, None],
+        values - fixed,
+        initial[weighted],
+        list(targets),
     )
+    adjustment = np.ones_like(initial, dtype=float)
+    adjustment[weighted] = weights / initial[weighted]
+    for entity, weight in WEIGHTS.items():
+        positions = household_positions(variables, entity)
+        cps[weight][...] = variables(weight) * adjustment[positions]
+    result.update(
+        report(
+            matrix,
+            values,
+            adjustment,
+            np.ones_like(adjustment),
+            list(targets),
+        )
+    )
+    return result
+
+
+def calibration_report(year: int) -> Dict[str, Any]:
+    """Compare a built CPS dataset's weighted totals with its targets.
 
-    for openfisca_variable, asec_variable in SPM_RENAMES.items():
-        cps[openfisca_variable] = spm_unit[asec_variable]
+    Args:
+        year (int): The year of the CPS dataset.
+
+    Returns:
+        Dict[str, Any]: The report of ``calibration.report``.
+    """
+    targets = calibration_targets()[int(year)]
+    names = (
+        [
+            path
+            for entity in ("household", "tax_unit", "family", "spm_unit")
+            for path in (f"/entity_index/{entity}/{name}" for name in ARRAYS)
+        ]
+        + [spec["sum"] for spec in targets.values() if "sum" in spec]
+        + list(WEIGHTS.values())
+    )
+    loaded = CPS.load_many(year, names)
+    matrix, values = calibration_matrix(loaded.__getitem__, targets)
+    # The matrix holds weighted totals already.
+    return report(matrix, values, np.ones(len(matrix)), names=list(targets))
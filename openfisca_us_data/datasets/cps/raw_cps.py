@@ -1,66 +1,106 @@
+from __future__ import annotations
 from openfisca_us_data.utils import *
-import requests
-from io import BytesIO
+from openfisca_us_data.entities import group_table
+from typing import Dict, Iterator, Optional
 from zipfile import ZipFile
-import pandas as pd
+
+# Number of CSV rows parsed and written at a time.
+CHUNKSIZE = 50_000
+# The file name prefix of each table in the ASEC archive.
+MEMBERS = dict(person="pppub", family="ffpub", household="hhpub")
+
+
+def column_manifest() -> Dict[str, Dict[str, str]]:
+    return load_manifest(__name__, "raw_cps_columns.yaml")
+
+
+TAX_UNIT_COLUMNS = [
+    "ACTC_CRD",
+    "AGI",
+    "CTC_CRD",
+    "EIT_CRED",
+    "FED_RET",
+    "FEDTAX_AC",
+    "FEDTAX_BC",
+    "MARG_TAX",
+    "STATETAX_A",
+    "STATETAX_B",
+    "TAX_INC",
+    "TAX_ID",
+]
+
+SPM_UNIT_COLUMNS = [
+    "ACTC",
+    "CAPHOUSESUB",
+    "CAPWKCCXPNS",
+    "CHILDCAREXPNS",
+    "CHILDSUPPD",
+    "EITC",
+    "ENGVAL",
+    "EQUIVSCALE",
+    "FAMTYPE",
+    "FEDTAX",
+    "FEDTAXBC",
+    "FICA",
+    "GEOADJ",
+    "HAGE",
+    "HHISP",
+    "HMARITALSTATUS",
+    "HRACE",
+    "MEDXPNS",
+    "NUMADULTS",
+    "NUMKIDS",
+    "NUMPER",
+    "POOR",
+    "POVTHRESHOLD",
+    "RESOURCES",
+    "SCHLUNCH",
+    "SNAPSUB",
+    "STTAX",
+    "TENMORTSTATUS",
+    "TOTVAL",
+    "WCOHABIT",
+    "WEIGHT",
+    "WFOSTER22",
+    "WICVAL",
+    "WKXPNS",
+    "WNEWHEAD",
+    "WNEWPARENT",
+    "WUI_LT15",
+    "ID",
+]
 
 
 @dataset
 class RawCPS:
     name = "raw_cps"
 
-    def generate(year: int) -> None:
+    def generate(year: int, columns: str = "manifest") -> None:
+        """Save the ASEC person, family and household tables, and the tax
+        unit and SPM unit tables built from them.
+
+        Args:
+            year (int): The year the survey represents.
+            columns (str): "manifest" to read only the columns listed in
+                raw_cps_columns.yaml, as compact types, or "full" to read
+                every column.
+        """
+        check_column_mode(columns)
         # Files are named for a year after the year the survey represents.
         # For example, the 2020 CPS was administered in March 2021, so it's
         # named 2021.
         file_year = int(year) + 1
         file_year_code = str(file_year)[-2:]
         url = f"https://www2.census.gov/programs-surveys/cps/datasets/{file_year}/march/asecpub{file_year_code}csv.zip"
-        response = requests.get(url, stream=True)
-        total_size_in_bytes = int(
-            response.headers.get("content-length", 200e6)
-        )
-        progress_bar = tqdm(
-            total=total_size_in_bytes,
-            unit="iB",
-            unit_scale=True,
-            desc="Downloading ASEC",
-        )
-        if response.status_code == 404:
-            raise FileNotFoundError(
-                "Received a 404 response when fetching the data."
-            )
+        zip_path = fetch(url, "ASEC")
         try:
-            with BytesIO() as file, pd.HDFStore(
-                RawCPS.file(year), mode="w"
-            ) as storage:
-                content_length_actual = 0
-                for data in response.iter_content(int(1e6)):
-                    progress_bar.update(len(data))
-                    content_length_actual += len(data)
-                    file.write(data)
-                progress_bar.set_description("Downloaded ASEC")
-                progress_bar.total = content_length_actual
-                progress_bar.close()
-                zipfile = ZipFile(file)
-                with zipfile.open(f"pppub{file_year_code}.csv") as f:
-                    storage["person"] = person = pd.read_csv(f).fillna(0)
-                with zipfile.open(f"ffpub{file_year_code}.csv") as f:
-                    person_family_id = person.PH_SEQ * 10 + person.PF_SEQ
-                    family = pd.read_csv(f).fillna(0)
-                    family_id = family.FH_SEQ * 10 + family.FFPOS
-                    family = family[family_id.isin(person_family_id)]
-                    storage["family"] = family
-                with zipfile.open(f"hhpub{file_year_code}.csv") as f:
-                    person_household_id = person.PH_SEQ
-                    household = pd.read_csv(f).fillna(0)
-                    household_id = household.H_SEQ
-                    household = household[
-                        household_id.isin(person_household_id)
-                    ]
-                    storage["household"] = household
-                storage["tax_unit"] = create_tax_unit_table(person)
-                storage["spm_unit"] = create_SPM_unit_table(person)
+            with RawCPS.writer(year) as storage:
+                extract_tables(
+                    zip_path,
+                    file_year_code,
+                    storage,
+                    column_manifest() if columns == "manifest" else None,
+                )
         except Exception as e:
             RawCPS.remove(year)
             raise ValueError(
@@ -68,67 +108,159 @@ class RawCPS:
             )
 
 
-def create_tax_unit_table(person: pd.DataFrame) -> pd.DataFrame:
-    TAX_UNIT_COLUMNS = [
-        "ACTC_CRD",
-        "AGI",
-        "CTC_CRD",
-        "EIT_CRED",
-        "FED_RET",
-        "FEDTAX_AC",
-        "FEDTAX_BC",
-        "MARG_TAX",
-        "STATETAX_A",
-        "STATETAX_B",
-        "TAX_INC",
-        "TAX_ID",
+def extract_tables(
+    zip_path: Path,
+    file_year_code: str,
+    storage: pd.HDFStore,
+    manifest: Optional[Dict[str, Dict[str, str]]] = None,
+    chunksize: int = CHUNKSIZE,
+    workers: int = None,
+) -> None:
+    """Parse the ASEC CSV files in chunks and append them to storage.
+
+    Files are streamed, and only the person identifiers and the columns
+    needed for the tax unit and SPM unit tables are kept in memory across
+    chunks. With several workers, the files are parsed concurrently, each a
+    few chunks ahead of the writes, and families and households are filtered
+    once the person file is written.
+
+    Args:
+        zip_path (Path): The path to the ASEC CSV archive.
+        file_year_code (str): The two-digit year in the archive's file names.
+        storage (pd.HDFStore): The store to write the tables to (or its
+            Parquet counterpart).
+        manifest (Dict[str, Dict[str, str]], optional): The columns to read
+            from each table, and their types. Defaults to every column.
+        chunksize (int): The number of rows to parse at a time.
+        workers (int, optional): The number of processes parsing files.
+            Defaults to utils.parse_workers.
+    """
+    unit_columns = TAX_UNIT_COLUMNS + [
+        "SPM_" + column for column in SPM_UNIT_COLUMNS
     ]
-    return person[TAX_UNIT_COLUMNS].groupby(person.TAX_ID).sum()
+    manifest = manifest or {}
+    tasks = {
+        table: (
+            zip_path,
+            f"{prefix}{file_year_code}.csv",
+            chunksize,
+            manifest.get(table),
+        )
+        for table, prefix in MEMBERS.items()
+    }
+    with parse_in_parallel(read_member_chunks, tasks, workers) as parsed:
+        person_family_id = []
+        person_household_id = []
+        units = []
+        for person in stages("parse person", parsed["person"]()):
+            with stage("write person"):
+                storage.append("person", person)
+            person_family_id.append(person.PH_SEQ * 10 + person.PF_SEQ)
+            person_household_id.append(person.PH_SEQ)
+            units.append(person[unit_columns])
+        person_family_id = pd.concat(person_family_id).unique()
+        person_household_id = pd.concat(person_household_id).unique()
+        for family in stages("parse family", parsed["family"]()):
+            family_id = family.FH_SEQ * 10 + family.FFPOS
+            family = family[family_id.isin(person_family_id)]
+            if len(family) > 0:
+                with stage("write family"):
+                    storage.append("family", family)
+        for household in stages("parse household", parsed["household"]()):
+            household_id = household.H_SEQ
+            household = household[household_id.isin(person_household_id)]
+            if len(household) > 0:
+                with stage("write household"):
+                    storage.append("household", household)
+    units = pd.concat(units)
+    with stage("tax unit table"):
+        tax_unit = create_tax_unit_table(units)
+    with stage("write tax_unit"):
+        storage["tax_unit"] = tax_unit
+    with stage("SPM unit table"):
+        spm_unit = create_SPM_unit_table(units)
+    with stage("write spm_unit"):
+        storage["spm_unit"] = spm_unit
+
+
+def read_member_chunks(
+    zip_path: Path,
+    member: str,
+    chunksize: int,
+    dtypes: Optional[Dict[str, str]] = None,
+) -> Iterator[pd.DataFrame]:
+    """Read a CSV archive member in chunks, as read_csv_chunks does."""
+    with ZipFile(zip_path) as zipfile:
+        yield from read_csv_chunks(zipfile, member, chunksize, dtypes)
+
+
+def read_csv_chunks(
+    zipfile: ZipFile,
+    member: str,
+    chunksize: int,
+    dtypes: Optional[Dict[str, str]] = None,
+) -> Iterator[pd.DataFrame]:
+    """Read a CSV archive member in chunks with consistent column types.
+
+    Args:
+        zipfile (ZipFile): The open archive.
+        member (str): The CSV file name within the archive.
+        chunksize (int): The number of rows per chunk.
+        dtypes (Dict[str, str], optional): The columns to read and their
+            types. Defaults to every column, with inferred types.
+
+    Yields:
+        pd.DataFrame: Chunks of the CSV file, with missing values as zero.
+    """
+    if dtypes is not None:
+        with zipfile.open(member) as f:
+            for chunk in pd.read_csv(
+                f, usecols=list(dtypes), chunksize=chunksize
+            ):
+                yield cast_to_manifest(chunk.fillna(0), dtypes)
+        return
+    with zipfile.open(member) as f:
+        dtypes = infer_csv_dtypes(f, chunksize)
+    with zipfile.open(member) as f:
+        for chunk in pd.read_csv(f, dtype=dtypes, chunksize=chunksize):
+            yield chunk.fillna(0)
+
+
+def infer_csv_dtypes(file, chunksize: int) -> Dict[str, type]:
+    """Find the column types pandas would infer when reading a whole CSV.
+
+    Chunks are typed independently, so a column with a missing value in one
+    chunk only would otherwise be stored as int64 in some chunks and float64
+    in others.
+
+    Args:
+        file: The open CSV file.
+        chunksize (int): The number of rows per chunk.
+
+    Returns:
+        Dict[str, type]: The dtype of each column.
+    """
+    dtypes = {}
+    for chunk in pd.read_csv(file, chunksize=chunksize):
+        for column, dtype in chunk.dtypes.items():
+            if column not in dtypes:
+                dtypes[column] = dtype
+            elif dtypes[column] != dtype:
+                try:
+                    dtypes[column] = np.promote_types(dtypes[column], dtype)
+                except TypeError:
+                    dtypes[column] = str
+    return dtypes
+
+
+def create_tax_unit_table(person: pd.DataFrame) -> pd.DataFrame:
+    return group_table(person, "TAX_ID", TAX_UNIT_COLUMNS, "sum")
 
 
 def create_SPM_unit_table(person: pd.DataFrame) -> pd.DataFrame:
-    SPM_UNIT_COLUMNS = [
-        "ACTC",
-        "CAPHOUSESUB",
-        "CAPWKCCXPNS",
-        "CHILDCAREXPNS",
-        "CHILDSUPPD",
-        "EITC",
-        "ENGVAL",
-        "EQUIVSCALE",
-        "FAMTYPE",
-        "FEDTAX",
-        "FEDTAXBC",
-        "FICA",
-        "GEOADJ",
-        "HAGE",
-        "HHISP",
-        "HMARITALSTATUS",
-        "HRACE",
-        "MEDXPNS",
-        "NUMADULTS",
-        "NUMKIDS",
-        "NUMPER",
-        "POOR",
-        "POVTHRESHOLD",
-        "RESOURCES",
-        "SCHLUNCH",
-        "SNAPSUB",
-        "STTAX",
-        "TENMORTSTATUS",
-        "TOTVAL",
-        "WCOHABIT",
-        "WEIGHT",
-        "WFOSTER22",
-        "WICVAL",
-        "WKXPNS",
-        "WNEWHEAD",
-        "WNEWPARENT",
-        "WUI_LT15",
-        "ID",
-    ]
-    return (
-        person[["SPM_" + column for column in SPM_UNIT_COLUMNS]]
-        .groupby(person.SPM_ID)
-        .first()
+    return group_table(
+        person,
+        "SPM_ID",
+        ["SPM_" + column for column in SPM_UNIT_COLUMNS],
+        "first",
     )
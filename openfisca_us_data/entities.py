@@ -0,0 +1,276 @@
+"""Mapping persons to the groups containing them.
+
+An ``EntityIndex`` describes how the rows of the person table belong to the
+rows of a group entity's table (tax units, families, SPM units or
+households), in compressed sparse row form:
+
+- ``ids``: the group IDs, in the order of the entity's table.
+- ``positions``: the position in ``ids`` of each person's group.
+- ``order``: the persons, sorted stably by group.
+- ``offsets``: where each group's persons start in ``order``, with a final
+  entry for the number of persons.
+
+Moving values between persons and groups is then a gather or a segmented
+reduction over arrays, instead of aligning pandas indices. Model datasets
+store their indices under ``/entity_index/<entity>/``.
+"""
+
+from __future__ import annotations
+from typing import Any, List
+from openfisca_us_data.lazy import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+ARRAYS = ("ids", "positions", "order", "offsets")
+
+
+class EntityIndex:
+    """The persons in each group of an entity.
+
+    Args:
+        ids (np.ndarray): The group IDs, in the entity's order.
+        positions (np.ndarray): The group position of each person.
+        order (np.ndarray): The persons, sorted stably by group.
+        offsets (np.ndarray): The start of each group's persons in
+            ``order``, followed by the number of persons.
+    """
+
+    def __init__(
+        self,
+        ids: np.ndarray,
+        positions: np.ndarray,
+        order: np.ndarray,
+        offsets: np.ndarray,
+    ):
+        self.ids = ids
+        self.positions = positions
+        self.order = order
+        self.offsets = offsets
+
+    @classmethod
+    def from_ids(
+        cls, person_group_ids: Any, group_ids: Any = None
+    ) -> EntityIndex:
+        """Index persons by the ID of their group.
+
+        Args:
+            person_group_ids (array-like): The group ID of each person.
+            group_ids (array-like, optional): The IDs of the entity's table,
+                which sets the order of groups. Defaults to the sorted unique
+                IDs of the persons' groups.
+
+        Returns:
+            EntityIndex: The index.
+        """
+        person_group_ids = np.asarray(person_group_ids).reshape(-1)
+        if group_ids is None:
+            # One stable sort gives the groups, their order and boundaries.
+            order = np.argsort(person_group_ids, kind="stable")
+            sorted_ids = person_group_ids[order]
+            starts = np.ones(len(sorted_ids), dtype=bool)
+            starts[1:] = sorted_ids[1:] != sorted_ids[:-1]
+            ids = sorted_ids[starts]
+            positions = np.empty(len(order), dtype=np.intp)
+            positions[order] = np.cumsum(starts) - 1
+            offsets = np.append(np.flatnonzero(starts), len(order))
+            return cls(ids, positions, order, offsets.astype(np.int64))
+        ids = np.asarray(group_ids)
+        sorter = np.argsort(ids, kind="stable")
+        sorted_ids = ids[sorter]
+        if (sorted_ids[1:] == sorted_ids[:-1]).any():
+            raise ValueError("Group IDs must be unique.")
+        found = np.searchsorted(sorted_ids, person_group_ids)
+        found = np.minimum(found, len(ids) - 1)
+        missing = (
+            sorted_ids[found] != person_group_ids
+            if len(ids)
+            else np.ones(len(person_group_ids), dtype=bool)
+        )
+        if missing.any():
+            raise ValueError(
+                f"{missing.sum()} persons belong to groups missing from "
+                f"the group IDs, e.g. {person_group_ids[missing][0]}."
+            )
+        positions = sorter[found]
+        order = np.argsort(positions, kind="stable")
+        offsets = np.zeros(len(ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(positions, minlength=len(ids)), out=offsets[1:])
+        return cls(ids, positions, order, offsets)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def count(self) -> np.ndarray:
+        """The number of persons in each group."""
+        return np.diff(self.offsets)
+
+    def broadcast(self, values: Any) -> np.ndarray:
+        """Give each person the value of their group.
+
+        Args:
+            values (array-like): A value for each group.
+
+        Returns:
+            np.ndarray: A value for each person.
+        """
+        return np.asarray(values)[self.positions]
+
+    def first(self, values: Any) -> np.ndarray:
+        """Take the value of each group's first person, in person order.
+
+        Args:
+            values (array-like): A value for each person.
+
+        Returns:
+            np.ndarray: A value for each group.
+        """
+        if (self.count() == 0).any():
+            raise ValueError("Empty groups have no first person.")
+        return np.asarray(values)[self.order[self.offsets[:-1]]]
+
+    def sum(self, values: Any) -> np.ndarray:
+        """Add up the values of each group's persons.
+
+        Args:
+            values (array-like): A value for each person.
+
+        Returns:
+            np.ndarray: The total for each group, zero for empty groups.
+        """
+        values = np.asarray(values)[self.order]
+        totals = np.zeros(len(self), dtype=np.add.reduce(values[:0]).dtype)
+        nonempty = self.count() > 0
+        if len(values):
+            totals[nonempty] = np.add.reduceat(
+                values, self.offsets[:-1][nonempty], dtype=totals.dtype
+            )
+        return totals
+
+    def save(self, f: Any, entity: str) -> None:
+        """Store the index in a model dataset being written.
+
+        Args:
+            f: The dataset's writer (or h5py file).
+            entity (str): The entity's name, e.g. "tax_unit".
+        """
+        for name in ARRAYS:
+            f[f"/entity_index/{entity}/{name}"] = getattr(self, name)
+
+    @classmethod
+    def load(cls, dataset: type, year: int, entity: str) -> EntityIndex:
+        """Load an index stored in a model dataset.
+
+        Args:
+            dataset (type): The dataset class, e.g. CPS.
+            year (int): The year of the dataset.
+            entity (str): The entity's name, e.g. "tax_unit".
+
+        Returns:
+            EntityIndex: The index.
+        """
+        paths = [f"/entity_index/{entity}/{name}" for name in ARRAYS]
+        arrays = dataset.load_many(year, paths)
+        return cls(*(arrays[path] for path in paths))
+
+
+def group_table(
+    table: pd.DataFrame, key: str, columns: List[str], how: str
+) -> pd.DataFrame:
+    """Reduce a table to one row per group, with one sort of the key.
+
+    The result matches ``table[columns].groupby(table[key]).<how>()``
+    exactly, including types and floating-point rounding, except that the
+    key column (if in ``columns``) holds each group's ID rather than being
+    dropped or reduced.
+
+    Args:
+        table (pd.DataFrame): The table, e.g. of persons.
+        key (str): The column identifying each row's group.
+        columns (List[str]): The columns to reduce.
+        how (str): "sum" or "first" (the first value which isn't missing).
+
+    Returns:
+        pd.DataFrame: The groups, indexed by the sorted group IDs.
+    """
+    if how not in ("sum", "first"):
+        raise ValueError(f"how must be 'sum' or 'first', not '{how}'.")
+    keys = table[key].to_numpy()
+    kept = ~pd.isna(keys)
+    if not kept.all():
+        table = table[kept]
+        keys = keys[kept]
+    index = EntityIndex.from_ids(keys)
+    reduce = _group_sum if how == "sum" else _group_first
+    return pd.DataFrame(
+        {
+            column: (
+                index.ids
+                if column == key
+                else reduce(index, table[column].to_numpy())
+            )
+            for column in columns
+        },
+        index=pd.Index(index.ids, name=key),
+    )
+
+
+def _group_first(index: EntityIndex, values: np.ndarray) -> np.ndarray:
+    values = values[index.order]
+    starts = index.offsets[:-1]
+    missing = pd.isna(values)
+    if not missing.any():
+        return values[starts]
+    # The first position at or after each row with a value.
+    positions = np.where(missing, len(values), np.arange(len(values)))
+    next_value = np.minimum.accumulate(positions[::-1])[::-1]
+    first = next_value[starts]
+    found = first < index.offsets[1:]
+    result = values[np.where(found, first, starts)]
+    if not found.all():
+        result = result.astype(np.result_type(result.dtype, np.float64))
+        result[~found] = np.nan
+    return result
+
+
+def _group_sum(index: EntityIndex, values: np.ndarray) -> np.ndarray:
+    kind = values.dtype.kind
+    if kind in "biu":
+        accumulator = np.uint64 if kind == "u" else np.int64
+        totals = np.zeros(len(index), dtype=accumulator)
+        nonempty = index.count() > 0
+        if len(values):
+            totals[nonempty] = np.add.reduceat(
+                values[index.order].astype(accumulator),
+                index.offsets[:-1][nonempty],
+            )
+        # Totals keep the values' integer type if they all fit in it.
+        if kind != "b" and np.can_cast(values.dtype, accumulator):
+            info = np.iinfo(values.dtype)
+            if len(totals) == 0 or (
+                totals.min() >= info.min and totals.max() <= info.max
+            ):
+                return totals.astype(values.dtype)
+        return totals
+    if kind != "f":
+        raise TypeError(f"Can't sum values of type {values.dtype}.")
+    # Kahan summation in the values' precision, over each group's rows in
+    # order, processing the k-th row of every group at once.
+    values = values[index.order]
+    starts = index.offsets[:-1]
+    counts = index.count()
+    totals = np.zeros(len(index), dtype=values.dtype)
+    compensation = np.zeros(len(index), dtype=values.dtype)
+    groups = np.arange(len(index))
+    with np.errstate(invalid="ignore", over="ignore"):
+        for k in range(counts.max(initial=0)):
+            groups = groups[counts[groups] > k]
+            value = values[starts[groups] + k]
+            valid = ~np.isnan(value)
+            group, value = groups[valid], value[valid]
+            y = value - compensation[group]
+            t = totals[group] + y
+            c = t - totals[group] - y
+            compensation[group] = np.where(np.isnan(c), 0, c)
+            totals[group] = t
+    return totals
@@ -0,0 +1,137 @@
+"""Fingerprints of dataset builds, used to skip builds whose inputs haven't
+changed.
+
+Each output has a build record next to it (``<name>_<year>.build.json``)
+holding:
+
+- ``inputs``: a hash of everything that determines the output before it's
+  built: the package version, the source of the dataset's module, the YAML
+  files it reads and the package modules builds share (``HELPERS``), the
+  arguments to ``generate`` (with their defaults), the contents of files
+  named by those arguments (``input_files``) and the fingerprints of the
+  datasets it's built from, in each year it's built from (``input_years``).
+- ``sources``: the SHA-256 of each file downloaded during the build.
+- ``fingerprint``: a hash of both, identifying the output's content for the
+  datasets built from it.
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+import sys
+from typing import Any, Dict
+
+# The package's modules which datasets are built with, beside their own.
+HELPERS = (
+    "calibration.py",
+    "entities.py",
+    "mapping.py",
+    "parquet.py",
+    "replicates.py",
+    "utils.py",
+    "writer.py",
+)
+
+
+def package_version() -> str:
+    try:
+        from importlib.metadata import version, PackageNotFoundError
+    except ImportError:  # Python 3.7
+        from importlib_metadata import version, PackageNotFoundError
+    try:
+        return version("openfisca-us-data")
+    except PackageNotFoundError:
+        return "unknown"
+
+
+def code_hash(cls: type) -> str:
+    """Hash the module defining a dataset, the YAML files it reads from its
+    directory and the helper modules it's built with."""
+    module = Path(sys.modules[cls.__module__].__file__)
+    source = module.read_bytes()
+    digest = hashlib.sha256(source)
+    for config in sorted(module.parent.glob("*.yaml")):
+        if config.name.encode() in source:
+            digest.update(config.name.encode())
+            digest.update(config.read_bytes())
+    package = Path(__file__).parent
+    for helper in HELPERS:
+        digest.update(helper.encode())
+        digest.update((package / helper).read_bytes())
+    return digest.hexdigest()
+
+
+def file_hash(path: Path) -> str:
+    """The SHA-256 of a file's contents, or None if it doesn't exist."""
+    path = Path(path)
+    if not path.exists():
+        return None
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def hash_json(data: Any) -> str:
+    return hashlib.sha256(
+        json.dumps(data, sort_keys=True, default=str).encode()
+    ).hexdigest()
+
+
+def inputs_hash(cls: type, year: int, arguments: Dict[str, Any]) -> str:
+    """Hash everything that determines a dataset's output, before building.
+
+    Args:
+        cls (type): The dataset.
+        year (int): The year of the output.
+        arguments (Dict[str, Any]): The other arguments to ``generate``, by
+            name, with their defaults.
+
+    Returns None if a dataset it's built from has no build record.
+    """
+    parents = {}
+    for parent_year in cls.input_years(year, **arguments):
+        for parent in cls.inputs:
+            record = read_record(parent.build_record(parent_year))
+            if record is None:
+                return None
+            parents[f"{parent.name}:{int(parent_year)}"] = record[
+                "fingerprint"
+            ]
+    files = {
+        str(path): file_hash(path)
+        for path in cls.input_files(year, **arguments)
+    }
+    return hash_json(
+        dict(
+            version=package_version(),
+            code=code_hash(cls),
+            year=int(year),
+            arguments=arguments,
+            files=files,
+            parents=parents,
+        )
+    )
+
+
+def read_record(path: Path) -> Dict[str, Any]:
+    if not path.exists():
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_record(path: Path, inputs: str, sources: Dict[str, str]) -> None:
+    record = dict(
+        inputs=inputs,
+        sources=sources,
+        fingerprint=hash_json(dict(inputs=inputs, sources=sources)),
+    )
+    temporary = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(temporary, "w") as f:
+        json.dump(record, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary, path)
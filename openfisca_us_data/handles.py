@@ -0,0 +1,68 @@
+"""A per-process pool of open, read-only HDF5 files.
+
+Loading a variable reuses the pooled handle for its dataset file instead of
+opening and closing the file each time. The least recently used handles are
+closed once more than ``MAX_OPEN_FILES`` are open, and every handle is closed
+before the process forks, so children never share HDF5 state with their
+parent. A handle is reopened if its file has been replaced since.
+"""
+
+from __future__ import annotations
+import atexit
+from collections import OrderedDict
+import os
+from pathlib import Path
+from typing import Hashable
+from openfisca_us_data.lazy import lazy_import
+from openfisca_us_data.writer import compression_filters
+
+h5py = lazy_import("h5py")
+
+MAX_OPEN_FILES = 16
+
+# Maps keys to the open file and the (inode, mtime, size) it was opened at.
+_pool = OrderedDict()
+
+
+def open_file(key: Hashable, path: Path) -> h5py.File:
+    """Get an open, read-only handle to a file from the pool.
+
+    Args:
+        key (Hashable): The pool key, e.g. (dataset name, year).
+        path (Path): The file to open.
+
+    Returns:
+        h5py.File: The handle, which callers must not close.
+    """
+    stat = os.stat(path)
+    signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    if key in _pool:
+        handle, opened = _pool[key]
+        if opened == signature and handle.id.valid:
+            _pool.move_to_end(key)
+            return handle
+        close(key)
+    compression_filters()
+    handle = h5py.File(path, mode="r")
+    _pool[key] = handle, signature
+    while len(_pool) > MAX_OPEN_FILES:
+        close(next(iter(_pool)))
+    return handle
+
+
+def close(key: Hashable) -> None:
+    """Close and remove a handle from the pool, if present."""
+    if key in _pool:
+        handle, _ = _pool.pop(key)
+        if handle.id.valid:
+            handle.close()
+
+
+def close_all() -> None:
+    for key in list(_pool):
+        close(key)
+
+
+atexit.register(close_all)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(before=close_all)
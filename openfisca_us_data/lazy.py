@@ -0,0 +1,24 @@
+"""Deferred imports of heavy dependencies.
+
+Modules in this package refer to pandas, numpy, h5py and other large
+dependencies through ``lazy_import``, so importing the package (or a dataset
+class) doesn't import them. They are imported the first time one of their
+attributes is used, which happens inside ``generate`` or ``load``.
+"""
+
+from importlib import import_module
+from types import ModuleType
+
+
+class LazyModule(ModuleType):
+    """A module which is imported on first attribute access."""
+
+    def __getattr__(self, attribute: str):
+        module = import_module(self.__name__)
+        # Later lookups find the module's attributes without this hook.
+        self.__dict__.update(module.__dict__)
+        return getattr(module, attribute)
+
+
+def lazy_import(name: str) -> ModuleType:
+    return LazyModule(name)
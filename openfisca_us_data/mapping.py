@@ -0,0 +1,234 @@
+"""Computing model variables from raw tables with a declarative spec.
+
+Model datasets describe the variables they copy or derive from raw table
+columns in a YAML file next to their module, by table:
+
+    person:
+      e00200: WSAL_VAL                  # a renamed column
+      person_weight:                    # a scaled column
+        column: A_FNLWGT
+        divide: 100
+      e01500:                           # a masked column
+        column: OI_VAL
+        where: {OI_OFF: [2, 13]}
+    fmli:
+      household:                        # a group of variables
+        expenditures:
+          autos:                        # a sum of columns
+            sum: [CARTKUPQ, CARTKNPQ, VRNTLOPQ]
+          charity:                      # a column times a named constant
+            column: CASHCOPQ
+            multiply: proportion_cash_contrib_to_charity
+
+Variables nested in groups are written to paths, e.g.
+"/household/expenditures/autos". A variable's value is its column (or the
+sum of its columns, from left to right), kept where each ``where`` column
+holds one of the given values and zero elsewhere, then multiplied and
+divided by any factors. Factors are numbers, or the names of constants
+given to ``VariableMap``.
+
+``VariableMap.write`` evaluates every variable of a table in one pass: each
+column and mask is read from the table once, however many variables use it,
+and the variables are computed with NumPy rather than pandas.
+"""
+
+from __future__ import annotations
+from typing import Any, Dict, List, Mapping, Tuple, Union
+from openfisca_us_data.lazy import lazy_import
+from openfisca_us_data.profiling import count, stage
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+KEYS = {"column", "sum", "where", "multiply", "divide"}
+
+
+class Variable:
+    """A variable compiled from its spec.
+
+    Args:
+        path (str): The variable's name or path.
+        spec (Union[str, Dict[str, Any]]): A column name, or a mapping of
+            ``column`` or ``sum``, and optionally ``where``, ``multiply``
+            and ``divide``.
+        constants (Dict[str, float]): The values of named factors.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        spec: Union[str, Dict[str, Any]],
+        constants: Dict[str, float],
+    ):
+        self.path = path
+        if isinstance(spec, str):
+            spec = dict(column=spec)
+        unknown = set(spec) - KEYS
+        if unknown:
+            raise ValueError(
+                f"{path} has unknown keys {sorted(unknown)}: expected some "
+                f"of {sorted(KEYS)}."
+            )
+        if ("column" in spec) == ("sum" in spec):
+            raise ValueError(f"{path} needs one of 'column' or 'sum'.")
+        self.columns = (
+            [spec["column"]] if "column" in spec else list(spec["sum"])
+        )
+        if not self.columns:
+            raise ValueError(f"{path} sums no columns.")
+        self.where = [
+            (column, tuple(values))
+            for column, values in spec.get("where", {}).items()
+        ]
+        self.multiply = self._factor(spec.get("multiply"), constants)
+        self.divide = self._factor(spec.get("divide"), constants)
+
+    def _factor(self, factor: Union[float, str], constants) -> float:
+        if isinstance(factor, str):
+            if factor not in constants:
+                raise KeyError(f"{self.path} uses unknown constant {factor}.")
+            return constants[factor]
+        return factor
+
+    def requires(self) -> List[str]:
+        """The table columns the variable is computed from."""
+        return self.columns + [column for column, _ in self.where]
+
+    def evaluate(
+        self,
+        columns: Dict[str, np.ndarray],
+        masks: Dict[Tuple[str, Tuple], np.ndarray],
+    ) -> np.ndarray:
+        """Compute the variable from its table's columns.
+
+        Args:
+            columns (Dict[str, np.ndarray]): The table's columns, by name.
+            masks (Dict[Tuple[str, Tuple], np.ndarray]): Masks computed so
+                far, by column and values, which are shared between
+                variables and added to.
+
+        Returns:
+            np.ndarray: The variable's values.
+        """
+        values = columns[self.columns[0]]
+        for column in self.columns[1:]:
+            values = values + columns[column]
+        for condition in self.where:
+            if condition not in masks:
+                column, kept = condition
+                masks[condition] = np.isin(columns[column], kept)
+            values = masks[condition] * values
+        if self.multiply is not None:
+            values = values * self.multiply
+        if self.divide is not None:
+            values = values / self.divide
+        return values
+
+
+class VariableMap:
+    """The variables a model dataset computes from each raw table.
+
+    Args:
+        spec (Dict[str, Dict[str, Any]]): The variables of each table, by
+            table name, as described in this module's docstring.
+        constants (Dict[str, float], optional): The values of named
+            factors.
+    """
+
+    def __init__(
+        self,
+        spec: Dict[str, Dict[str, Any]],
+        constants: Dict[str, float] = None,
+    ):
+        constants = constants or {}
+        self.tables = {
+            table: [
+                Variable(path, variable_spec, constants)
+                for path, variable_spec in _flatten(variables)
+            ]
+            for table, variables in spec.items()
+        }
+
+    @staticmethod
+    def from_yaml(package: str, resource: str, **constants) -> VariableMap:
+        """Load a spec stored next to a module.
+
+        Args:
+            package (str): The module the spec is stored next to.
+            resource (str): The spec's file name.
+            **constants: The values of named factors.
+
+        Returns:
+            VariableMap: The compiled spec.
+        """
+        from openfisca_us_data.utils import load_manifest
+
+        return VariableMap(load_manifest(package, resource), constants)
+
+    def requires(self, table: str) -> List[str]:
+        """The columns of a table the variables are computed from."""
+        return list(
+            dict.fromkeys(
+                column
+                for variable in self.tables[table]
+                for column in variable.requires()
+            )
+        )
+
+    def evaluate(self, table: str, df: pd.DataFrame) -> Dict[str, np.ndarray]:
+        """Compute the variables of a table.
+
+        Args:
+            table (str): The table's name in the spec.
+            df (pd.DataFrame): The table.
+
+        Returns:
+            Dict[str, np.ndarray]: The values of each variable, by path.
+        """
+        missing = set(self.requires(table)) - set(df.columns)
+        if missing:
+            raise KeyError(
+                f"The {table} table lacks columns {sorted(missing)}."
+            )
+        columns = {
+            column: df[column].to_numpy() for column in self.requires(table)
+        }
+        masks = {}
+        return {
+            variable.path: variable.evaluate(columns, masks)
+            for variable in self.tables[table]
+        }
+
+    def write(self, writer: Any, tables: Mapping[str, pd.DataFrame]) -> None:
+        """Compute the variables of each table and write them.
+
+        Args:
+            writer (Any): The dataset writer, or any mapping to assign
+                variables to. A writer's ``entities``, if it has them, record
+                the table each variable is computed from, as its entity.
+            tables (Mapping[str, pd.DataFrame]): The raw tables, by name.
+                Every table in the spec is required.
+        """
+        entities = getattr(writer, "entities", None)
+        for table in self.tables:
+            with stage(table):
+                variables = self.evaluate(table, tables[table])
+                for path, values in variables.items():
+                    writer[path] = values
+                    if entities is not None:
+                        entities[path.strip("/")] = table
+                count("variables", len(variables))
+
+
+def _flatten(
+    variables: Dict[str, Any], prefix: str = ""
+) -> List[Tuple[str, Any]]:
+    """The specs of variables nested in groups, with their paths."""
+    flattened = []
+    for name, spec in variables.items():
+        path = f"{prefix}/{name}" if prefix else name
+        if isinstance(spec, dict) and not KEYS & set(spec):
+            flattened += _flatten(spec, path if prefix else "/" + name)
+        else:
+            flattened.append((path, spec))
+    return flattened
@@ -0,0 +1,444 @@
+"""The Parquet storage backend.
+
+A dataset stored as Parquet is a directory (``<name>_<year>.parquet``) with
+one Parquet file per table:
+
+- Raw datasets store each of their tables (``person``, ``household``, ...) as
+  ``<table>.parquet``. Tables appended in chunks get a row group per chunk,
+  whose statistics let filtered loads skip row groups.
+- Model datasets store each variable as a column of the table for its
+  entity. Variables in an HDF5-style group (``/household/...``) form a table
+  named after the group; other variables form the table of their entity
+  (``person``, ``tax_unit``, ...), whose ``<entity>_id`` variable it holds,
+  found by ``ParquetVariableWriter._entity``. Variables of no entity form one
+  table per length. ``variables.json`` records the table and column of each
+  variable.
+
+Loads read only the requested columns, apply filters (in pyarrow's
+``[(column, op, value), ...]`` form) using row group statistics, and convert
+columns to NumPy without copying where Arrow's memory layout allows, in which
+case the arrays are read-only.
+
+pyarrow is an optional dependency: ``pip install openfisca-us-data[parquet]``.
+"""
+
+from __future__ import annotations
+import json
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Tuple
+from openfisca_us_data.lazy import lazy_import
+from openfisca_us_data.writer import VariableWriter
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+pa = lazy_import("pyarrow")
+pq = lazy_import("pyarrow.parquet")
+
+VARIABLES = "variables.json"
+# Rows per row group of model dataset tables.
+ROW_GROUP_ROWS = 1 << 16
+# Parquet codecs used for the writer's compression settings.
+CODECS = {None: "snappy", "gzip": "gzip", "lz4": "lz4", "blosc": "zstd"}
+
+
+def to_numpy(column: pa.ChunkedArray) -> np.ndarray:
+    """Convert an Arrow column to NumPy, without copying if possible.
+
+    Single-chunk numeric columns without missing values share the Arrow
+    buffer; others (several row groups, booleans) are copied once.
+    """
+    if column.num_chunks == 1 and column.null_count == 0:
+        try:
+            return column.chunk(0).to_numpy(zero_copy_only=True)
+        except pa.ArrowInvalid:
+            pass
+    return column.to_numpy()
+
+
+def read_table(
+    path: Path, columns: List[str] = None, filters: List = None
+) -> pa.Table:
+    return pq.read_table(
+        path, columns=columns, filters=filters or None, memory_map=True
+    )
+
+
+class ParquetTableWriter:
+    """Writes the tables of a raw dataset, with the interface of the
+    ``pd.HDFStore`` raw datasets write to.
+
+    Args:
+        directory (Path): The dataset's directory.
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._writers = {}
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key.strip('/')}.parquet"
+
+    def __setitem__(self, key: str, df: pd.DataFrame) -> None:
+        self._close(key)
+        pq.write_table(pa.Table.from_pandas(df), self._path(key))
+
+    def append(self, key: str, df: pd.DataFrame) -> None:
+        """Append rows to a table, as a new row group.
+
+        Appended tables don't keep the chunks' index, as the rows' position
+        in the table already identifies them.
+        """
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if key not in self._writers:
+            self._writers[key] = pq.ParquetWriter(
+                self._path(key), table.schema
+            )
+        self._writers[key].write_table(table)
+
+    def _close(self, key: str) -> None:
+        if key in self._writers:
+            self._writers.pop(key).close()
+
+    def close(self) -> None:
+        for key in list(self._writers):
+            self._close(key)
+
+    def __enter__(self) -> ParquetTableWriter:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class ParquetTableReader:
+    """Reads the tables of a raw dataset, with the interface of the
+    ``pd.HDFStore`` raw datasets are read from.
+
+    Args:
+        directory (Path): The dataset's directory.
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        if not self.directory.is_dir():
+            raise FileNotFoundError(f"{self.directory} doesn't exist.")
+
+    def keys(self) -> List[str]:
+        return sorted(
+            f"/{path.stem}" for path in self.directory.glob("*.parquet")
+        )
+
+    def read(
+        self, key: str, columns: List[str] = None, filters: List = None
+    ) -> pd.DataFrame:
+        """Read a table, or some of its columns and rows.
+
+        Args:
+            key (str): The table to read.
+            columns (List[str], optional): The columns to read. Defaults to
+                every column.
+            filters (List, optional): The rows to read, as pyarrow filters.
+
+        Returns:
+            pd.DataFrame: The table.
+        """
+        path = self.directory / f"{key.strip('/')}.parquet"
+        return read_table(path, columns, filters).to_pandas()
+
+    def __getitem__(self, key: str) -> pd.DataFrame:
+        return self.read(key)
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self) -> ParquetTableReader:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def _split(path: str) -> Tuple[str, str]:
+    """Split a variable path into its top-level group and column name."""
+    path = path.strip("/")
+    group, _, column = path.partition("/")
+    return (group, column) if column else ("", path)
+
+
+class Group:
+    """A group of variables being written, which lists its members."""
+
+    def __init__(self, names: List[str]):
+        self.names = names
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.names)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def keys(self) -> List[str]:
+        return list(self.names)
+
+
+class ParquetVariableWriter(VariableWriter):
+    """Writes the variables of a model dataset to Parquet tables.
+
+    Variables are kept in memory until ``close``, and can be read back
+    before then, as from an h5py file.
+
+    Args:
+        directory (Path): The dataset's directory.
+        storage (str): The name of a ``writer.STORAGE`` setting. Its dtype
+            policy applies, and compressed settings use the Parquet codec
+            in ``CODECS``.
+        overrides (Dict[str, str], optional): Types for specific variables,
+            by name.
+        **settings: Overrides of the setting's dtypes, chunks or
+            compression.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        storage: str = "default",
+        overrides: Dict[str, str] = None,
+        **settings: Any,
+    ):
+        super().__init__(storage, overrides, **settings)
+        self.directory = Path(directory)
+        self._variables = {}
+        self._groups = set()
+
+    def __setitem__(self, name: str, values: Any) -> None:
+        values = self.stored_values(name, values)
+        if values.ndim > 1:
+            raise ValueError(f"{name} has more than one dimension.")
+        self._variables[name.strip("/")] = values
+
+    def create_group(self, name: str) -> Group:
+        self._groups.add(name.strip("/"))
+        return self[name]
+
+    def _members(self, group: str) -> List[str]:
+        prefix = group + "/" if group else ""
+        names = set()
+        for path in list(self._variables) + list(self._groups):
+            if path.startswith(prefix) and path != group:
+                names.add(path[len(prefix) :].split("/")[0])
+        return sorted(names)
+
+    def __getitem__(self, name: str) -> Any:
+        name = name.strip("/")
+        if name in self._variables:
+            return self._variables[name]
+        members = self._members(name)
+        if not members and name not in self._groups:
+            raise KeyError(name)
+        return Group(members)
+
+    def __contains__(self, name: str) -> bool:
+        name = name.strip("/")
+        return name in self._variables or bool(self._members(name))
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._members(""))
+
+    def _entities(self) -> Dict[str, int]:
+        """The entities with an ID variable, and their number of rows.
+
+        ``person_<entity>_id`` variables link persons to another entity,
+        and don't name entities of their own.
+        """
+        ids = {
+            path[: -len("_id")]: values.size
+            for path, values in self._variables.items()
+            if path.endswith("_id") and "/" not in path and values.ndim == 1
+        }
+        return {
+            entity: size
+            for entity, size in ids.items()
+            if not (
+                entity.startswith("person_")
+                and entity[len("person_") :] in ids
+            )
+        }
+
+    def _entity(self, path: str, entities: Dict[str, int]) -> str:
+        """The entity of an ungrouped variable, or None if no entity has
+        its length.
+
+        A variable belongs to the entity it's an ID of (``person_<entity>_id``
+        to persons), the one recorded in ``entities`` when it was written
+        (the table of a ``VariableMap`` spec), the entity its name starts
+        with, or the only entity with its number of rows, in that order.
+        """
+        values = self._variables[path]
+        if path.endswith("_id"):
+            entity = path[: -len("_id")]
+            if entity.startswith("person_") and entity not in entities:
+                entity = "person"
+            if entity in entities:
+                return entity
+        candidates = [
+            entity
+            for entity, size in entities.items()
+            if size == values.size and values.ndim == 1
+        ]
+        named = [
+            entity
+            for entity in candidates
+            if path.lower().startswith(entity + "_")
+        ]
+        if self.entities.get(path) in candidates:
+            return self.entities[path]
+        if named:
+            return max(named, key=len)
+        if len(candidates) == 1:
+            return candidates[0]
+        if candidates:
+            raise ValueError(
+                f"{path} has as many rows as the entities {candidates}, and "
+                "neither its name nor the variables' spec tells which it "
+                "belongs to."
+            )
+        return None
+
+    def _tables(self) -> Dict[str, Dict[str, str]]:
+        """Assign each variable to a table, returning the columns of each
+        table by variable path."""
+        entities = self._entities()
+        clusters = {}
+        for path, values in self._variables.items():
+            group, _ = _split(path)
+            if group:
+                key = group
+            else:
+                key = self._entity(path, entities) or (
+                    f"table_{values.size}"
+                    if values.ndim
+                    else f"table_{values.size}_scalar"
+                )
+            clusters.setdefault(key, []).append(path)
+        return {
+            table: {path: _split(path)[1] for path in paths}
+            for table, paths in clusters.items()
+        }
+
+    def close(self) -> None:
+        codec = CODECS.get(self.compression, "snappy")
+        self.directory.mkdir(parents=True, exist_ok=True)
+        index = {}
+        for table, columns in self._tables().items():
+            arrays = {
+                column: np.atleast_1d(self._variables[path])
+                for path, column in columns.items()
+            }
+            pq.write_table(
+                pa.table(arrays),
+                self.directory / f"{table}.parquet",
+                row_group_size=ROW_GROUP_ROWS,
+                compression=codec,
+            )
+            for path, column in columns.items():
+                index[path] = dict(
+                    table=table,
+                    column=column,
+                    scalar=self._variables[path].ndim == 0,
+                )
+        with open(self.directory / VARIABLES, "w") as f:
+            json.dump(index, f, indent=2)
+        self._variables = {}
+
+
+class ParquetVariableReader:
+    """Reads the variables of a model dataset from Parquet tables.
+
+    Args:
+        directory (Path): The dataset's directory.
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        with open(self.directory / VARIABLES) as f:
+            self.variables = json.load(f)
+
+    def keys(self) -> List[str]:
+        return list(self.variables)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.variables)
+
+    def __contains__(self, name: str) -> bool:
+        return name.strip("/") in self.variables
+
+    def _variable(self, name: str) -> Dict[str, Any]:
+        try:
+            return self.variables[name.strip("/")]
+        except KeyError:
+            raise KeyError(
+                f"{name} isn't a variable of {self.directory.name}."
+            ) from None
+
+    def _filters(self, table: str, filters: List) -> List:
+        """Translate filters on variables to filters on the table's
+        columns."""
+        if not filters:
+            return None
+        if isinstance(filters[0], tuple):
+            translated = []
+            for name, op, value in filters:
+                variable = self._variable(name)
+                if variable["table"] != table:
+                    raise ValueError(
+                        f"Filters must use variables of the same entity as "
+                        f"the variables loaded ({name} is in "
+                        f"{variable['table']}, not {table})."
+                    )
+                translated.append((variable["column"], op, value))
+            return translated
+        return [self._filters(table, conjunction) for conjunction in filters]
+
+    def read(
+        self, names: List[str], filters: List = None
+    ) -> Dict[str, np.ndarray]:
+        """Read variables, reading each table once.
+
+        Args:
+            names (List[str]): The variables to read.
+            filters (List, optional): The rows to read, as pyarrow filters
+                on variables of the same entity.
+
+        Returns:
+            Dict[str, np.ndarray]: The values of each variable, by name.
+        """
+        tables = {}
+        for name in names:
+            tables.setdefault(self._variable(name)["table"], []).append(name)
+        values = {}
+        for table, table_names in tables.items():
+            columns = [self._variable(name)["column"] for name in table_names]
+            data = read_table(
+                self.directory / f"{table}.parquet",
+                list(dict.fromkeys(columns)),
+                self._filters(table, filters),
+            )
+            for name, column in zip(table_names, columns):
+                array = to_numpy(data.column(column))
+                if self._variable(name)["scalar"]:
+                    array = np.asarray(array[0])
+                values[name] = array
+        return values
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.read([name])[name]
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self) -> ParquetVariableReader:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
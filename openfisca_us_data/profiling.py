@@ -0,0 +1,180 @@
+"""Measuring the stages of dataset builds.
+
+Builds mark their steps as named stages, which nest:
+
+    with stage("tax unit table"):
+        tax_unit = create_tax_unit_table(person)
+        count("rows", len(tax_unit))
+
+Outside ``profile``, stages and counters do nothing. Within it, each stage
+records its calls, wall and CPU time, the bytes its process read and wrote,
+the process's peak resident memory when it ends, and any counters. Stages
+entered several times (e.g. once per chunk) add up, and a stage's figures
+include those of the stages within it. Work done in parse worker processes
+counts towards CPU time once the workers exit, but not towards bytes read or
+written.
+
+``Profile.write`` emits one JSON object per stage, e.g.
+
+    {"stage": "cps:2020/add_ID_variables", "calls": 1, "wall_seconds": 0.8,
+     "cpu_seconds": 0.79, "read_bytes": 0, "written_bytes": 1204224,
+     "peak_rss_bytes": 402653184, "counters": {}}
+
+``openfisca-us-data <dataset> generate <year> --profile`` writes this log to
+standard error.
+"""
+
+from __future__ import annotations
+from contextlib import contextmanager
+import json
+import os
+import sys
+from time import perf_counter
+from typing import Any, Dict, Iterable, Iterator, TextIO, Tuple
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# The profile being recorded, if any.
+_active = None
+# The bytes read from /proc/self/io itself, which aren't counted.
+_own_reads = 0
+
+
+def _io_bytes() -> Tuple[int, int]:
+    """The bytes this process has read and written, or None if unknown."""
+    global _own_reads
+    try:
+        with open("/proc/self/io") as f:
+            text = f.read()
+    except OSError:
+        return None, None
+    fields = dict(line.split(": ") for line in text.splitlines())
+    read = int(fields["rchar"]) - _own_reads
+    _own_reads += len(text)
+    return read, int(fields["wchar"])
+
+
+def _peak_rss() -> int:
+    """The process's peak resident memory so far, in bytes."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _sample() -> Tuple[float, float, int, int]:
+    # CPU time includes child processes, once they have exited.
+    cpu = sum(os.times()[:4])
+    return (perf_counter(), cpu, *_io_bytes())
+
+
+class Profile:
+    """The measurements of each stage, by path ("cps:2020/parse person")."""
+
+    def __init__(self):
+        self.stages = {}
+        self._stack = []
+
+    def _enter(self, name: str) -> Dict[str, Any]:
+        self._stack.append(name)
+        path = "/".join(self._stack)
+        if path not in self.stages:
+            self.stages[path] = dict(
+                stage=path,
+                calls=0,
+                wall_seconds=0.0,
+                cpu_seconds=0.0,
+                read_bytes=0,
+                written_bytes=0,
+                peak_rss_bytes=None,
+                counters={},
+            )
+        return self.stages[path]
+
+    def _exit(self, record: Dict[str, Any], start: Tuple, end: Tuple):
+        self._stack.pop()
+        record["calls"] += 1
+        record["wall_seconds"] += end[0] - start[0]
+        record["cpu_seconds"] += end[1] - start[1]
+        for field, i in (("read_bytes", 2), ("written_bytes", 3)):
+            if record[field] is None or end[i] is None:
+                record[field] = None
+            else:
+                record[field] += end[i] - start[i]
+        record["peak_rss_bytes"] = _peak_rss()
+
+    def count(self, name: str, value: float = 1) -> None:
+        if not self._stack:
+            return
+        counters = self.stages["/".join(self._stack)]["counters"]
+        counters[name] = counters.get(name, 0) + value
+
+    def write(self, file: TextIO = None) -> None:
+        """Write the stages as JSON lines, in the order they started.
+
+        Args:
+            file (TextIO, optional): The file to write to. Defaults to
+                standard error.
+        """
+        file = file or sys.stderr
+        for record in self.stages.values():
+            file.write(json.dumps(record) + "\n")
+        file.flush()
+
+
+@contextmanager
+def profile() -> Iterator[Profile]:
+    """Record the stages run within the context.
+
+    Yields:
+        Profile: The measurements, complete once the context exits.
+    """
+    global _active
+    previous, _active = _active, Profile()
+    try:
+        yield _active
+    finally:
+        _active = previous
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Measure a named stage of a build, if a profile is being recorded."""
+    current = _active
+    if current is None:
+        yield
+        return
+    record = current._enter(name)
+    start = _sample()
+    try:
+        yield
+    finally:
+        current._exit(record, start, _sample())
+
+
+def count(name: str, value: float = 1) -> None:
+    """Add to a counter of the current stage, e.g. the rows it parsed."""
+    if _active is not None:
+        _active.count(name, value)
+
+
+def stages(name: str, iterable: Iterable) -> Iterator:
+    """Iterate, measuring each step of the iteration as a stage.
+
+    Use this for iterators which do their work lazily, e.g. chunked readers,
+    so that the reading counts towards ``name`` rather than the loop body.
+    """
+    iterator = iter(iterable)
+    while True:
+        with stage(name):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            if hasattr(item, "__len__"):
+                count("rows", len(item))
+        yield item
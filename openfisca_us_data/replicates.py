@@ -0,0 +1,145 @@
+"""Standard errors of survey estimates from replicate weights.
+
+Surveys publish replicate weights, sets of weights each reweighting a
+different subsample, alongside the full-sample weight (the CE's WTREP01 to
+WTREP44, the ACS's PWGTP1 to PWGTP80). An estimate's variance is a factor
+times the sum of squared differences between the estimate under each
+replicate weight and the full-sample estimate: 1/44 for the CE's balanced
+repeated replication, and 4/80 for the ACS's successive difference
+replication.
+
+Estimates here are computed under every weight at once: the weights are one
+(n x 1 + R) block, with the full-sample weight first, and the weighted
+totals of k variables are the (k x 1 + R) product of the variables with the
+block, rather than R separate passes over the data. ``grouped_totals`` sums
+each group's products in one ``np.bincount``.
+"""
+
+from __future__ import annotations
+from typing import Tuple
+from openfisca_us_data.lazy import lazy_import
+
+np = lazy_import("numpy")
+
+# Rows multiplied at a time, bounding the float64 copies of large blocks.
+CHUNK_ROWS = 1 << 16
+# Products summed by group at a time.
+CHUNK_PRODUCTS = 1 << 22
+
+
+def weight_block(
+    weight: np.ndarray, replicate_weights: np.ndarray = None
+) -> np.ndarray:
+    """Stack the full-sample weight before the replicate weights.
+
+    Args:
+        weight (np.ndarray): The full-sample weight of each row.
+        replicate_weights (np.ndarray, optional): The (n x R) replicate
+            weights, e.g. as float32.
+
+    Returns:
+        np.ndarray: The (n x 1 + R) weights, as float64.
+    """
+    weight = np.asarray(weight, dtype=np.float64)[:, None]
+    if replicate_weights is None:
+        return weight
+    return np.hstack([weight, np.asarray(replicate_weights, np.float64)])
+
+
+def weighted_totals(values: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """The totals of several variables under several weights.
+
+    Rows are multiplied in chunks, accumulating in float64, so float32
+    blocks of millions of rows aren't copied whole.
+
+    Args:
+        values (np.ndarray): The (n x k) variables.
+        weights (np.ndarray): The (n x W) weights.
+
+    Returns:
+        np.ndarray: The (k x W) weighted totals.
+    """
+    totals = np.zeros((values.shape[1], weights.shape[1]))
+    for start in range(0, len(values), CHUNK_ROWS):
+        rows = slice(start, start + CHUNK_ROWS)
+        totals += np.asarray(values[rows], np.float64).T @ np.asarray(
+            weights[rows], np.float64
+        )
+    return totals
+
+
+def grouped_totals(
+    values: np.ndarray, weights: np.ndarray, group: np.ndarray, groups: int
+) -> np.ndarray:
+    """The totals of several variables under several weights, by group.
+
+    Each row's (k x W) products are summed into its group's with one
+    ``np.bincount`` over a chunk of rows, whose products are bounded by
+    ``CHUNK_PRODUCTS``.
+
+    Args:
+        values (np.ndarray): The (n x k) variables.
+        weights (np.ndarray): The (n x W) weights.
+        group (np.ndarray): The group of each row, from 0 to groups - 1.
+        groups (int): The number of groups.
+
+    Returns:
+        np.ndarray: The (groups x k x W) weighted totals.
+    """
+    k, w = values.shape[1], weights.shape[1]
+    columns = np.arange(k * w)
+    totals = np.zeros(groups * k * w)
+    rows_per_chunk = max(1, CHUNK_PRODUCTS // max(k * w, 1))
+    for start in range(0, len(values), rows_per_chunk):
+        rows = slice(start, start + rows_per_chunk)
+        products = (
+            np.asarray(values[rows], np.float64)[:, :, None]
+            * np.asarray(weights[rows], np.float64)[:, None, :]
+        )
+        bins = group[rows, None] * (k * w) + columns
+        totals += np.bincount(
+            bins.ravel(), weights=products.ravel(), minlength=totals.size
+        )
+    return totals.reshape(groups, k, w)
+
+
+def standard_errors(estimates: np.ndarray, factor: float) -> np.ndarray:
+    """Replicate standard errors of estimates.
+
+    Args:
+        estimates (np.ndarray): Estimates under each weight, along the last
+            axis, with the full-sample estimate first.
+        factor (float): The survey's variance factor, e.g. 4 / 80.
+
+    Returns:
+        np.ndarray: The standard error of each full-sample estimate.
+    """
+    deviations = estimates[..., 1:] - estimates[..., :1]
+    return np.sqrt(factor * (deviations**2).sum(axis=-1))
+
+
+def estimate_totals(
+    values: np.ndarray,
+    weight: np.ndarray,
+    replicate_weights: np.ndarray,
+    factor: float,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Weighted totals of several variables and their standard errors.
+
+    Args:
+        values (np.ndarray): The (n x k) variables.
+        weight (np.ndarray): The full-sample weight of each row.
+        replicate_weights (np.ndarray): The (n x R) replicate weights.
+        factor (float): The survey's variance factor, e.g. 4 / 80.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The total and standard error of each
+            variable.
+    """
+    values = np.asarray(values)
+    if values.ndim == 1:
+        values = values[:, None]
+    totals = weighted_totals(values, weight[:, None])[:, 0]
+    replicate_totals = weighted_totals(values, replicate_weights)
+    estimates = np.concatenate([totals[:, None], replicate_totals], axis=1)
+    return totals, standard_errors(estimates, factor)
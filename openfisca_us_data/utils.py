@@ -1,13 +1,36 @@
+from __future__ import annotations
 import shutil
+from contextlib import contextmanager
+from functools import lru_cache, partial
+import inspect
 from pathlib import Path
-import shutil
-import pandas as pd
-import re
 import os
-import h5py
-import requests
-from tqdm import tqdm
-import numpy as np
+import pickle
+import pkgutil
+import typing
+from queue import Empty as QueueEmpty
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+from openfisca_us_data import catalog, handles
+from openfisca_us_data.lazy import lazy_import
+from openfisca_us_data.cache import fetch, recorded_fetches
+from openfisca_us_data.profiling import count, stage, stages
+from openfisca_us_data.writer import DatasetWriter, compression_filters
+from openfisca_us_data.fingerprints import (
+    hash_json,
+    inputs_hash,
+    read_record,
+    write_record,
+)
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+pd = lazy_import("pandas")
+h5py = lazy_import("h5py")
+np = lazy_import("numpy")
+yaml = lazy_import("yaml")
 
 US = "openfisca_us"
 
@@ -43,44 +66,100 @@ def dataset(cls):
     def generate():
         raise NotImplementedError("No dataset generation function specified")
 
+    # Data folders are created on first write, not at import.
     if not hasattr(cls, "model"):
         cls.model = None
-        cls.data_dir = data_folder(DATA_DIR / "external")
+        cls.data_dir = DATA_DIR / "external"
     else:
-        cls.data_dir = data_folder(DATA_DIR / cls.model)
+        cls.data_dir = DATA_DIR / cls.model
+
+    # The storage backend, or None for default_backend().
+    if not hasattr(cls, "backend"):
+        cls.backend = None
+
+    def backend():
+        if cls.backend is None:
+            return default_backend()
+        if cls.backend not in SUFFIXES:
+            raise ValueError(
+                f"{cls.__name__}.backend must be one of {tuple(SUFFIXES)}, "
+                f"not '{cls.backend}'."
+            )
+        return cls.backend
 
     def years(cl):
-        pattern = re.compile(f"\n{cl.name}_([0-9]+).h5")
-        matches = list(
-            map(
-                int,
-                pattern.findall(
-                    "\n"
-                    + "\n".join(
-                        map(lambda path: path.name, cl.data_dir.iterdir())
-                    )
-                ),
-            )
-        )
-        return matches
+        suffix = SUFFIXES[backend()]
+        return [
+            entry["year"]
+            for filename, entry in catalog.files(cl.data_dir).items()
+            if entry["dataset"] == cl.name and filename.endswith(suffix)
+        ]
 
     cls.years = classproperty(years)
 
-    def last_year(self):
-        return sorted(cls.years)[-1]
+    def last_year(cl):
+        return max(cl.years)
 
-    cls.last_year = property(last_year)
+    cls.last_year = classproperty(last_year)
 
     def filename(year):
-        return f"{cls.name}_{year}.h5"
+        return f"{cls.name}_{year}{SUFFIXES[backend()]}"
 
     cls.filename = staticmethod(filename)
 
-    def load(year, key: str = None, mode: str = "r") -> pd.DataFrame:
+    def load(
+        year,
+        key: str = None,
+        mode: str = "r",
+        columns: List[str] = None,
+        filters: List = None,
+    ) -> pd.DataFrame:
+        """Load a dataset file, or one of its variables.
+
+        Args:
+            year (int): The year of the dataset.
+            key (str, optional): The variable (or table) to load. Defaults to
+                the whole file.
+            mode (str): The h5py file mode, or "memmap" to map the variables
+                of a model dataset into read-only arrays backed by the file,
+                which processes on the same host share through the page
+                cache.
+            columns (List[str], optional): The columns of a raw table to
+                load. Defaults to every column.
+            filters (List, optional): The rows to load, as a list of
+                (column, op, value) conditions which must all hold (or a
+                list of such lists, any of which must hold). Filters on a
+                model dataset use variables of the loaded variable's entity.
+        """
         file = cls.data_dir / cls.filename(year)
+        if backend() == "parquet":
+            from openfisca_us_data import parquet
+
+            if mode != "r":
+                raise ValueError(
+                    f"The parquet backend only loads with mode 'r', not "
+                    f"'{mode}'."
+                )
+            if cls.model:
+                store = parquet.ParquetVariableReader(file)
+                if key is None:
+                    return store
+                return store.read([key], filters)[key]
+            store = parquet.ParquetTableReader(file)
+            if key is None:
+                return store
+            return store.read(key, columns, filters)
         if cls.model:
+            compression_filters()
+            if mode == "memmap":
+                return memory_map(file, key)
             if key is None:
                 return h5py.File(file, mode=mode)
+            elif mode == "r":
+                f = handles.open_file((cls.name, int(year)), file)
+                return filter_rows(
+                    np.array(f[key]), filters, lambda name: f[name][...]
+                )
             else:
                 with h5py.File(file, mode=mode) as f:
                     values = np.array(f[key])
@@ -91,29 +170,203 @@ def dataset(cls):
             else:
                 with pd.HDFStore(file) as f:
                     values = f[key]
+                values = filter_rows(values, filters, values.__getitem__)
+                if columns is not None:
+                    values = values[columns]
                 return values
 
+    def load_many(
+        year, keys: List[str], filters: List = None
+    ) -> Dict[str, np.ndarray]:
+        """Load several variables (or tables) from one open file.
+
+        Args:
+            year (int): The year of the dataset.
+            keys (List[str]): The variables (or tables) to load.
+            filters (List, optional): The rows to load, as in ``load``.
+
+        Returns:
+            Dict[str, np.ndarray]: The values of each variable, by key.
+        """
+        file = cls.data_dir / cls.filename(year)
+        if backend() == "parquet":
+            from openfisca_us_data import parquet
+
+            if cls.model:
+                return parquet.ParquetVariableReader(file).read(keys, filters)
+            store = parquet.ParquetTableReader(file)
+            return {key: store.read(key, filters=filters) for key in keys}
+        if cls.model:
+            f = handles.open_file((cls.name, int(year)), file)
+            return {
+                key: filter_rows(
+                    np.array(f[key]), filters, lambda name: f[name][...]
+                )
+                for key in keys
+            }
+        with pd.HDFStore(file, mode="r") as f:
+            tables = {key: f[key] for key in keys}
+        return {
+            key: filter_rows(table, filters, table.__getitem__)
+            for key, table in tables.items()
+        }
+
+    cls.load_many = staticmethod(load_many)
+
+    def writer(year, storage: str = "default"):
+        """Open the dataset's file for writing, with its backend.
+
+        Args:
+            year (int): The year of the dataset.
+            storage (str): The storage setting for model datasets, from
+                writer.STORAGE.
+
+        Returns:
+            A writer taking tables (raw datasets) or variables (model
+            datasets) by key: an HDFStore, a DatasetWriter or their Parquet
+            counterparts.
+        """
+        if backend() == "parquet":
+            from openfisca_us_data import parquet
+
+            if cls.model:
+                return parquet.ParquetVariableWriter(cls.file(year), storage)
+            return parquet.ParquetTableWriter(cls.file(year))
+        if cls.model:
+            return DatasetWriter(cls.file(year), storage)
+        return pd.HDFStore(cls.file(year), mode="w")
+
+    cls.writer = staticmethod(writer)
+
     def remove(year=None):
-        if year is None:
-            filenames = map(cls.filename(year), cls.years)
-        else:
-            filenames = (cls.filename(year),)
-        for filename in filenames:
-            filepath = cls.data_dir / filename
-            if filepath.exists():
-                os.remove(filepath)
+        years = cls.years if year is None else (year,)
+        for year in years:
+            if int(year) in staging:
+                # Discard the output being generated, keeping the last one.
+                remove_path(staging[int(year)])
+                continue
+            handles.close((cls.name, int(year)))
+            for filepath in (cls.file(year), cls.build_record(year)):
+                remove_path(filepath)
+        catalog.refresh(cls.data_dir)
 
     cls.remove = staticmethod(remove)
 
-    def remove_first_then(generate_func):
-        def new_generate_func(year, *args):
-            cls.remove(year)
-            return generate_func(year, *args)
+    def build_record(year):
+        return cls.data_dir / f"{cls.name}_{int(year)}.build.json"
+
+    cls.build_record = staticmethod(build_record)
+
+    signature = (
+        inspect.signature(cls.generate) if hasattr(cls, "generate") else None
+    )
+
+    parameter_types = (
+        argument_types(cls.generate, signature) if signature else {}
+    )
+
+    def bind(year, args, kwargs) -> inspect.BoundArguments:
+        """Bind the arguments of a generate call, with defaults filled in
+        and strings (e.g. from the command line) parsed as the type of their
+        parameter."""
+        bound = signature.bind(year, *args, **kwargs)
+        bound.apply_defaults()
+        for name, value in list(bound.arguments.items())[1:]:
+            bound.arguments[name] = parse_argument(
+                value, parameter_types.get(name)
+            )
+        return bound
+
+    def arguments(year, args, kwargs) -> Dict[str, Any]:
+        """The arguments of a generate call after the year, by name, so that
+        equivalent calls are fingerprinted alike."""
+        if signature is None:
+            return dict(args=list(args), **kwargs)
+        return dict(list(bind(year, args, kwargs).arguments.items())[1:])
+
+    def is_up_to_date(year, *args, **kwargs):
+        """Whether the output was built from the same inputs as it would be
+        now: code, configuration, arguments and parent datasets."""
+        record = read_record(build_record(year))
+        if record is None or not cls.file(year).exists():
+            return False
+        inputs = inputs_hash(cls, year, arguments(year, args, kwargs))
+        return inputs is not None and record["inputs"] == inputs
+
+    cls.is_up_to_date = staticmethod(is_up_to_date)
+
+    def locked_then(generate_func):
+        def new_generate_func(year, *args, force=False, **kwargs):
+            with build_lock(year):
+                # Another process may have built the output while this one
+                # waited for the lock.
+                if not force and is_up_to_date(year, *args, **kwargs):
+                    return
+                with stage(f"{cls.name}:{int(year)}"):
+                    bound = bind(year, args, kwargs)
+                    with recorded_fetches() as sources:
+                        with staged_output(year):
+                            result = generate_func(*bound.args, **bound.kwargs)
+                    write_record(
+                        build_record(year),
+                        inputs_hash(cls, year, arguments(year, args, kwargs)),
+                        sources,
+                    )
+                catalog.refresh(cls.data_dir)
+            return result
 
         return new_generate_func
 
+    # Processes building the same output take turns, through a lock file
+    # beside it. Locks are reentrant within a process.
+    locked = set()
+
+    @contextmanager
+    def build_lock(year):
+        year = int(year)
+        if year in locked:
+            yield
+            return
+        cls.data_dir.mkdir(parents=True, exist_ok=True)
+        with file_lock(cls.data_dir / f".{cls.name}_{year}.lock"):
+            locked.add(year)
+            try:
+                yield
+            finally:
+                locked.discard(year)
+
+    # While a generate or save call runs, cls.file points writers at a
+    # temporary file in the same folder. Once it's complete, it's flushed to
+    # disk and replaces the previous output, which stays in place until then.
+    staging = {}
+
+    @contextmanager
+    def staged_output(year):
+        year = int(year)
+        if year in staging:
+            yield
+            return
+        final = cls.data_dir / cls.filename(year)
+        # Outputs left by builds which were killed are never completed.
+        for pattern in (f".{final.name}.*.tmp", f".{final.name}.*.old"):
+            for stale in cls.data_dir.glob(pattern):
+                remove_path(stale)
+        staging[year] = final.with_name(f".{final.name}.{os.getpid()}.tmp")
+        try:
+            yield
+            if staging[year].exists():
+                fsync_path(staging[year])
+                # The build record describes the previous output until the
+                # caller writes a new one.
+                remove_path(build_record(year))
+                handles.close((cls.name, year))
+                replace_path(staging[year], final)
+        finally:
+            remove_path(staging[year])
+            del staging[year]
+
     if hasattr(cls, "generate"):
-        cls.generate = staticmethod(remove_first_then(cls.generate))
+        cls.generate = staticmethod(locked_then(cls.generate))
     else:
         cls.generate = staticmethod(generate)
 
@@ -122,25 +375,37 @@ def dataset(cls):
     if not hasattr(cls, "input_reform_from_year"):
         cls.input_reform_from_year = lambda year: ()
 
-    cls.file = staticmethod(lambda year: cls.data_dir / cls.filename(year))
+    if not hasattr(cls, "inputs"):
+        cls.inputs = ()
+
+    # The years of the inputs an output is built from, given the arguments
+    # to generate.
+    if not hasattr(cls, "input_years"):
+        cls.input_years = lambda year, **arguments: (year,)
+
+    # The files named by the arguments to generate, whose contents are
+    # fingerprinted along with the arguments.
+    if not hasattr(cls, "input_files"):
+        cls.input_files = lambda year, **arguments: ()
+
+    def file(year):
+        return staging.get(int(year), cls.data_dir / cls.filename(year))
+
+    cls.file = staticmethod(file)
 
     def save(data_file: str, year: int = 2018):
-        if "https://" in data_file:
-            response = requests.get(data_file, stream=True)
-            total_size_in_bytes = int(
-                response.headers.get("content-length", 0)
-            )
-            block_size = 1024  # 1 Kibibyte
-            progress_bar = tqdm(
-                total=total_size_in_bytes, unit="iB", unit_scale=True
+        with build_lock(year), recorded_fetches() as sources:
+            if data_file.startswith(("https://", "http://")):
+                data_file = fetch(data_file, cls.name)
+            with staged_output(year):
+                if Path(data_file).is_dir():
+                    shutil.copytree(data_file, cls.file(year))
+                else:
+                    shutil.copyfile(data_file, cls.file(year))
+            write_record(
+                build_record(year), hash_json(dict(saved=data_file)), sources
             )
-            with open(cls.file(year), "wb") as file:
-                for data in response.iter_content(block_size):
-                    progress_bar.update(len(data))
-                    file.write(data)
-            progress_bar.close()
-        else:
-            shutil.copyfile(data_file, cls.file(year))
+            catalog.refresh(cls.data_dir)
 
     if not hasattr(cls, "save"):
         cls.save = staticmethod(save)
@@ -148,6 +413,428 @@ def dataset(cls):
     return cls
 
 
+# Storage backends, and the suffix of the file (or directory) of each.
+SUFFIXES = {"hdf5": ".h5", "parquet": ".parquet"}
+
+
+def default_backend() -> str:
+    """The backend of datasets which don't set one: hdf5, unless the
+    OPENFISCA_US_DATA_BACKEND environment variable names another."""
+    backend = os.environ.get("OPENFISCA_US_DATA_BACKEND", "hdf5")
+    if backend not in SUFFIXES:
+        raise ValueError(
+            f"OPENFISCA_US_DATA_BACKEND must be one of {tuple(SUFFIXES)}, "
+            f"not '{backend}'."
+        )
+    return backend
+
+
+def remove_path(path: Path) -> None:
+    """Remove a file, or a directory and its contents, if it exists."""
+    if path.is_dir():
+        shutil.rmtree(path)
+    elif path.exists():
+        os.remove(path)
+
+
+def fsync_path(path: Path, recursive: bool = True) -> None:
+    """Flush a file, or a directory's entries (and its contents, if
+    recursive), to disk."""
+    if recursive and path.is_dir():
+        for child in path.iterdir():
+            fsync_path(child)
+    try:
+        descriptor = os.open(path, os.O_RDONLY)
+    except OSError:
+        if path.is_dir():
+            return  # Directories can't be opened on Windows.
+        raise
+    try:
+        os.fsync(descriptor)
+    finally:
+        os.close(descriptor)
+
+
+def replace_path(source: Path, target: Path) -> None:
+    """Atomically replace a file (or directory) with another in the same
+    folder, and flush the folder's entries to disk.
+
+    Directories can't replace each other in one step, so the target is
+    renamed aside first: readers may briefly find no directory, but never
+    a partial one.
+    """
+    if source.is_dir() and target.exists():
+        previous = target.with_name(f".{target.name}.{os.getpid()}.old")
+        os.replace(target, previous)
+        os.replace(source, target)
+        remove_path(previous)
+    else:
+        os.replace(source, target)
+    fsync_path(target.parent, recursive=False)
+
+
+def argument_types(function: Callable, signature: inspect.Signature) -> Dict:
+    """The type of each parameter of a function: its annotation, or else the
+    type of its default."""
+    try:
+        hints = typing.get_type_hints(function)
+    except Exception:
+        hints = {}
+    types = {}
+    for name, parameter in signature.parameters.items():
+        if name in hints:
+            types[name] = hints[name]
+        elif parameter.default not in (inspect.Parameter.empty, None):
+            types[name] = type(parameter.default)
+    return types
+
+
+def parse_argument(value: Any, kind: type) -> Any:
+    """Parse a string as a bool, int or float, if that's the type expected.
+
+    Other values and types are returned as they are.
+    """
+    if not isinstance(value, str) or kind not in (bool, int, float):
+        return value
+    if kind is bool:
+        if value.lower() in ("1", "true", "yes"):
+            return True
+        if value.lower() in ("0", "false", "no"):
+            return False
+        raise ValueError(f"Expected a boolean, not {value}.")
+    return kind(value)
+
+
+@contextmanager
+def file_lock(path: Path) -> Iterator[None]:
+    """Hold an exclusive lock on a file, waiting for any other process
+    holding it. Without fcntl (on Windows), nothing is locked."""
+    with open(path, "a") as f:
+        if fcntl is None:
+            yield
+            return
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+FILTER_OPS = {
+    "=": lambda x, v: x == v,
+    "==": lambda x, v: x == v,
+    "!=": lambda x, v: x != v,
+    "<": lambda x, v: x < v,
+    "<=": lambda x, v: x <= v,
+    ">": lambda x, v: x > v,
+    ">=": lambda x, v: x >= v,
+    "in": lambda x, v: np.isin(x, list(v)),
+    "not in": lambda x, v: ~np.isin(x, list(v)),
+}
+
+
+def filter_rows(values, filters: List, column):
+    """Select the rows of a table or variable meeting filters, for backends
+    which can't apply them while reading.
+
+    Args:
+        values: The table or variable.
+        filters (List): (column, op, value) conditions which must all hold,
+            or a list of such lists, any of which must hold. None selects
+            every row.
+        column (Callable): Gets the values of a column by name.
+
+    Returns:
+        The selected rows.
+    """
+    if not filters:
+        return values
+    if isinstance(filters[0], tuple):
+        filters = [filters]
+    mask = False
+    for conjunction in filters:
+        selected = True
+        for name, op, value in conjunction:
+            if op not in FILTER_OPS:
+                raise ValueError(f"Unknown filter operator '{op}'.")
+            selected = selected & FILTER_OPS[op](
+                np.asarray(column(name)), value
+            )
+        mask = mask | selected
+    return values[mask]
+
+
+def memory_map(file: Path, key: str = None):
+    """Map HDF5 datasets into read-only arrays without copying them.
+
+    Args:
+        file (Path): The HDF5 file.
+        key (str, optional): The dataset to map. Defaults to every dataset.
+
+    Returns:
+        The mapped array, or a dictionary of arrays by dataset path.
+    """
+    with h5py.File(file, mode="r") as f:
+        if key is not None:
+            return _memory_map_dataset(file, f[key])
+        arrays = {}
+
+        def add_dataset(name, obj):
+            if isinstance(obj, h5py.Dataset):
+                arrays[name] = _memory_map_dataset(file, obj)
+
+        f.visititems(add_dataset)
+        return arrays
+
+
+def _memory_map_dataset(file: Path, dataset: h5py.Dataset):
+    if dataset.shape == ():
+        return dataset[()]
+    layout = dataset.id.get_create_plist().get_layout()
+    if layout != h5py.h5d.CONTIGUOUS or dataset.compression is not None:
+        raise ValueError(
+            f"{dataset.name} is chunked or compressed, so it can't be "
+            "memory-mapped. Rebuild the dataset with a contiguous layout."
+        )
+    offset = dataset.id.get_offset()
+    if offset is None:
+        # No storage is allocated for datasets which were never written.
+        values = np.zeros(dataset.shape, dtype=dataset.dtype)
+        values.flags.writeable = False
+        return values
+    return np.memmap(
+        file, dtype=dataset.dtype, mode="r", offset=offset, shape=dataset.shape
+    )
+
+
+# Raw datasets read either the columns listed in their manifest, as compact
+# types, or every column of the source files with pandas' default types.
+RAW_COLUMN_MODES = ("manifest", "full")
+
+
+def check_column_mode(columns: str) -> str:
+    if columns not in RAW_COLUMN_MODES:
+        raise ValueError(
+            f"columns must be one of {RAW_COLUMN_MODES}, not '{columns}'."
+        )
+    return columns
+
+
+@lru_cache()
+def load_manifest(package: str, resource: str) -> Dict[str, Dict[str, str]]:
+    """Load a raw dataset's column manifest.
+
+    Args:
+        package (str): The module the manifest is stored next to.
+        resource (str): The manifest's file name.
+
+    Returns:
+        Dict[str, Dict[str, str]]: The dtype of each column, by table.
+    """
+    return yaml.safe_load(pkgutil.get_data(package, resource))
+
+
+def cast_to_manifest(df: pd.DataFrame, dtypes: Dict[str, str]) -> pd.DataFrame:
+    """Cast columns to their manifest dtypes, checking that values fit.
+
+    Args:
+        df (pd.DataFrame): The table to cast, modified in place.
+        dtypes (Dict[str, str]): The dtype of each column.
+
+    Returns:
+        pd.DataFrame: The cast table.
+    """
+    for column, dtype in dtypes.items():
+        dtype = np.dtype(dtype)
+        values = df[column]
+        if dtype.kind in "iu" and len(values) > 0:
+            info = np.iinfo(dtype)
+            if values.isna().any() or (values != np.floor(values)).any():
+                raise ValueError(
+                    f"Column {column} has missing or fractional values and "
+                    f"can't be stored as {dtype}."
+                )
+            if values.min() < info.min or values.max() > info.max:
+                raise ValueError(
+                    f"Column {column} has values outside the range of "
+                    f"{dtype} ({values.min()} to {values.max()})."
+                )
+        df[column] = values.astype(dtype)
+    return df
+
+
+def parse_workers(tasks: int) -> int:
+    """The number of processes to parse archive members with: the
+    OPENFISCA_US_DATA_PARSE_WORKERS environment variable if set, up to one
+    per member, otherwise one, parsing members in the building process.
+
+    Worker processes are spawned, so scripts which opt in must guard their
+    builds with ``if __name__ == "__main__":``.
+    """
+    workers = os.environ.get("OPENFISCA_US_DATA_PARSE_WORKERS")
+    if workers is None:
+        return 1
+    return min(int(workers), tasks)
+
+
+# Chunks a worker parses ahead of the process consuming them.
+PARSE_QUEUE_CHUNKS = 2
+# Seconds between checks that a worker is still running, while waiting.
+PARSE_POLL_SECONDS = 1
+
+# Messages from parsing workers: a whole result, a chunk of a generator's
+# results, the end of a generator's results, or an exception.
+RESULT, CHUNK, END, ERROR = range(4)
+
+
+@contextmanager
+def parse_in_parallel(
+    parse: Callable, tasks: Dict[str, Tuple], workers: int = None
+) -> Iterator[Dict[str, Callable]]:
+    """Parse several archive members concurrently, in worker processes.
+
+    Each worker sends its member's result back through a queue holding at
+    most ``PARSE_QUEUE_CHUNKS`` chunks, so generators stream their chunks to
+    this process, and a worker parses ahead only as far as the queue allows.
+    Workers are started (as fresh processes, which inherit no open files)
+    in the order of ``tasks``, up to ``workers`` at a time. A member
+    requested before its turn takes the place of a worker whose member
+    hasn't been requested yet, which starts again later.
+
+    Args:
+        parse (Callable): A module-level function parsing one member, which
+            returns a table or a generator of table chunks.
+        tasks (Dict[str, Tuple]): The arguments to ``parse`` for each
+            member, by key.
+        workers (int, optional): The number of processes. Defaults to
+            ``parse_workers``. With one or fewer, members are parsed in this
+            process when their results are requested.
+
+    Yields:
+        Dict[str, Callable]: A function returning each member's result, by
+            key: a table, or an iterator over the chunks of a generator.
+    """
+    if workers is None:
+        workers = parse_workers(len(tasks))
+    if workers <= 1:
+        yield {key: partial(parse, *args) for key, args in tasks.items()}
+        return
+    import multiprocessing
+
+    context = multiprocessing.get_context("spawn")
+    pending = list(tasks)
+    running = {}
+    requested = set()
+    processes = []
+
+    def start(key: str) -> None:
+        queue = context.Queue(maxsize=PARSE_QUEUE_CHUNKS)
+        process = context.Process(
+            target=_parse_member,
+            args=(parse, tasks[key], queue),
+            daemon=True,
+        )
+        process.start()
+        pending.remove(key)
+        running[key] = (process, queue)
+        processes.append(process)
+
+    def finish(key: str) -> None:
+        if key in running:
+            # The worker exits once it has sent its last message.
+            running.pop(key)[0].join()
+        while pending and len(running) < workers:
+            start(pending[0])
+
+    def receive(key: str) -> Tuple[int, Any]:
+        process, queue = running[key]
+        while True:
+            try:
+                return queue.get(timeout=PARSE_POLL_SECONDS)
+            except QueueEmpty:
+                if not process.is_alive():
+                    try:
+                        return queue.get(timeout=PARSE_POLL_SECONDS)
+                    except QueueEmpty:
+                        raise RuntimeError(
+                            f"The process parsing {key} stopped (exit code "
+                            f"{process.exitcode})."
+                        ) from None
+
+    def chunks(key: str, first: Any) -> Iterator[Any]:
+        yield first
+        while True:
+            kind, value = receive(key)
+            if kind == ERROR:
+                finish(key)
+                raise value
+            if kind == END:
+                finish(key)
+                return
+            yield value
+
+    def preempt() -> None:
+        """Stop the last started worker whose member isn't requested yet,
+        to parse it later."""
+        unrequested = [key for key in running if key not in requested]
+        if not unrequested:
+            raise RuntimeError(
+                f"{len(running)} members are being read already, which is "
+                f"as many as the {workers} workers parsing them."
+            )
+        key = unrequested[-1]
+        process, _ = running.pop(key)
+        process.terminate()
+        process.join()
+        pending.append(key)
+        pending.sort(key=list(tasks).index)
+
+    def result(key: str) -> Any:
+        requested.add(key)
+        if key in pending:
+            if len(running) >= workers:
+                preempt()
+            start(key)
+        kind, value = receive(key)
+        if kind == ERROR:
+            finish(key)
+            raise value
+        if kind == RESULT:
+            finish(key)
+            return value
+        if kind == END:
+            finish(key)
+            return iter(())
+        return chunks(key, value)
+
+    finish(None)
+    try:
+        yield {key: partial(result, key) for key in tasks}
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+            process.join()
+
+
+def _parse_member(parse: Callable, args: Tuple, queue: Any) -> None:
+    """Parse a member in a worker process, sending its result to queue."""
+    try:
+        result = parse(*args)
+        if isinstance(result, Iterator):
+            for chunk in result:
+                queue.put((CHUNK, chunk))
+            queue.put((END, None))
+        else:
+            queue.put((RESULT, result))
+    except Exception as e:
+        try:
+            pickle.dumps(e)
+        except Exception:
+            e = RuntimeError(f"{type(e).__name__}: {e}")
+        queue.put((ERROR, e))
+
+
 def data_folder(path: str, erase=False) -> Path:
     folder = Path(path)
     folder.mkdir(exist_ok=True, parents=True)
@@ -0,0 +1,234 @@
+"""Writing the variables of model datasets to HDF5.
+
+Datasets assign variables to a ``DatasetWriter`` as they would to an h5py
+file (``writer["person_id"] = person.PH_SEQ * 100 + person.P_SEQ``), and the
+writer's storage settings decide how each is stored:
+
+- ``dtypes``: "exact" stores values with the types they're computed with.
+  "compact" stores IDs as int32 (int64 if they don't fit), other integers as
+  int32 at most, booleans as booleans and floats as float32. Variables in
+  ``overrides`` are stored with the given type instead.
+- ``chunks``: the number of rows per chunk, or None for contiguous storage.
+- ``compression``: None, "gzip" or "lzf", which HDF5 supports natively, or
+  "blosc" or "lz4", which need the optional ``hdf5plugin`` package to write
+  and read. Compression requires chunks.
+
+``STORAGE`` names the combinations builds choose between. Contiguous,
+uncompressed files (``default`` and ``compact``) can be loaded with
+``mode="memmap"``; chunked ones can't.
+"""
+
+from __future__ import annotations
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Union
+from openfisca_us_data.lazy import lazy_import
+
+h5py = lazy_import("h5py")
+np = lazy_import("numpy")
+
+DTYPE_POLICIES = ("exact", "compact")
+COMPRESSION = (None, "gzip", "lzf", "blosc", "lz4")
+PLUGIN_COMPRESSION = ("blosc", "lz4")
+CHUNK_ROWS = 1 << 16
+
+STORAGE = {
+    "default": dict(dtypes="exact", chunks=None, compression=None),
+    "compact": dict(dtypes="compact", chunks=None, compression=None),
+    "gzip": dict(dtypes="compact", chunks=CHUNK_ROWS, compression="gzip"),
+    "lz4": dict(dtypes="compact", chunks=CHUNK_ROWS, compression="lz4"),
+    "blosc": dict(dtypes="compact", chunks=CHUNK_ROWS, compression="blosc"),
+}
+
+
+@lru_cache()
+def compression_filters() -> bool:
+    """Register the compression filters from hdf5plugin, if it's installed.
+
+    Returns:
+        bool: Whether the filters are available.
+    """
+    try:
+        import hdf5plugin  # noqa: F401 (registers filters with HDF5)
+    except ImportError:
+        return False
+    return True
+
+
+def compact_dtype(name: str, values: np.ndarray) -> np.dtype:
+    """The type a variable is stored as under the "compact" policy.
+
+    Args:
+        name (str): The variable's name.
+        values (np.ndarray): The variable's values.
+
+    Returns:
+        np.dtype: The type to store the values as.
+    """
+    kind = values.dtype.kind
+    if kind == "b":
+        return np.dtype(bool)
+    if name.endswith("_id") and kind in "iuf":
+        if kind == "f" and not np.array_equal(values, np.floor(values)):
+            raise ValueError(f"{name} has fractional IDs.")
+        if len(values) == 0 or (
+            values.min() >= np.iinfo(np.int32).min
+            and values.max() <= np.iinfo(np.int32).max
+        ):
+            return np.dtype(np.int32)
+        return np.dtype(np.int64)
+    if kind in "iu":
+        if values.dtype.itemsize <= 4:
+            return values.dtype
+        if len(values) == 0 or (
+            values.min() >= np.iinfo(np.int32).min
+            and values.max() <= np.iinfo(np.int32).max
+        ):
+            return np.dtype(np.int32)
+        return values.dtype
+    if kind == "f":
+        return np.dtype(np.float32)
+    return values.dtype
+
+
+class VariableWriter:
+    """Stores the variables of a model dataset with a storage setting.
+
+    Subclasses write the values ``stored_values`` returns to their format.
+
+    Args:
+        storage (str): The name of a ``STORAGE`` setting. Defaults to
+            "default".
+        overrides (Dict[str, str], optional): Types for specific variables,
+            by name.
+        dtypes (str, optional): Override the setting's dtype policy.
+        chunks (int, optional): Override the setting's rows per chunk.
+        compression (str, optional): Override the setting's compression.
+
+    Attributes:
+        entities (Dict[str, str]): The entity of variables, by name, where
+            writers know it, e.g. from a ``VariableMap`` spec. Formats which
+            store variables by entity use it.
+    """
+
+    def __init__(
+        self,
+        storage: str = "default",
+        overrides: Dict[str, str] = None,
+        **settings: Any,
+    ):
+        if storage not in STORAGE:
+            raise ValueError(
+                f"storage must be one of {tuple(STORAGE)}, not '{storage}'."
+            )
+        settings = {**STORAGE[storage], **settings}
+        self.dtypes = settings["dtypes"]
+        self.chunks = settings["chunks"]
+        self.compression = settings["compression"]
+        if self.dtypes not in DTYPE_POLICIES:
+            raise ValueError(
+                f"dtypes must be one of {DTYPE_POLICIES}, not '{self.dtypes}'."
+            )
+        if self.compression not in COMPRESSION:
+            raise ValueError(
+                f"compression must be one of {COMPRESSION}, not "
+                f"'{self.compression}'."
+            )
+        if self.compression is not None and self.chunks is None:
+            raise ValueError("Compressed variables must be chunked.")
+        self.overrides = overrides or {}
+        self.entities = {}
+
+    def stored_values(self, name: str, values: Any) -> np.ndarray:
+        """Convert a variable's values to the type they're stored as."""
+        values = np.asarray(getattr(values, "values", values))
+        variable = name.rsplit("/", 1)[-1]
+        if variable in self.overrides:
+            dtype = np.dtype(self.overrides[variable])
+        elif self.dtypes == "compact":
+            dtype = compact_dtype(variable, values)
+        else:
+            dtype = values.dtype
+        return values.astype(dtype, copy=False)
+
+    def __enter__(self) -> VariableWriter:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class DatasetWriter(VariableWriter):
+    """An HDF5 file whose variables are stored with a storage setting.
+
+    Reading, iterating and creating groups work as on the underlying
+    ``h5py.File``, which is available as ``file``.
+
+    Args:
+        path (Path): The file to write.
+        storage (str): The name of a ``STORAGE`` setting. Defaults to
+            "default".
+        overrides (Dict[str, str], optional): Types for specific variables,
+            by name.
+        **settings: Overrides of the setting's dtypes, chunks or
+            compression.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        storage: str = "default",
+        overrides: Dict[str, str] = None,
+        **settings: Any,
+    ):
+        super().__init__(storage, overrides, **settings)
+        if self.compression in PLUGIN_COMPRESSION:
+            if not compression_filters():
+                raise ImportError(
+                    f"{self.compression} compression requires hdf5plugin "
+                    "(pip install hdf5plugin)."
+                )
+        self.file = h5py.File(path, mode="w")
+
+    def __setitem__(self, name: str, values: Any) -> None:
+        values = self.stored_values(name, values)
+        self.file.create_dataset(
+            name, data=values, **self._layout(values.shape)
+        )
+
+    def _layout(self, shape: tuple) -> Dict[str, Any]:
+        if self.chunks is None or len(shape) == 0 or shape[0] == 0:
+            return {}
+        layout = dict(chunks=(min(shape[0], self.chunks), *shape[1:]))
+        if self.compression == "gzip":
+            layout.update(compression="gzip", shuffle=True)
+        elif self.compression == "lzf":
+            layout.update(compression="lzf", shuffle=True)
+        elif self.compression == "lz4":
+            import hdf5plugin
+
+            layout.update(hdf5plugin.LZ4())
+        elif self.compression == "blosc":
+            import hdf5plugin
+
+            layout.update(
+                hdf5plugin.Blosc(cname="lz4", shuffle=hdf5plugin.Blosc.SHUFFLE)
+            )
+        return layout
+
+    def __getitem__(self, name: str) -> Union[h5py.Dataset, h5py.Group]:
+        return self.file[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.file
+
+    def __iter__(self):
+        return iter(self.file)
+
+    def __getattr__(self, attribute: str) -> Any:
+        if attribute == "file":
+            raise AttributeError(attribute)
+        return getattr(self.file, attribute)
+
+    def close(self) -> None:
+        self.file.close()
@@ -20,6 +20,8 @@ setup(
         "pytest",
         "pytest-dependency",
         "requests",
+        "pyyaml",
+        'importlib_metadata; python_version<"3.8"',
     ],
     extras_require={
         "dev": [
@@ -28,12 +30,14 @@ setup(
             "setuptools",
             "wheel",
             "openfisca-us",
-            "pyyaml",
+            "pytest-benchmark",
         ],
+        "compression": ["hdf5plugin"],
+        "parquet": ["pyarrow"],
     },
     entry_points={
         "console_scripts": ["openfisca-us-data=openfisca_us_data.cli:main"],
     },
     include_package_data=True,
-    package_data={"": ["openfisca_us_data/datasets/ce/*.yaml"]},
+    package_data={"": ["openfisca_us_data/datasets/*/*.yaml"]},
 )
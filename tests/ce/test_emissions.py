@@ -0,0 +1,61 @@
+import h5py
+import numpy as np
+import pytest
+from openfisca_us_data.datasets.ce.ce import (
+    add_carbon_emissions,
+    carbon_emissions,
+    emission_coefficients,
+    load_coefficient_sets,
+)
+
+
+@pytest.fixture
+def ce(tmp_path):
+    rng = np.random.default_rng(0)
+    n = 1_000
+    with h5py.File(tmp_path / "ce.h5", mode="w") as ce:
+        ce["/household/survey/weight"] = rng.uniform(1e3, 5e4, n)
+        for category in emission_coefficients():
+            ce["/household/expenditures/" + category] = rng.uniform(0, 1e3, n)
+        yield ce
+
+
+def test_emissions_match_the_sum_of_products(ce):
+    add_carbon_emissions(ce)
+    expected = sum(
+        coefficient * ce["/household/expenditures/" + category][:]
+        for category, coefficient in emission_coefficients().items()
+    )
+    co2_kg = ce["/household/emissions/co2_kg"][:]
+    assert co2_kg.dtype == np.float64
+    np.testing.assert_allclose(co2_kg, expected, rtol=1e-5)
+
+
+def test_sets_are_computed_together(ce):
+    sets = dict(
+        co2_kg=emission_coefficients(),
+        ch4_kg=dict(electricity=0.004, natural_gas=0.02),
+    )
+    emissions = carbon_emissions(ce, sets)
+    assert list(emissions) == ["co2_kg", "ch4_kg"]
+    expected = (
+        0.004 * ce["/household/expenditures/electricity"][:]
+        + 0.02 * ce["/household/expenditures/natural_gas"][:]
+    )
+    np.testing.assert_allclose(emissions["ch4_kg"], expected, rtol=1e-5)
+    single = carbon_emissions(ce, dict(co2_kg=sets["co2_kg"]), "float64")
+    np.testing.assert_allclose(emissions["co2_kg"], single["co2_kg"], 1e-5)
+
+
+def test_coefficients_are_copies():
+    emission_coefficients()["gasoline"] = 0
+    assert emission_coefficients()["gasoline"] == 3.22
+
+
+def test_coefficient_sets_file(tmp_path):
+    path = tmp_path / "factors.yaml"
+    path.write_text("ch4_kg:\n  electricity: 0.004\n")
+    assert load_coefficient_sets(path) == dict(ch4_kg=dict(electricity=0.004))
+    path.write_text("electricity: 0.004\n")
+    with pytest.raises(ValueError):
+        load_coefficient_sets(path)
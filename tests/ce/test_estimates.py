@@ -0,0 +1,141 @@
+import h5py
+import numpy as np
+import pandas as pd
+import pytest
+from openfisca_us_data.datasets.ce.ce import (
+    estimate_annual_quantities,
+    load_fmli,
+)
+
+
+@pytest.fixture
+def ce(tmp_path):
+    rng = np.random.default_rng(0)
+    n = 1_000
+    with h5py.File(tmp_path / "ce.h5", mode="w") as ce:
+        survey = "/household/survey/"
+        ce[survey + "nominal_year"] = np.full(n, 2019)
+        ce[survey + "nominal_quarter"] = rng.integers(1, 6, n)
+        ce[survey + "months_in_scope"] = rng.integers(0, 4, n)
+        ce[survey + "weight"] = rng.uniform(1e3, 5e4, n)
+        ce["/household/demographics/income"] = rng.uniform(0, 2e5, n)
+        ce["/household/expenditures/alcohol"] = rng.uniform(0, 500, n)
+        ce["/household/expenditures/water"] = rng.uniform(0, 300, n)
+        yield ce
+
+
+def per_quarter_estimate(ce, var_path, var_type):
+    quarter = ce["/household/survey/nominal_quarter"][:]
+    proportion_in_scope = ce["/household/survey/months_in_scope"][:] / 3
+    weight = ce["/household/survey/weight"][:]
+    estimates = []
+    for nominal_quarter in range(1, 6):
+        q = quarter == nominal_quarter
+        w = weight[q] * proportion_in_scope[q]
+        if var_type == "demographics":
+            estimates.append(np.sum(w * ce[var_path][q]) / np.sum(w))
+        else:
+            estimates.append(
+                np.sum(weight[q] * ce[var_path][q]) / np.sum(w) / 3 * 12
+            )
+    return np.mean(estimates)
+
+
+def test_batched_estimates_match_per_quarter_estimates(ce):
+    var_paths = [
+        "/household/demographics/income",
+        "/household/expenditures/alcohol",
+        "/household/expenditures/water",
+    ]
+    var_types = ["demographics", "expense", "expense"]
+    estimates = estimate_annual_quantities(ce, var_paths, var_types)
+    for var_path, var_type in zip(var_paths, var_types):
+        name = var_path.split("/")[-1]
+        expected = per_quarter_estimate(ce, var_path, var_type)
+        assert estimates[name] == pytest.approx(expected, rel=1e-12)
+        assert ce["/annual/" + name][()] == estimates[name]
+
+
+def test_years_are_estimated_together(ce, tmp_path):
+    var_paths = [
+        "/household/demographics/income",
+        "/household/expenditures/water",
+    ]
+    var_types = ["demographics", "expense"]
+    nominal_year = ce["/household/survey/nominal_year"]
+    nominal_year[:500] = 2018
+    estimates = estimate_annual_quantities(ce, var_paths, var_types, True)
+    assert list(ce["/annual/year"][:]) == [2018, 2019]
+    for year, rows in ((2018, slice(None, 500)), (2019, slice(500, None))):
+        with h5py.File(tmp_path / f"ce_{year}.h5", mode="w") as single:
+            for path in ce["/household/survey"]:
+                single["/household/survey/" + path] = ce[
+                    "/household/survey/" + path
+                ][rows]
+            for var_path in var_paths:
+                single[var_path] = ce[var_path][rows]
+            expected = estimate_annual_quantities(single, var_paths, var_types)
+        for name, value in expected.items():
+            assert estimates[name][year - 2018] == pytest.approx(value)
+    for name, values in estimates.items():
+        assert ce["/annual/pooled/" + name][()] == pytest.approx(values.mean())
+
+
+def test_standard_errors_from_replicate_weights(ce, tmp_path):
+    rng = np.random.default_rng(1)
+    weight = ce["/household/survey/weight"][:]
+    replicate_weights = weight[:, None] * rng.uniform(0.5, 1.5, (1_000, 44))
+    for i in range(44):
+        ce[f"/household/survey/replicate_weights/wtrep{i + 1:02d}"] = (
+            replicate_weights[:, i]
+        )
+    var_paths = [
+        "/household/demographics/income",
+        "/household/expenditures/water",
+    ]
+    var_types = ["demographics", "expense"]
+    estimates = estimate_annual_quantities(ce, var_paths, var_types)
+    replicate_estimates = []
+    for i in range(44):
+        with h5py.File(tmp_path / f"replicate_{i}.h5", mode="w") as single:
+            for path in ce["/household/survey"]:
+                if path != "replicate_weights":
+                    single["/household/survey/" + path] = ce[
+                        "/household/survey/" + path
+                    ][:]
+            single["/household/survey/weight"][:] = replicate_weights[:, i]
+            for var_path in var_paths:
+                single[var_path] = ce[var_path][:]
+            replicate_estimates.append(
+                estimate_annual_quantities(single, var_paths, var_types)
+            )
+    for name, estimate in estimates.items():
+        deviations = [
+            replicate[name] - estimate for replicate in replicate_estimates
+        ]
+        expected = np.sqrt(np.sum(np.square(deviations)) / 44)
+        assert ce["/annual/standard_errors/" + name][()] == pytest.approx(
+            expected, rel=1e-9
+        )
+
+
+def test_missing_replicate_weights_are_rejected(ce):
+    replicate_weights = np.ones(1_000)
+    replicate_weights[0] = np.nan
+    ce["/household/survey/replicate_weights/wtrep01"] = replicate_weights
+    with pytest.raises(ValueError, match="missing"):
+        estimate_annual_quantities(ce, ["/household/expenditures/water"])
+
+
+def test_load_fmli_fills_missing_replicate_weights():
+    quarter = pd.DataFrame(
+        dict(
+            interview_mo=[1, 2],
+            nominal_quarter=[1, 1],
+            WTREP01=[np.nan, 1.5],
+            WTREP02=[2.0, np.nan],
+        )
+    )
+    fmli = load_fmli(dict(fmli191=quarter))
+    assert fmli.WTREP01.tolist() == [0, 1.5]
+    assert fmli.WTREP02.tolist() == [2, 0]
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+from openfisca_us_data.datasets.ce.ce import (
+    months_in_scope,
+    months_in_scope_array,
+)
+
+# The months in scope by nominal quarter, for interviews from January on, as
+# given by the original, scalar implementation. Quarter 5 (the following
+# year's first quarter) is only interviewed in January to March.
+EXPECTED = {
+    1: [0, 1, 2, 3, 3, 3, 3, 3, 3, 3, 3, 3],
+    2: [0, 1, 2, 3, 3, 3, 3, 3, 3, 3, 3, 3],
+    3: [0, 1, 2, 3, 3, 3, 3, 3, 3, 3, 3, 3],
+    4: [0, 1, 2, 3, 3, 3, 3, 3, 3, 3, 3, 3],
+    5: [3, 2, 1],
+}
+CASES = [
+    (mo, quarter, months)
+    for quarter, row in EXPECTED.items()
+    for mo, months in enumerate(row, start=1)
+]
+
+
+def test_months_in_scope_array_matches_original_table():
+    interview_mo, nominal_quarter, expected = np.array(CASES).T
+    result = months_in_scope_array(interview_mo, nominal_quarter)
+    assert result.dtype == np.int8
+    assert list(result) == list(expected)
+
+
+@pytest.mark.parametrize("interview_mo,nominal_quarter,expected", CASES)
+def test_months_in_scope_matches_original_table(
+    interview_mo, nominal_quarter, expected
+):
+    assert months_in_scope(interview_mo, nominal_quarter) == expected
+
+
+@pytest.mark.parametrize(
+    "interview_mo,nominal_quarter,message",
+    [
+        ([1, 13], [1, 1], "interview_mo 13 outside range \\(rows 1\\)"),
+        ([4, 2], [5, 5], "interview_mo 4 outside range \\(rows 0\\)"),
+        ([1, 1], [1, 6], "nominal quarter 6 outside range \\(rows 1\\)"),
+    ],
+)
+def test_months_in_scope_array_reports_invalid_rows(
+    interview_mo, nominal_quarter, message
+):
+    with pytest.raises(ValueError, match=message):
+        months_in_scope_array(interview_mo, nominal_quarter)
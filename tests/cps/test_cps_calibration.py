@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+from openfisca_us_data.datasets.cps.cps import (
+    calibrate_weights,
+    calibration_targets,
+)
+from openfisca_us_data.entities import EntityIndex
+
+
+@pytest.fixture
+def cps():
+    # Three households of one, two and three persons, each one SPM unit,
+    # tax unit and family.
+    household_id = np.array([1, 2, 2, 3, 3, 3])
+    cps = dict(
+        e02400=np.array([0, 100, 0, 50, 50, 0], dtype=float),
+        person_weight=np.array([10, 20, 20, 30, 30, 30], dtype=float),
+        tax_unit_weight=np.array([10, 20, 30], dtype=float),
+        family_weight=np.array([10, 20, 30], dtype=float),
+        spm_unit_weight=np.array([10, 20, 30], dtype=float),
+        household_weight=np.array([10, 20, 30], dtype=float),
+    )
+    index = EntityIndex.from_ids(household_id, np.array([1, 2, 3]))
+    for entity in ("tax_unit", "family", "spm_unit", "household"):
+        index.save(cps, entity)
+    return cps
+
+
+def test_entity_weights_follow_their_households(cps):
+    targets = dict(
+        population=dict(count="person", value=170),
+        households=dict(count="household", value=80),
+        social_security=dict(sum="e02400", value=6_000),
+    )
+    report = calibrate_weights(cps, targets)
+    assert report["converged"]
+    weights = cps["household_weight"]
+    assert weights.sum() == pytest.approx(80)
+    assert (weights * [1, 2, 3]).sum() == pytest.approx(170)
+    assert (weights * [0, 100, 100]).sum() == pytest.approx(6_000)
+    for entity in ("tax_unit", "family", "spm_unit"):
+        np.testing.assert_allclose(cps[f"{entity}_weight"], weights)
+    np.testing.assert_allclose(
+        cps["person_weight"], weights[[0, 1, 1, 2, 2, 2]]
+    )
+
+
+def test_targets_file_is_valid():
+    for targets in calibration_targets().values():
+        for spec in targets.values():
+            assert ("count" in spec) != ("sum" in spec)
+            assert spec["value"] > 0
+
+
+def test_targets_are_met_by_their_entity_weights(cps):
+    cps["person_weight"] = np.array([10, 15, 25, 20, 30, 40], dtype=float)
+    targets = dict(
+        population=dict(count="person", value=200),
+        households=dict(count="household", value=80),
+        social_security=dict(sum="e02400", value=5_000),
+    )
+    report = calibrate_weights(cps, targets)
+    assert report["converged"]
+    assert cps["person_weight"].sum() == pytest.approx(200)
+    assert cps["household_weight"].sum() == pytest.approx(80)
+    assert cps["person_weight"] @ cps["e02400"] == pytest.approx(5_000)
+    assert report["targets"]["population"]["total"] == pytest.approx(200)
+
+
+def test_households_without_weight_are_left_out(cps):
+    cps["household_weight"][0] = 0
+    targets = dict(
+        population=dict(count="person", value=170),
+        social_security=dict(sum="e02400", value=6_000),
+    )
+    report = calibrate_weights(cps, targets)
+    assert report["converged"]
+    for weight in ("person_weight", "tax_unit_weight", "household_weight"):
+        assert np.isfinite(cps[weight]).all()
+    assert cps["household_weight"][0] == 0
+    assert cps["person_weight"][0] == 10
+    assert cps["person_weight"].sum() == pytest.approx(170)
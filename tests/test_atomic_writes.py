@@ -0,0 +1,87 @@
+import multiprocessing
+import time
+import pytest
+from openfisca_us_data.utils import dataset
+
+
+@dataset
+class Model:
+    name = "atomic_test"
+
+    def generate(year: int, value: str = "a", fail: bool = False) -> None:
+        with open(Model.file(year), "w") as f:
+            f.write(value)
+        with open(Model.data_dir / "builds.log", "a") as f:
+            f.write(value)
+        if fail:
+            raise ValueError("Build failed.")
+        time.sleep(0.2)
+
+
+@dataset
+class Directory:
+    name = "atomic_directory_test"
+
+    def generate(year: int, value: str = "a") -> None:
+        Directory.file(year).mkdir()
+        (Directory.file(year) / "table").write_text(value)
+
+
+@pytest.fixture(autouse=True)
+def data_dir(tmp_path):
+    Model.data_dir = Directory.data_dir = tmp_path
+
+
+def test_failed_build_keeps_previous_output(tmp_path):
+    Model.generate(2020)
+    with pytest.raises(ValueError):
+        Model.generate(2020, "b", True)
+    assert Model.file(2020).read_text() == "a"
+    assert Model.years == [2020]
+    assert Model.is_up_to_date(2020)
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_output_of_killed_build_is_removed(tmp_path):
+    stale = tmp_path / f".{Model.filename(2020)}.99999.tmp"
+    stale.write_text("partial")
+    assert Model.years == []
+    Model.generate(2020)
+    assert not stale.exists()
+    assert Model.file(2020).read_text() == "a"
+
+
+def test_directory_outputs_are_replaced(tmp_path):
+    Directory.generate(2020)
+    Directory.generate(2020, "b")
+    assert (Directory.file(2020) / "table").read_text() == "b"
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        ".atomic_directory_test_2020.lock",
+        ".catalog",
+        "atomic_directory_test_2020.build.json",
+        Directory.filename(2020),
+    ]
+
+
+def generate_in_process(data_dir) -> None:
+    Model.data_dir = data_dir
+    Model.generate(2020)
+
+
+@pytest.mark.skipif(
+    "fork" not in multiprocessing.get_all_start_methods(),
+    reason="Needs fork",
+)
+def test_concurrent_builds_of_one_output_take_turns(tmp_path):
+    context = multiprocessing.get_context("fork")
+    processes = [
+        context.Process(target=generate_in_process, args=(tmp_path,))
+        for _ in range(2)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    assert [process.exitcode for process in processes] == [0, 0]
+    # The second process waits for the first, then finds the output built.
+    assert (tmp_path / "builds.log").read_text() == "a"
@@ -0,0 +1,31 @@
+import pytest
+from openfisca_us_data.build import dependency_graph, parse_target
+
+
+def test_parse_target():
+    assert parse_target("cps:2018-2020") == [
+        ("cps", 2018),
+        ("cps", 2019),
+        ("cps", 2020),
+    ]
+    assert parse_target("ce:2016,2019") == [("ce", 2016), ("ce", 2019)]
+    with pytest.raises(ValueError):
+        parse_target("cps")
+    with pytest.raises(ValueError):
+        parse_target("unknown:2019")
+
+
+def test_dependency_graph_includes_raw_inputs():
+    graph = dependency_graph([("cps", 2020), ("raw_ce", 2019)])
+    assert graph == {
+        ("cps", 2020): {("raw_cps", 2020)},
+        ("raw_cps", 2020): set(),
+        ("raw_ce", 2019): set(),
+    }
+
+
+def test_panels_depend_on_every_year():
+    graph = dependency_graph([("ce_panel", 2019)])
+    assert graph[("ce_panel", 2019)] == {
+        ("raw_ce", year) for year in range(2010, 2020)
+    }
@@ -0,0 +1,136 @@
+import hashlib
+import json
+import os
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+import pytest
+from openfisca_us_data import cache
+
+CONTENT = bytes(range(256)) * 4096
+ETAG = '"' + hashlib.sha256(CONTENT).hexdigest()[:16] + '"'
+
+
+class StandIn(BaseHTTPRequestHandler):
+    """A local HTTP server supporting conditional and range requests."""
+
+    requests = []
+
+    def do_GET(self):
+        StandIn.requests.append(dict(self.headers))
+        if self.headers.get("If-None-Match") == ETAG:
+            self.send_response(304)
+            self.end_headers()
+            return
+        start = 0
+        if "Range" in self.headers and self.headers.get("If-Range") == ETAG:
+            start = int(self.headers["Range"][6:-1])
+            self.send_response(206)
+        else:
+            self.send_response(200)
+        self.send_header("ETag", ETAG)
+        self.send_header("Content-Length", str(len(CONTENT) - start))
+        self.end_headers()
+        self.wfile.write(CONTENT[start:])
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def url(tmp_path, monkeypatch):
+    monkeypatch.setenv("OPENFISCA_US_DATA_CACHE_DIR", str(tmp_path))
+    monkeypatch.delenv("OPENFISCA_US_DATA_OFFLINE", raising=False)
+    StandIn.requests = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandIn)
+    Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}/data.zip"
+    server.shutdown()
+    server.server_close()
+
+
+def test_fetch_downloads_once(url):
+    assert cache.fetch(url).read_bytes() == CONTENT
+    path = cache.fetch(url)
+    assert path.read_bytes() == CONTENT
+    assert path.name == hashlib.sha256(CONTENT).hexdigest()
+    assert StandIn.requests[-1]["If-None-Match"] == ETAG
+
+
+def test_offline_serves_from_cache_only(url):
+    with pytest.raises(FileNotFoundError):
+        cache.fetch(url, offline=True)
+    cache.fetch(url)
+    n_requests = len(StandIn.requests)
+    assert cache.fetch(url, offline=True).read_bytes() == CONTENT
+    assert len(StandIn.requests) == n_requests
+
+
+def test_partial_download_resumes(url):
+    partial = cache.cache_dir() / "partial" / cache._key(url)
+    partial.parent.mkdir(parents=True)
+    partial.write_bytes(CONTENT[:1000])
+    with open(partial.with_name(partial.name + ".json"), "w") as f:
+        json.dump(dict(validator=ETAG), f)
+    assert cache.fetch(url).read_bytes() == CONTENT
+    assert StandIn.requests[-1]["Range"] == "bytes=1000-"
+
+
+def test_corrupted_blob_is_downloaded_again(url):
+    path = cache.fetch(url)
+    mtime = path.stat().st_mtime_ns
+    path.write_bytes(b"corrupted" + CONTENT[9:])
+    os.utime(path, ns=(mtime + 10**9, mtime + 10**9))
+    assert cache.fetch(url).read_bytes() == CONTENT
+    assert "If-None-Match" not in StandIn.requests[-1]
+
+
+def test_cached_blobs_are_not_hashed_again(url, monkeypatch):
+    cache.fetch(url)
+
+    def sha256(path):
+        raise AssertionError("The blob was read.")
+
+    monkeypatch.setattr(cache, "_sha256", sha256)
+    assert cache.fetch(url).read_bytes() == CONTENT
+
+
+def test_touched_blob_is_verified_once(url, monkeypatch):
+    path = cache.fetch(url)
+    mtime = path.stat().st_mtime_ns
+    os.utime(path, ns=(mtime + 10**9, mtime + 10**9))
+    hashed = []
+    sha256 = cache._sha256
+    monkeypatch.setattr(
+        cache, "_sha256", lambda path: hashed.append(path) or sha256(path)
+    )
+    cache.fetch(url)
+    cache.fetch(url)
+    assert hashed == [path]
+
+
+def test_changed_file_is_saved_from_the_conditional_response(url):
+    cache.fetch(url)
+    index = cache.cache_dir() / "index" / f"{cache._key(url)}.json"
+    with open(index) as f:
+        entry = json.load(f)
+    with open(index, "w") as f:
+        json.dump(dict(entry, etag='"previous"'), f)
+    n_requests = len(StandIn.requests)
+    assert cache.fetch(url).read_bytes() == CONTENT
+    assert len(StandIn.requests) == n_requests + 1
+    assert StandIn.requests[-1]["If-None-Match"] == '"previous"'
+    with open(index) as f:
+        assert json.load(f)["etag"] == ETAG
+
+
+def test_concurrent_fetches_download_once(url):
+    paths = []
+    threads = [
+        Thread(target=lambda: paths.append(cache.fetch(url))) for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert [path.read_bytes() for path in paths] == [CONTENT] * 4
+    assert sum("If-None-Match" not in r for r in StandIn.requests) == 1
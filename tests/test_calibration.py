@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+from openfisca_us_data.calibration import calibrate
+
+
+@pytest.fixture
+def survey():
+    rng = np.random.default_rng(0)
+    n, targets = 5_000, 20
+    matrix = (rng.random((n, targets)) < 0.2) * rng.uniform(
+        0, 10, (n, targets)
+    )
+    matrix[:, 0] = 1
+    weights = rng.uniform(100, 1_000, n)
+    return matrix, weights, (matrix.T @ weights) * rng.uniform(0.9, 1.1, 20)
+
+
+def test_weights_hit_targets(survey):
+    matrix, initial, targets = survey
+    weights, report = calibrate(matrix, targets, initial)
+    assert report["converged"]
+    assert report["max_relative_error"] <= 1e-8
+    np.testing.assert_allclose(matrix.T @ weights, targets, rtol=1e-8)
+    assert (weights > 0).all()
+    assert report["targets"]["0"]["initial_total"] == pytest.approx(
+        initial.sum()
+    )
+
+
+def test_met_targets_keep_weights(survey):
+    matrix, initial, _ = survey
+    weights, report = calibrate(matrix, matrix.T @ initial, initial)
+    assert report["iterations"] == 0
+    np.testing.assert_array_equal(weights, initial)
+
+
+def test_infeasible_targets_are_reported(survey):
+    matrix, initial, targets = survey
+    # Every record has a count of one, so no weights total 1 with a
+    # negative count.
+    targets[0] = -1
+    _, report = calibrate(matrix, targets, initial, max_iterations=20)
+    assert not report["converged"]
+    assert report["targets"]["0"]["relative_error"] != 0
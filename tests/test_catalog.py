@@ -0,0 +1,61 @@
+import json
+from pathlib import Path
+import pytest
+from openfisca_us_data import catalog
+from openfisca_us_data.utils import dataset
+
+
+@dataset
+class Model:
+    name = "catalog_test"
+
+    def generate(year: int) -> None:
+        Model.file(year).write_text(str(year))
+
+
+@pytest.fixture(autouse=True)
+def data_dir(tmp_path):
+    Model.data_dir = tmp_path
+
+
+def test_catalog_records_built_files(tmp_path):
+    Model.generate(2020)
+    entry = catalog.files(tmp_path)[Model.filename(2020)]
+    assert entry["dataset"] == "catalog_test"
+    assert entry["year"] == 2020
+    assert entry["size"] == 4
+    with open(Model.build_record(2020)) as f:
+        assert entry["fingerprint"] == json.load(f)["fingerprint"]
+    with open(tmp_path / catalog.CATALOG_DIR / catalog.CATALOG) as f:
+        assert Model.filename(2020) in json.load(f)["files"]
+
+
+def test_years_read_the_catalog_without_listing_the_folder(
+    tmp_path, monkeypatch
+):
+    Model.generate(2020)
+    Model.generate(2021)
+    catalog._cache.clear()
+
+    def iterdir(path):
+        raise AssertionError("Listed the data folder.")
+
+    monkeypatch.setattr(Path, "iterdir", iterdir)
+    assert sorted(Model.years) == [2020, 2021]
+    assert Model.last_year == 2021
+
+
+def test_stale_catalog_is_rebuilt(tmp_path):
+    Model.generate(2020)
+    assert Model.years == [2020]
+    # A file copied in by hand changes the folder's modification time.
+    (tmp_path / Model.filename(2019)).write_text("2019")
+    assert sorted(Model.years) == [2019, 2020]
+    Model.remove(2020)
+    assert Model.years == [2019]
+
+
+def test_missing_folder_has_no_years(tmp_path):
+    Model.data_dir = tmp_path / "missing"
+    assert Model.years == []
+    assert not Model.data_dir.exists()
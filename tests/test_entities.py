@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+import pytest
+from openfisca_us_data.entities import EntityIndex, group_table
+from openfisca_us_data.utils import US, dataset
+
+# Six persons in three tax units, listed out of order.
+PERSON_TAX_UNIT_ID = np.array([20, 10, 20, 30, 10, 20])
+AGE = np.array([40, 35, 38, 70, 9, 12])
+
+
+@dataset
+class Model:
+    name = "entity_index_test"
+    model = US
+
+    def generate(year: int) -> None:
+        with Model.writer(year, "compact") as f:
+            EntityIndex.from_ids(PERSON_TAX_UNIT_ID).save(f, "tax_unit")
+
+
+def test_reductions():
+    index = EntityIndex.from_ids(PERSON_TAX_UNIT_ID)
+    np.testing.assert_array_equal(index.ids, [10, 20, 30])
+    np.testing.assert_array_equal(index.count(), [2, 3, 1])
+    np.testing.assert_array_equal(index.first(AGE), [35, 40, 70])
+    np.testing.assert_array_equal(index.sum(AGE), [44, 90, 70])
+    np.testing.assert_array_equal(
+        index.broadcast([1, 2, 3]), [2, 1, 2, 3, 1, 2]
+    )
+
+
+def test_group_order_follows_group_ids():
+    index = EntityIndex.from_ids(PERSON_TAX_UNIT_ID, [30, 20, 10, 40])
+    np.testing.assert_array_equal(index.sum(AGE), [70, 90, 44, 0])
+    np.testing.assert_array_equal(index.count(), [1, 3, 2, 0])
+    with pytest.raises(ValueError, match="Empty"):
+        index.first(AGE)
+    with pytest.raises(ValueError, match="missing"):
+        EntityIndex.from_ids(PERSON_TAX_UNIT_ID, [10, 20])
+    with pytest.raises(ValueError, match="unique"):
+        EntityIndex.from_ids(PERSON_TAX_UNIT_ID, [10, 20, 30, 30])
+
+
+def test_sum_does_not_overflow_small_integers():
+    index = EntityIndex.from_ids(np.zeros(300, dtype=int))
+    assert index.sum(np.ones(300, dtype=np.int8))[0] == 300
+
+
+def test_saved_index_loads(tmp_path):
+    Model.data_dir = tmp_path
+    Model.generate(2020)
+    index = EntityIndex.load(Model, 2020, "tax_unit")
+    np.testing.assert_array_equal(index.sum(AGE), [44, 90, 70])
+
+
+@pytest.mark.parametrize("how", ["sum", "first"])
+def test_group_table_matches_pandas(how):
+    rng = np.random.default_rng(0)
+    n = 2_000
+    person = pd.DataFrame(
+        dict(
+            TAX_ID=rng.integers(0, 500, n).astype(np.int32),
+            small=rng.integers(-100, 100, n).astype(np.int8),
+            income=(rng.standard_normal(n) * 1e6).astype(np.float32),
+            benefit=np.where(rng.random(n) > 0.5, np.nan, rng.random(n)),
+        )
+    )
+    columns = list(person.columns)
+    expected = getattr(person[columns].groupby(person.TAX_ID), how)()
+    result = group_table(person, "TAX_ID", columns, how)
+    np.testing.assert_array_equal(result.TAX_ID, result.index)
+    pd.testing.assert_frame_equal(
+        result.drop(columns="TAX_ID"), expected, check_exact=True
+    )
@@ -0,0 +1,156 @@
+import pytest
+from openfisca_us_data import fingerprints
+from openfisca_us_data.utils import dataset, parse_argument
+
+builds = []
+
+
+@dataset
+class Parent:
+    name = "fingerprint_test_parent"
+
+    def generate(year: int, value: str = "a") -> None:
+        builds.append(("parent", value))
+        Parent.file(year).write_text(value)
+
+
+@dataset
+class Child:
+    name = "fingerprint_test_child"
+    inputs = (Parent,)
+
+    def generate(year: int) -> None:
+        builds.append(("child",))
+        Child.file(year).write_text(Parent.file(year).read_text())
+
+
+@pytest.fixture(autouse=True)
+def data_dir(tmp_path):
+    Parent.data_dir = Child.data_dir = Panel.data_dir = tmp_path
+    builds.clear()
+
+
+def test_generate_is_a_no_op_when_inputs_are_unchanged():
+    Parent.generate(2020)
+    Parent.generate(2020)
+    assert builds == [("parent", "a")]
+    Parent.generate(2020, force=True)
+    Parent.generate(2020, "b")
+    assert builds == [("parent", "a"), ("parent", "a"), ("parent", "b")]
+
+
+def test_child_rebuilds_only_when_parent_fingerprint_changes():
+    Parent.generate(2020)
+    Child.generate(2020)
+    Child.generate(2020)
+    assert builds == [("parent", "a"), ("child",)]
+    assert Child.is_up_to_date(2020)
+    Parent.generate(2020, "b")
+    assert not Child.is_up_to_date(2020)
+    Child.generate(2020)
+    assert Child.file(2020).read_text() == "b"
+
+
+def test_remove_deletes_build_record():
+    Parent.generate(2020)
+    Parent.remove(2020)
+    assert not Parent.build_record(2020).exists()
+    assert not Parent.is_up_to_date(2020)
+
+
+def test_keyword_arguments_are_forwarded_and_fingerprinted():
+    Parent.generate(2020, value="b")
+    assert Parent.file(2020).read_text() == "b"
+    assert Parent.is_up_to_date(2020, "b")
+    assert Parent.is_up_to_date(2020, value="b")
+    assert not Parent.is_up_to_date(2020)
+    Parent.generate(2020, value="b")
+    assert builds == [("parent", "b")]
+
+
+def test_default_arguments_match_omitted_ones():
+    Parent.generate(2020)
+    assert Parent.is_up_to_date(2020, "a")
+    assert Parent.is_up_to_date(2020, value="a")
+    Parent.generate(2020, "a")
+    assert builds == [("parent", "a")]
+
+
+def test_helper_modules_are_fingerprinted(monkeypatch):
+    before = fingerprints.code_hash(Parent)
+    monkeypatch.setattr(fingerprints, "HELPERS", ("mapping.py",))
+    assert fingerprints.code_hash(Parent) != before
+
+
+@dataset
+class Panel:
+    name = "fingerprint_test_panel"
+    inputs = (Parent,)
+
+    def input_years(year: int, years: int = 2, **arguments) -> range:
+        return range(year - years + 1, year + 1)
+
+    def generate(year: int, years: int = 2) -> None:
+        builds.append(("panel",))
+        Panel.file(year).write_text("panel")
+
+
+def test_every_input_year_is_fingerprinted():
+    Parent.generate(2019)
+    Parent.generate(2020)
+    Panel.generate(2020)
+    assert Panel.is_up_to_date(2020)
+    Parent.generate(2019, "b")
+    assert not Panel.is_up_to_date(2020)
+    Panel.generate(2020)
+    assert builds.count(("panel",)) == 2
+
+
+@dataset
+class Configured:
+    name = "fingerprint_test_configured"
+
+    def input_files(year: int, config: str = None, **arguments):
+        return () if config is None else (config,)
+
+    def generate(year: int, config: str = None) -> None:
+        builds.append(("configured",))
+        Configured.file(year).write_text("configured")
+
+
+def test_contents_of_input_files_are_fingerprinted(tmp_path):
+    Configured.data_dir = tmp_path
+    config = tmp_path / "config.yaml"
+    config.write_text("a: 1")
+    Configured.generate(2020, str(config))
+    assert Configured.is_up_to_date(2020, str(config))
+    config.write_text("a: 2")
+    assert not Configured.is_up_to_date(2020, str(config))
+    Configured.generate(2020, str(config))
+    Configured.generate(2020, str(config))
+    assert builds == [("configured",), ("configured",)]
+
+
+def test_string_arguments_are_parsed_as_their_parameter_type():
+    Parent.generate(2019)
+    Parent.generate(2020)
+    Panel.generate(2020, 2)
+    assert Panel.is_up_to_date(2020, "2")
+    Panel.generate(2020, "2")
+    assert builds.count(("panel",)) == 1
+
+
+@pytest.mark.parametrize(
+    "value, kind, parsed",
+    [
+        ("2", int, 2),
+        ("0.5", float, 0.5),
+        ("False", bool, False),
+        ("yes", bool, True),
+        ("2", str, "2"),
+        (2, int, 2),
+        (None, int, None),
+    ],
+)
+def test_parse_argument(value, kind, parsed):
+    assert parse_argument(value, kind) == parsed
@@ -1,3 +1,7 @@
+import subprocess
+import sys
+
+
 def test_import():
     import openfisca_us_data
 
@@ -24,3 +28,43 @@ def test_RawCE_import():
 
 def test_CE_import():
     from openfisca_us_data import CE
+
+
+HEAVY_MODULES = (
+    "pandas",
+    "numpy",
+    "h5py",
+    "tables",
+    "requests",
+    "tqdm",
+    "yaml",
+)
+
+
+def test_import_skips_heavy_dependencies():
+    # Importing the package, the CLI and the dataset classes shouldn't import
+    # any dependency used only to generate or load data.
+    code = (
+        "import sys\n"
+        "import openfisca_us_data.cli\n"
+        "from openfisca_us_data import DATASETS, RawCPS, CPS, ACS, CE\n"
+        f"print([m for m in {HEAVY_MODULES!r} if m in sys.modules])\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert result.stdout.strip() == "[]"
+
+
+def test_import_creates_no_folders(tmp_path):
+    code = (
+        "from openfisca_us_data import utils\n"
+        "from pathlib import Path\n"
+        f"utils.DATA_DIR = Path({str(tmp_path / 'microdata')!r})\n"
+        "from openfisca_us_data import DATASETS\n"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)
+    assert not (tmp_path / "microdata").exists()
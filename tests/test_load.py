@@ -0,0 +1,60 @@
+import h5py
+import numpy as np
+import pytest
+from openfisca_us_data import handles
+from openfisca_us_data.utils import US, dataset
+
+
+@dataset
+class Model:
+    name = "load_test"
+    model = US
+
+    def generate(year: int) -> None:
+        with h5py.File(Model.file(year), mode="w") as f:
+            f["person_id"] = np.arange(10)
+            f["/household/weight"] = np.linspace(0, 1, 4)
+            f["/annual/total"] = 3.5
+            f.create_dataset(
+                "compressed", data=np.ones(100), compression="gzip"
+            )
+
+
+@pytest.fixture(autouse=True)
+def data_dir(tmp_path):
+    Model.data_dir = tmp_path
+    Model.generate(2020)
+
+
+def test_memory_mapped_load_matches_copy():
+    person_id = Model.load(2020, "person_id", mode="memmap")
+    assert isinstance(person_id, np.memmap)
+    assert not person_id.flags.writeable
+    assert np.array_equal(person_id, Model.load(2020, "person_id"))
+
+
+def test_memory_mapped_load_of_whole_file():
+    with pytest.raises(ValueError, match="compressed"):
+        Model.load(2020, mode="memmap")
+    with h5py.File(Model.file(2020), mode="a") as f:
+        del f["compressed"]
+    arrays = Model.load(2020, mode="memmap")
+    assert set(arrays) == {"person_id", "household/weight", "annual/total"}
+    assert np.array_equal(arrays["household/weight"], np.linspace(0, 1, 4))
+    assert arrays["annual/total"] == 3.5
+
+
+def test_load_many_reuses_one_pooled_handle():
+    values = Model.load_many(2020, ["person_id", "/household/weight"])
+    assert np.array_equal(values["person_id"], np.arange(10))
+    assert np.array_equal(values["/household/weight"], np.linspace(0, 1, 4))
+    handle, _ = handles._pool[("load_test", 2020)]
+    Model.load(2020, "person_id")
+    assert handles._pool[("load_test", 2020)][0] is handle
+
+
+def test_pooled_handle_is_reopened_when_the_file_is_replaced():
+    Model.load(2020, "person_id")
+    Model.generate(2020, force=True)
+    assert ("load_test", 2020) not in handles._pool
+    assert np.array_equal(Model.load(2020, "person_id"), np.arange(10))
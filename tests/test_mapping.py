@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+import pytest
+from openfisca_us_data.datasets.acs import acs
+from openfisca_us_data.datasets.ce import ce
+from openfisca_us_data.datasets.cps import cps
+from openfisca_us_data.mapping import VariableMap
+
+PERSON = pd.DataFrame(
+    dict(
+        WSAL_VAL=np.array([100, 200, 300], dtype=np.int32),
+        OI_OFF=np.array([2, 13, 20], dtype=np.int8),
+        OI_VAL=np.array([10, 20, 30], dtype=np.int32),
+        A_FNLWGT=np.array([150, 250, 350], dtype=np.int32),
+    )
+)
+
+
+def test_forms_match_pandas():
+    variables = VariableMap(
+        dict(
+            person=dict(
+                e00200="WSAL_VAL",
+                e01500=dict(column="OI_VAL", where=dict(OI_OFF=[2, 13])),
+                total=dict(sum=["WSAL_VAL", "OI_VAL"], multiply="half"),
+                person_weight=dict(column="A_FNLWGT", divide=100),
+            )
+        ),
+        dict(half=0.5),
+    ).evaluate("person", PERSON)
+    expected = dict(
+        e00200=PERSON.WSAL_VAL,
+        e01500=PERSON.OI_OFF.isin((2, 13)) * PERSON.OI_VAL,
+        total=(PERSON.WSAL_VAL + PERSON.OI_VAL) * 0.5,
+        person_weight=PERSON.A_FNLWGT / 1e2,
+    )
+    assert list(variables) == list(expected)
+    for name, values in expected.items():
+        assert variables[name].dtype == values.dtype
+        assert np.array_equal(variables[name], values)
+
+
+def test_groups_become_paths():
+    writer = {}
+    VariableMap(
+        dict(person=dict(household=dict(income=dict(wages="WSAL_VAL"))))
+    ).write(writer, dict(person=PERSON))
+    assert list(writer) == ["/household/income/wages"]
+
+
+def test_columns_are_read_once():
+    variables = VariableMap(
+        dict(
+            person=dict(
+                pensions=dict(column="OI_VAL", where=dict(OI_OFF=[2, 13])),
+                pension_weight=dict(
+                    column="A_FNLWGT", where=dict(OI_OFF=[2, 13])
+                ),
+            )
+        )
+    )
+    assert variables.requires("person") == ["OI_VAL", "OI_OFF", "A_FNLWGT"]
+
+
+@pytest.mark.parametrize(
+    "spec,error",
+    [
+        (dict(x=dict(column="A", sum=["B"])), ValueError),
+        (dict(x=dict(column="A", scale=2)), ValueError),
+        (dict(x=dict(column="A", multiply="unknown")), KeyError),
+    ],
+)
+def test_invalid_specs(spec, error):
+    with pytest.raises(error):
+        VariableMap(dict(person=spec))
+
+
+def test_missing_columns():
+    with pytest.raises(KeyError, match="MISSING"):
+        VariableMap(dict(person=dict(x="MISSING"))).evaluate("person", PERSON)
+
+
+@pytest.mark.parametrize("module", [cps, acs, ce], ids=["cps", "acs", "ce"])
+def test_dataset_specs_compile(module):
+    assert module.variable_map().tables
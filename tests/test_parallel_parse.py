@@ -0,0 +1,78 @@
+from itertools import count, islice
+import multiprocessing
+import os
+import pytest
+from openfisca_us_data.utils import parse_in_parallel, parse_workers
+
+
+def squares(n: int):
+    for i in range(n):
+        yield i * i
+
+
+def process_id(_) -> int:
+    return os.getpid()
+
+
+def endless(start: int):
+    yield from count(start)
+
+
+def failing(_):
+    raise KeyError("missing column")
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_results_match_serial_parsing(workers):
+    tasks = dict(a=(3,), b=(5,))
+    with parse_in_parallel(squares, tasks, workers) as parsed:
+        assert list(parsed["a"]()) == [0, 1, 4]
+        assert list(parsed["b"]()) == [0, 1, 4, 9, 16]
+
+
+def test_members_parse_in_worker_processes():
+    with parse_in_parallel(process_id, dict(a=(0,)), 2) as parsed:
+        assert parsed["a"]() != os.getpid()
+    with parse_in_parallel(process_id, dict(a=(0,)), 1) as parsed:
+        assert parsed["a"]() == os.getpid()
+
+
+def test_worker_count_setting(monkeypatch):
+    monkeypatch.setenv("OPENFISCA_US_DATA_PARSE_WORKERS", "1")
+    assert parse_workers(5) == 1
+    monkeypatch.setenv("OPENFISCA_US_DATA_PARSE_WORKERS", "8")
+    assert parse_workers(5) == 5
+    monkeypatch.delenv("OPENFISCA_US_DATA_PARSE_WORKERS")
+    assert parse_workers(5) == 1
+
+
+def test_chunks_stream_from_workers():
+    with parse_in_parallel(endless, dict(a=(0,), b=(10,)), 2) as parsed:
+        assert list(islice(parsed["b"](), 3)) == [10, 11, 12]
+        assert list(islice(parsed["a"](), 3)) == [0, 1, 2]
+
+
+def test_members_can_be_requested_in_any_order():
+    tasks = {key: (40,) for key in "abc"}
+    with parse_in_parallel(squares, tasks, 2) as parsed:
+        totals = []
+        for key in "cab":
+            chunks = parsed[key]()
+            assert len(multiprocessing.active_children()) <= 2
+            totals.append(sum(chunks))
+    assert totals == [sum(i * i for i in range(40))] * 3
+
+
+def test_workers_are_limited_while_members_are_read():
+    tasks = {key: (0,) for key in "abc"}
+    with parse_in_parallel(endless, tasks, 2) as parsed:
+        next(parsed["a"]())
+        next(parsed["b"]())
+        with pytest.raises(RuntimeError, match="2 workers"):
+            parsed["c"]()
+
+
+def test_errors_are_raised_in_this_process():
+    with parse_in_parallel(failing, dict(a=(0,)), 2) as parsed:
+        with pytest.raises(KeyError, match="missing column"):
+            parsed["a"]()
@@ -0,0 +1,141 @@
+import numpy as np
+import pandas as pd
+import pytest
+from openfisca_us_data.mapping import VariableMap
+from openfisca_us_data.parquet import (
+    ParquetVariableReader,
+    ParquetVariableWriter,
+)
+from openfisca_us_data.utils import US, dataset
+
+pytest.importorskip("pyarrow")
+
+PERSON = pd.DataFrame(
+    dict(PERSON_ID=np.arange(6), AGE=[5, 30, 41, 67, 70, 12])
+)
+
+
+@dataset
+class Raw:
+    name = "parquet_raw_test"
+
+    def generate(year: int) -> None:
+        with Raw.writer(year) as storage:
+            storage.append("person", PERSON[:4])
+            storage.append("person", PERSON[4:])
+            storage["household"] = pd.DataFrame(dict(HOUSEHOLD_ID=[1, 2]))
+
+
+@dataset
+class Model:
+    name = "parquet_model_test"
+    model = US
+
+    def generate(year: int, storage: str = "default") -> None:
+        with Model.writer(year, storage) as f:
+            f["person_id"] = PERSON.PERSON_ID
+            f["age"] = PERSON.AGE
+            f["household_id"] = np.array([1, 2])
+            f.create_group("/annual")
+            f["/annual/total_age"] = f["age"][:].sum()
+            assert list(f["/annual"]) == ["total_age"]
+
+
+@pytest.fixture(autouse=True, params=["hdf5", "parquet"])
+def backend(request, tmp_path):
+    for ds in (Raw, Model):
+        ds.data_dir = tmp_path
+        ds.backend = request.param
+    Raw.generate(2020)
+    Model.generate(2020)
+    yield request.param
+    Raw.backend = Model.backend = None
+
+
+def test_raw_tables_round_trip():
+    person = Raw.load(2020, "person").reset_index(drop=True)
+    pd.testing.assert_frame_equal(person, PERSON)
+    with Raw.load(2020) as store:
+        keys = sorted(key.strip("/") for key in store.keys())
+    assert keys == ["household", "person"]
+
+
+def test_projection_and_filters():
+    older = Raw.load(
+        2020, "person", columns=["AGE"], filters=[("AGE", ">", 60)]
+    )
+    assert list(older.columns) == ["AGE"]
+    assert older.AGE.tolist() == [67, 70]
+    either = Raw.load(
+        2020, "person", filters=[[("AGE", "<", 10)], [("AGE", ">=", 70)]]
+    )
+    assert either.PERSON_ID.tolist() == [0, 4]
+
+
+def test_model_variables_round_trip():
+    np.testing.assert_array_equal(Model.load(2020, "age"), PERSON.AGE)
+    assert Model.load(2020, "/annual/total_age") == PERSON.AGE.sum()
+    ages = Model.load_many(
+        2020, ["person_id", "age"], filters=[("age", "in", {30, 41})]
+    )
+    np.testing.assert_array_equal(ages["person_id"], [1, 2])
+
+
+def test_parquet_layout(backend):
+    if backend != "parquet":
+        pytest.skip("Parquet only")
+    directory = Model.file(2020)
+    assert sorted(path.name for path in directory.glob("*.parquet")) == [
+        "annual.parquet",
+        "household.parquet",
+        "person.parquet",
+    ]
+    age = Model.load(2020, "age")
+    assert not age.flags.writeable  # Shares the Arrow buffer.
+    with pytest.raises(ValueError):
+        Model.load(2020, "age", mode="memmap")
+    with pytest.raises(ValueError, match="entity"):
+        Model.load(2020, "household_id", filters=[("age", ">", 1)])
+    Model.remove(2020)
+    assert not directory.exists()
+
+
+def test_entities_of_the_same_length(backend, tmp_path):
+    if backend != "parquet":
+        pytest.skip("Parquet only")
+    directory = tmp_path / "entities.parquet"
+    with ParquetVariableWriter(directory) as f:
+        f["person_id"] = np.arange(3)
+        f["person_tax_unit_id"] = np.array([1, 1, 2])
+        f["tax_unit_id"] = np.array([1, 2])
+        f["household_id"] = np.array([1, 2])
+        f["tax_unit_weight"] = np.array([1.0, 2.0])
+        VariableMap(dict(household=dict(rent="RENT"))).write(
+            f, dict(household=pd.DataFrame(dict(RENT=[500, 700])))
+        )
+    reader = ParquetVariableReader(directory)
+    tables = {name: reader.variables[name]["table"] for name in reader}
+    assert tables == dict(
+        person_id="person",
+        person_tax_unit_id="person",
+        tax_unit_id="tax_unit",
+        household_id="household",
+        tax_unit_weight="tax_unit",
+        rent="household",
+    )
+    with pytest.raises(ValueError, match="entity"):
+        reader.read(["rent"], filters=[("tax_unit_weight", ">", 1)])
+    assert reader.read(["tax_unit_id"], filters=[("tax_unit_weight", ">", 1)])[
+        "tax_unit_id"
+    ].tolist() == [2]
+
+
+def test_entity_of_ambiguous_variables_is_required(backend, tmp_path):
+    if backend != "parquet":
+        pytest.skip("Parquet only")
+    f = ParquetVariableWriter(tmp_path / "ambiguous.parquet")
+    f["tax_unit_id"] = np.array([1, 2])
+    f["household_id"] = np.array([1, 2])
+    f["income"] = np.array([1.0, 2.0])
+    with pytest.raises(ValueError, match="tax_unit"):
+        f.close()
@@ -0,0 +1,76 @@
+import io
+import json
+import numpy as np
+import pytest
+from openfisca_us_data import profiling
+from openfisca_us_data.profiling import count, profile, stage, stages
+from openfisca_us_data.utils import US, dataset
+
+
+@dataset
+class Model:
+    name = "profiling_test"
+    model = US
+
+    def generate(year: int) -> None:
+        with Model.writer(year) as f:
+            with stage("add variables"):
+                f["person_id"] = np.arange(10)
+                count("variables")
+
+
+def test_stages_nest_and_add_up():
+    with profile() as report:
+        with stage("build"):
+            for chunk in stages("parse", [[1, 2], [3]]):
+                with stage("write"):
+                    count("rows", len(chunk))
+    assert list(report.stages) == ["build", "build/parse", "build/write"]
+    assert report.stages["build/write"]["calls"] == 2
+    assert report.stages["build/write"]["counters"] == dict(rows=3)
+    assert report.stages["build/parse"]["counters"] == dict(rows=3)
+    build = report.stages["build"]
+    assert (
+        build["wall_seconds"] >= report.stages["build/write"]["wall_seconds"]
+    )
+
+
+def test_stages_do_nothing_outside_a_profile():
+    with stage("build"):
+        count("rows", 1)
+    assert profiling._active is None
+
+
+def test_generate_is_a_stage_per_dataset_and_year(tmp_path):
+    Model.data_dir = tmp_path
+    with profile() as report:
+        Model.generate(2020, force=True)
+    stage_record = report.stages["profiling_test:2020/add variables"]
+    assert stage_record["calls"] == 1
+    assert stage_record["counters"] == dict(variables=1)
+
+
+def test_log_is_json_lines():
+    with profile() as report:
+        with stage("build"):
+            pass
+    log = io.StringIO()
+    report.write(log)
+    (record,) = map(json.loads, log.getvalue().splitlines())
+    assert record["stage"] == "build"
+    assert set(record) >= {
+        "calls",
+        "wall_seconds",
+        "cpu_seconds",
+        "read_bytes",
+        "written_bytes",
+        "peak_rss_bytes",
+    }
+
+
+def test_stage_records_failed_steps():
+    with profile() as report:
+        with pytest.raises(ValueError):
+            with stage("build"):
+                raise ValueError()
+    assert report.stages["build"]["calls"] == 1
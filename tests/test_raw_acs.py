@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+import pytest
+from openfisca_us_data.datasets.acs import acs as acs_module
+from openfisca_us_data.datasets.acs.acs import ACS
+from openfisca_us_data.datasets.acs.raw_acs import (
+    RawACS,
+    column_manifest,
+    create_household_table,
+    read_person_chunks,
+)
+
+
+def test_chunks_keep_column_types(tmp_path):
+    person = pd.DataFrame(
+        dict(
+            serialno=np.repeat(np.arange(5, dtype=np.int32), 2),
+            st=np.full(10, 6, dtype=np.int8),
+            puma=np.arange(10, dtype=np.int32),
+            wt=np.linspace(1, 2, 10),
+        )
+    )
+    person.to_stata(tmp_path / "spm.dta", write_index=False)
+    chunks = list(read_person_chunks(tmp_path / "spm.dta", "full", 3))
+    assert [len(chunk) for chunk in chunks] == [3, 3, 3, 1]
+    whole = pd.concat(chunks)
+    assert list(whole.columns) == ["SERIALNO", "ST", "PUMA", "WT"]
+    assert (whole.dtypes == [np.int32, np.int8, np.int32, np.float64]).all()
+    households = create_household_table(
+        pd.concat(create_household_table(chunk) for chunk in chunks)
+    )
+    pd.testing.assert_frame_equal(
+        households, create_household_table(whole), check_exact=True
+    )
+    assert len(households) == 5
+
+
+def test_replicate_weights_are_read_where_present(tmp_path):
+    manifest = column_manifest()
+    person = pd.DataFrame(
+        {
+            column.lower(): np.ones(4, dtype=dtype)
+            for column, dtype in manifest["person"].items()
+        }
+    )
+    person.to_stata(tmp_path / "spm.dta", write_index=False)
+    (chunk,) = read_person_chunks(tmp_path / "spm.dta")
+    assert "PWGTP1" not in chunk
+    for i in range(1, 81):
+        person[f"pwgtp{i}"] = np.full(4, i, dtype=np.float64)
+    person.to_stata(tmp_path / "spm.dta", write_index=False)
+    (chunk,) = read_person_chunks(tmp_path / "spm.dta")
+    replicate_weights = chunk[list(manifest["person_replicate_weights"])]
+    assert (replicate_weights.dtypes == np.float32).all()
+    assert replicate_weights.iloc[0].tolist() == list(range(1, 81))
+
+
+@pytest.mark.parametrize("backend", ["hdf5", "parquet"])
+def test_estimate_totals_reads_only_replicate_weights(
+    backend, tmp_path, monkeypatch
+):
+    if backend == "parquet":
+        pytest.importorskip("pyarrow")
+    for ds in (RawACS, ACS):
+        monkeypatch.setattr(ds, "data_dir", tmp_path)
+        monkeypatch.setattr(ds, "backend", backend)
+    columns = list(column_manifest()["person_replicate_weights"])
+    person = pd.DataFrame(dict(SERIALNO=[1, 2], WT=[10.0, 20.0]))
+    with RawACS.writer(2019) as storage:
+        storage.append("person", person)
+    with ACS.writer(2019) as acs:
+        acs["person_id"] = np.array([1, 2])
+        acs["person_weight"] = person.WT
+        acs["income"] = np.array([100.0, 200.0])
+    with pytest.raises(ValueError, match="no replicate weights"):
+        acs_module.estimate_totals(2019, ["income"])
+    for i, column in enumerate(columns):
+        person[column] = person.WT * (1 + (i % 2) / 10)
+    with RawACS.writer(2019) as storage:
+        storage.append("person", person)
+    loaded = []
+    load = RawACS.load
+    monkeypatch.setattr(
+        RawACS,
+        "load",
+        lambda *args, **kwargs: loaded.append(kwargs) or load(*args, **kwargs),
+    )
+    totals = acs_module.estimate_totals(2019, ["income"])
+    assert loaded == [dict(columns=columns)]
+    assert totals.estimate["income"] == 5_000
+    assert totals.standard_error["income"] == pytest.approx(
+        np.sqrt(4 / 80 * 40 * 500**2)
+    )
@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+from openfisca_us_data import replicates
+from openfisca_us_data.replicates import estimate_totals, standard_errors
+
+
+@pytest.fixture
+def sample():
+    rng = np.random.default_rng(0)
+    n, k, r = 1_000, 3, 80
+    values = rng.uniform(0, 100, (n, k))
+    weight = rng.uniform(50, 150, n)
+    replicate_weights = (
+        weight[:, None] * rng.uniform(0.5, 1.5, (n, r))
+    ).astype(np.float32)
+    return values, weight, replicate_weights
+
+
+def test_totals_match_separate_passes(sample):
+    values, weight, replicate_weights = sample
+    totals, errors = estimate_totals(values, weight, replicate_weights, 4 / 80)
+    for i in range(values.shape[1]):
+        total = np.sum(values[:, i] * weight)
+        replicate_totals = [
+            np.sum(values[:, i] * replicate_weights[:, r].astype(float))
+            for r in range(replicate_weights.shape[1])
+        ]
+        deviations = np.array(replicate_totals) - total
+        assert totals[i] == pytest.approx(total, rel=1e-12)
+        assert errors[i] == pytest.approx(
+            np.sqrt(4 / 80 * np.sum(deviations**2)), rel=1e-9
+        )
+
+
+def test_chunks_add_up(sample, monkeypatch):
+    values, weight, replicate_weights = sample
+    whole = estimate_totals(values, weight, replicate_weights, 1 / 44)
+    monkeypatch.setattr(replicates, "CHUNK_ROWS", 64)
+    chunked = estimate_totals(values, weight, replicate_weights, 1 / 44)
+    for expected, result in zip(whole, chunked):
+        np.testing.assert_allclose(result, expected, rtol=1e-12)
+
+
+def test_equal_replicates_have_no_error():
+    assert standard_errors(np.full((2, 45), 3.0), 1 / 44).tolist() == [0, 0]
+
+
+def test_grouped_totals_match_each_group(sample, monkeypatch):
+    values, weight, replicate_weights = sample
+    weights = replicates.weight_block(weight, replicate_weights)
+    group = np.arange(len(values)) % 7
+    monkeypatch.setattr(replicates, "CHUNK_PRODUCTS", 10_000)
+    totals = replicates.grouped_totals(values, weights, group, 8)
+    for g in range(8):
+        np.testing.assert_allclose(
+            totals[g],
+            replicates.weighted_totals(
+                values[group == g], weights[group == g]
+            ),
+            rtol=1e-12,
+        )
+
+
+def test_totals_beyond_float32_precision_are_exact():
+    # Each weight is exact in float32, but the totals need more precision
+    # than float32 has, so only float64 accumulation keeps them exact.
+    n = 1_000
+    base = 2**24 + 2
+    weight = np.full(n, base, dtype=np.float32)
+    replicate_weights = np.column_stack([weight + 2, weight + 4])
+    assert replicate_weights.dtype == np.float32
+    values = np.ones((n, 1), dtype=np.float32)
+    assert float(weight.sum(dtype=np.float32)) != n * base
+    totals, errors = estimate_totals(values, weight, replicate_weights, 1)
+    assert totals[0] == n * base
+    assert errors[0] == np.sqrt((2 * n) ** 2 + (4 * n) ** 2)
+    weights = replicates.weight_block(weight, replicate_weights)
+    grouped = replicates.grouped_totals(
+        values, weights, np.zeros(n, dtype=int), 1
+    )
+    assert grouped[0, 0].tolist() == [n * base, n * (base + 2), n * (base + 4)]
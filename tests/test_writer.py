@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+import pytest
+from openfisca_us_data.utils import memory_map
+from openfisca_us_data.writer import DatasetWriter, compression_filters
+
+
+def write_variables(path, **settings):
+    with DatasetWriter(path, **settings) as f:
+        f["person_id"] = pd.Series([101, 102, 201], dtype="int64")
+        f["household_id"] = np.array([1.0, 1.0, 2.0])
+        f["age"] = pd.Series([30, 41, 7], dtype="int8")
+        f["is_adult"] = pd.Series([True, True, False])
+        f["income"] = pd.Series([1e4, 2.5e4, 0.0])
+        f.create_group("/annual")
+        f["/annual/household_weight"] = np.array([1.5, 2.5])
+
+
+def test_exact_storage_keeps_types(tmp_path):
+    write_variables(tmp_path / "exact.h5")
+    arrays = memory_map(tmp_path / "exact.h5")
+    assert arrays["person_id"].dtype == np.int64
+    assert arrays["household_id"].dtype == np.float64
+    assert arrays["income"].dtype == np.float64
+
+
+def test_compact_storage_narrows_types(tmp_path):
+    write_variables(tmp_path / "compact.h5", storage="compact")
+    arrays = memory_map(tmp_path / "compact.h5")
+    assert arrays["person_id"].dtype == np.int32
+    assert arrays["household_id"].dtype == np.int32
+    assert arrays["age"].dtype == np.int8
+    assert arrays["is_adult"].dtype == bool
+    assert arrays["income"].dtype == np.float32
+    assert arrays["annual/household_weight"].dtype == np.float32
+    np.testing.assert_array_equal(arrays["household_id"], [1, 1, 2])
+
+
+def test_overrides(tmp_path):
+    with DatasetWriter(
+        tmp_path / "f.h5", "compact", overrides=dict(income="float64")
+    ) as f:
+        f["income"] = np.array([1.25])
+        assert f["income"].dtype == np.float64
+
+
+def test_ids_must_be_whole(tmp_path):
+    with DatasetWriter(tmp_path / "f.h5", "compact") as f:
+        with pytest.raises(ValueError):
+            f["person_id"] = np.array([1.5])
+
+
+def test_gzip_storage_is_chunked_and_compressed(tmp_path):
+    with DatasetWriter(tmp_path / "f.h5", "gzip", chunks=4) as f:
+        f["income"] = np.arange(10.0)
+        assert f["income"].chunks == (4,)
+        assert f["income"].compression == "gzip"
+        np.testing.assert_array_equal(f["income"][:], np.arange(10.0))
+    with pytest.raises(ValueError):
+        memory_map(tmp_path / "f.h5", "income")
+
+
+def test_invalid_settings(tmp_path):
+    with pytest.raises(ValueError):
+        DatasetWriter(tmp_path / "f.h5", "zstd")
+    with pytest.raises(ValueError):
+        DatasetWriter(tmp_path / "f.h5", compression="gzip")
+
+
+@pytest.mark.skipif(compression_filters(), reason="hdf5plugin is installed")
+def test_plugin_compression_requires_hdf5plugin(tmp_path):
+    with pytest.raises(ImportError):
+        DatasetWriter(tmp_path / "f.h5", "lz4")